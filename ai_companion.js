@@ -152,7 +152,7 @@ class AICompanionUI {
     }
     
     /**
-     * Process messages in the queue one at a time
+     * Process the queue, fetching everything waiting in it with one batched request
      */
     async processMessageQueue() {
         if (this.messageQueue.length === 0) {
@@ -161,7 +161,7 @@ class AICompanionUI {
         }
         
         this.processingQueue = true;
-        const { messageType, context, autoExpand } = this.messageQueue.shift();
+        const batch = this.messageQueue.splice(0);
         
         // Clear any previous typewriter effect before starting new one
         if (this.typewriterInterval) {
@@ -170,7 +170,7 @@ class AICompanionUI {
         }
         
         // Auto-expand for important messages
-        if (autoExpand || messageType === 'stage_transition' || messageType === 'struggle_support') {
+        if (batch.some(item => this.shouldAutoExpand(item))) {
             this.forceExpand();
             this.addHighlight();
         }
@@ -179,24 +179,26 @@ class AICompanionUI {
         this.setLoading(true);
         
         try {
-            // Request message from server
-            const response = await fetch('/api/ai/message', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    message_type: messageType,
-                    context: context
-                }),
-            });
+            if (batch.length > 1) {
+                await this.showBatch(batch);
+                return;
+            }
             
-            if (!response.ok) {
-                throw new Error(`Server responded with ${response.status}`);
+            const { messageType, context } = batch[0];
+            // Stream the message token by token when the browser supports it
+            let streamed = false;
+            if (this.supportsStreaming()) {
+                try {
+                    streamed = await this.streamMessage(messageType, context);
+                } catch (error) {
+                    console.warn('Streaming unavailable, falling back to single response:', error);
+                }
             }
             
-            const data = await response.json();
-            this.displayMessage(data.message);
+            if (!streamed) {
+                const message = await this.fetchMessage(messageType, context);
+                this.displayMessage(message);
+            }
         } catch (error) {
             console.error('Error getting AI message:', error);
             this.displayMessage("I'm here to help with your rounding practice!");
@@ -208,6 +210,250 @@ class AICompanionUI {
         }
     }
     
+    /**
+     * Whether a queued message should open the companion
+     * @param {Object} item - Queued message
+     * @returns {boolean}
+     */
+    shouldAutoExpand({ messageType, autoExpand }) {
+        return autoExpand || messageType === 'stage_transition' || messageType === 'struggle_support';
+    }
+    
+    /**
+     * Fetch several queued messages at once and show them in order as they arrive
+     * @param {Array<Object>} batch - Queued messages
+     */
+    async showBatch(batch) {
+        const messages = new Array(batch.length).fill(null);
+        let shown = 0;
+        let showing = Promise.resolve();
+        
+        // Show each message once all earlier ones are on screen, pausing between them
+        const showReady = () => {
+            while (shown < batch.length && messages[shown] !== null) {
+                const message = messages[shown];
+                const pause = shown > 0;
+                shown++;
+                showing = showing.then(async () => {
+                    if (pause) {
+                        await new Promise(resolve => setTimeout(resolve, 2000));
+                    }
+                    this.setLoading(false);
+                    this.displayMessage(message);
+                });
+            }
+        };
+        
+        try {
+            await this.fetchBatch(batch, (index, message) => {
+                messages[index] = message;
+                showReady();
+            });
+        } catch (error) {
+            console.warn('Batched AI messages unavailable, fetching individually:', error);
+        }
+        
+        // Anything the batch did not deliver is requested on its own
+        for (let index = 0; index < batch.length; index++) {
+            if (messages[index] === null) {
+                try {
+                    messages[index] = await this.fetchMessage(batch[index].messageType, batch[index].context);
+                } catch (error) {
+                    console.error('Error getting AI message:', error);
+                    messages[index] = "I'm here to help with your rounding practice!";
+                }
+                showReady();
+            }
+        }
+        
+        await showing;
+    }
+    
+    /**
+     * Request several messages in one call, reporting each as it becomes ready
+     * @param {Array<Object>} batch - Queued messages
+     * @param {function(number, string)} onMessage - Called with each message's index and text
+     */
+    async fetchBatch(batch, onMessage) {
+        const stream = this.supportsStreaming();
+        const response = await fetch('/api/ai/messages/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': stream ? 'text/event-stream' : 'application/json',
+            },
+            body: JSON.stringify({
+                items: batch.map(({ messageType, context }) => ({ message_type: messageType, context: context })),
+                stream: stream
+            }),
+        });
+        
+        if (!response.ok) {
+            throw new Error(`Server responded with ${response.status}`);
+        }
+        
+        if (!stream || !response.body) {
+            const data = await response.json();
+            data.messages.forEach((item, index) => onMessage(index, item.message));
+            return;
+        }
+        
+        await this.readServerSentEvents(response, event => {
+            if (event.type === 'message') {
+                onMessage(event.data.index, event.data.message);
+            }
+        });
+    }
+    
+    /**
+     * Whether the browser can read a fetch response body as a stream
+     * @returns {boolean}
+     */
+    supportsStreaming() {
+        return typeof window.ReadableStream !== 'undefined' && typeof window.TextDecoder !== 'undefined';
+    }
+    
+    /**
+     * Request a complete message from the server in a single response
+     * @param {string} messageType - Type of message to request
+     * @param {Object} context - Additional context for the message
+     * @returns {Promise<string>} The message text
+     */
+    async fetchMessage(messageType, context) {
+        const response = await fetch('/api/ai/message', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                message_type: messageType,
+                context: context
+            }),
+        });
+        
+        if (!response.ok) {
+            throw new Error(`Server responded with ${response.status}`);
+        }
+        
+        const data = await response.json();
+        return data.message;
+    }
+    
+    /**
+     * Request a message as Server-Sent Events and render tokens as they arrive
+     * @param {string} messageType - Type of message to request
+     * @param {Object} context - Additional context for the message
+     * @returns {Promise<boolean>} True once any text has been shown
+     */
+    async streamMessage(messageType, context) {
+        const response = await fetch('/api/ai/message/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+            },
+            body: JSON.stringify({
+                message_type: messageType,
+                context: context
+            }),
+        });
+        
+        if (!response.ok || !response.body) {
+            throw new Error(`Streaming endpoint responded with ${response.status}`);
+        }
+        
+        let started = false;
+        
+        try {
+            await this.readServerSentEvents(response, event => {
+                if (event.type === 'token') {
+                    if (!started) {
+                        started = true;
+                        this.beginStreamedMessage();
+                    }
+                    this.appendToMessage(event.data.text);
+                } else if (event.type === 'done' && started && event.data.message) {
+                    this.messageElement.textContent = event.data.message;
+                }
+            });
+        } catch (error) {
+            // Keep whatever text already arrived; only fall back if nothing was shown
+            if (!started) throw error;
+            console.warn('AI message stream interrupted:', error);
+        }
+        
+        return started;
+    }
+    
+    /**
+     * Read a Server-Sent Events response body, passing each event to a callback
+     * @param {Response} response - Fetch response with a streaming body
+     * @param {function({type: string, data: Object})} onEvent - Called for every event
+     */
+    async readServerSentEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                onEvent(this.parseServerSentEvent(buffer.slice(0, boundary)));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+    }
+    
+    /**
+     * Parse one Server-Sent Event block into its type and JSON data
+     * @param {string} rawEvent - Lines of a single event
+     * @returns {{type: string, data: Object}}
+     */
+    parseServerSentEvent(rawEvent) {
+        let type = 'message';
+        const dataLines = [];
+        
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        
+        return { type, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+    }
+    
+    /**
+     * Clear the loading state and prepare to show streamed text
+     */
+    beginStreamedMessage() {
+        this.setLoading(false);
+        this.messageElement.textContent = '';
+        
+        // Show companion briefly if it's collapsed and this is an important message
+        if (!this.isExpanded) {
+            this.addHighlight();
+        }
+    }
+    
+    /**
+     * Append streamed text to the current message
+     * @param {string} text - Text to append
+     */
+    appendToMessage(text) {
+        this.messageElement.textContent += text;
+        
+        // Auto-scroll if needed
+        this.messageElement.scrollTop = this.messageElement.scrollHeight;
+    }
+    
     /**
      * Add highlight effect to draw attention
      */
@@ -1,45 +1,371 @@
 """AI companion that provides motivational messages and learning narration."""
 
+import asyncio
+import json
 import logging
-from services.llm_service import LLMService
+import textwrap
+from config import AI_BUNDLE_CONFIG, STAGE_DESCRIPTIONS
+from services.llm_service import get_llm_service, FallbackMessage
+from services.llm_runtime import run_sync, run_async, iterate_sync
+from services.response_cache import get_response_cache
+from services.message_bank import get_message_bank
+from services.answer_index import get_answer_index
+from services.conversation_memory import ConversationMemory
 
 logger = logging.getLogger(__name__)
 
+
+def _compile_template(text):
+    """Normalizes a prompt template once at import instead of on every call."""
+    return textwrap.dedent(text).strip()
+
+
+# Identical on every call, so LLMService marks it as a cacheable prompt prefix
+SYSTEM_PROMPT = _compile_template("""
+    You are an encouraging math tutor assistant helping students learn how to round decimal numbers. 
+    Your name is Math Helper. Your personality is friendly, patient, and slightly playful but focused on learning.
+    You should be concise (2-3 sentences max per message) and engaging for students aged 10-14.
+    
+    Your primary goals are:
+    1. Motivate students by acknowledging their efforts and progress
+    2. Provide age-appropriate encouragement when they struggle
+    3. Explain the learning journey clearly
+    4. Celebrate achievements meaningfully
+    
+    Never directly solve problems for students but guide their thinking process.
+""")
+
+# message_type -> (template, default values for context keys that are missing)
+USER_PROMPT_TEMPLATES = {
+    "welcome": (_compile_template("""
+        Introduce yourself briefly as Math Helper. Mention you're here to help with rounding practice.
+        Express enthusiasm about working with the student. Keep it to 2 sentences maximum.
+        Current stage: {current_stage}
+    """), {"current_stage": "beginning"}),
+    "stage_transition": (_compile_template("""
+        The student is transitioning from stage {previous_stage} to {current_stage}.
+        Previous stage focus: {previous_stage_description}
+        New stage focus: {current_stage_description}
+        Congratulate them on their progress and briefly explain what they'll learn next.
+    """), {
+        "previous_stage": "previous",
+        "current_stage": "new",
+        "previous_stage_description": "rounding basics",
+        "current_stage_description": "advanced rounding"
+    }),
+    "encouragement": (_compile_template("""
+        The student has answered {consecutive_correct} questions correctly in a row.
+        They've attempted {questions_attempted} questions total in this stage.
+        Give them specific encouragement about their consistency or improvement.
+    """), {"consecutive_correct": "several", "questions_attempted": "multiple"}),
+    "struggle_support": (_compile_template("""
+        The student has made {wrong_answers} incorrect attempts recently.
+        The concept they're working on is {current_concept}.
+        Their specific error pattern might be {error_pattern}.
+        Provide supportive encouragement and a gentle reminder about the concept.
+        Don't directly tell them the answer or approach.
+    """), {
+        "wrong_answers": "some",
+        "current_concept": "rounding to decimal places",
+        "error_pattern": "inconsistent application of rounding rules"
+    }),
+    # Previously the generic DEFAULT_USER_PROMPT. The message bank's completion slots (MESSAGE_SLOTS) and the
+    # prefetched completion message need a prompt that uses the lesson's score.
+    "completion": (_compile_template("""
+        The student has completed the lesson, answering {correct_answers} of {total_questions} questions correctly.
+        Celebrate their achievement and briefly recap what they've mastered.
+    """), {"correct_answers": "many", "total_questions": "their"}),
+    # Free-form questions the answer index isn't confident about (see answer_question)
+    "question": (_compile_template("""
+        The student asks: "{question}"
+        A note from the lesson that may help: {reference}
+        Answer their question simply in 2-3 sentences. If they ask about a specific problem,
+        guide their thinking rather than giving the final answer.
+    """), {"question": "", "reference": "none"})
+}
+DEFAULT_USER_PROMPT = "Provide a helpful response about decimal rounding practice."
+
+# Asks for the requested message plus the stage's other messages in one completion
+BUNDLE_PROMPT_TEMPLATE = _compile_template("""
+    {message_type}: {request}
+    
+    Also write these messages now, so they are ready later in this stage ({current_stage}: {current_stage_description}):
+    {later}
+    
+    Reply with only a JSON object with the keys {keys}, each holding one message.
+""")
+BUNDLE_MESSAGE_GUIDES = {
+    "encouragement": "specific praise for answering several questions correctly in a row",
+    "struggle_support": "supportive encouragement after a few incorrect attempts, with a gentle reminder "
+                        "about the concept but without the answer",
+    "stage_transition": "congratulations on finishing this stage, to send as they move on to the next one"
+}
+
+
+def _parse_bundle(text, message_types):
+    """Extracts message_type -> message from a bundle completion, or {} if it isn't the JSON asked for."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        message_type: data[message_type].strip() for message_type in message_types
+        if isinstance(data.get(message_type), str) and data[message_type].strip()
+    }
+
+
 class AICompanion:
     """Manages AI interactions with students."""
     
-    def __init__(self, llm_service=None):
-        self.llm_service = llm_service or LLMService()
-        self.conversation_history = []
+    def __init__(self, llm_service=None, response_cache=None, message_bank=None, answer_index=None):
+        self.llm_service = llm_service or get_llm_service()
+        self.response_cache = response_cache or get_response_cache()
+        self.message_bank = message_bank or get_message_bank()
+        self.answer_index = answer_index or get_answer_index()
+        self.memory = ConversationMemory()
+        self.session_id = None  # Labels this companion's LLM calls in telemetry
         self.student_profile = {}
         self.current_stage = None
         self.message_count = 0
         
-    def generate_message(self, message_type, context=None):
-        """Generates appropriate AI messages based on type and context."""
-        logger.info(f"Generating AI message of type: {message_type}")
+    def generate_message(self, message_type, context=None, deadline=None):
+        """Generates appropriate AI messages based on type and context.
         
-        # Limit conversation history to last 5 messages to save tokens
-        if len(self.conversation_history) > 5:
-            self.conversation_history = self.conversation_history[-5:]
+        deadline (seconds) bounds the wait for the LLM before falling back.
+        """
+        prompt, cleaned_history = self._prepare_request(message_type, context)
         
-        # Clean conversation history before using it
-        cleaned_history = []
-        for msg in self.conversation_history:
-            if isinstance(msg, dict) and 'content' in msg:
-                cleaned_msg = msg.copy()
-                cleaned_msg['content'] = str(msg['content']).strip()
-                cleaned_history.append(cleaned_msg)
+        # Serve from the message bank or response cache, otherwise get completion from LLM
+        message = self._get_local_message(message_type, context, prompt, cleaned_history)
+        if message is None:
+            messages = run_sync(self._complete(
+                message_type, prompt, cleaned_history, deadline, self._missing_bundle_types(message_type, deadline)
+            ))
+            message = self._take_completion(message_type, messages)
+            self._cache_message(prompt, cleaned_history, message)
         
-        # Create prompt based on message type and context
-        prompt = self._create_prompt(message_type, context or {})
+        return self._record_message(message_type, prompt, message)
+
+    async def generate_message_async(self, message_type, context=None, deadline=None):
+        """Async variant of generate_message that awaits the LLM without holding a thread."""
+        prompt, cleaned_history = self._prepare_request(message_type, context)
+        
+        # Serve from the message bank or response cache, otherwise await completion on the shared LLM event loop
+        message = self._get_local_message(message_type, context, prompt, cleaned_history)
+        if message is None:
+            messages = await run_async(self._complete(
+                message_type, prompt, cleaned_history, deadline, self._missing_bundle_types(message_type, deadline)
+            ))
+            message = self._take_completion(message_type, messages)
+            self._cache_message(prompt, cleaned_history, message)
+        
+        return self._record_message(message_type, prompt, message)
+
+    def stream_message(self, message_type, context=None):
+        """Generates a message as a stream of text chunks (a single chunk for bank, bundle or cache hits).
+        
+        Streamed completions are never bundled, so the first token still arrives quickly.
+        """
+        prompt, cleaned_history = self._prepare_request(message_type, context)
+        
+        message = self._get_local_message(message_type, context, prompt, cleaned_history)
+        if message is not None:
+            yield message
+        else:
+            chunks = []
+            for chunk in iterate_sync(self.llm_service.stream_completion_async(
+                prompt, cleaned_history, message_type, self.session_id
+            )):
+                chunks.append(chunk)
+                yield chunk
+            # A fallback arrives as one chunk; keep it as is so it is recognised and not cached
+            message = chunks[0] if len(chunks) == 1 and isinstance(chunks[0], FallbackMessage) else "".join(chunks).strip()
+            self._cache_message(prompt, cleaned_history, message)
+        
+        self._record_message(message_type, prompt, message)
+
+    def answer_question(self, question, deadline=None):
+        """Answers a free-form student question, from the local answer index when it is confident.
+        
+        Returns a dict with the answer, its source ("index" or "llm") and the index confidence.
+        """
+        matches = self.answer_index.search(question, limit=1) if self.answer_index else []
+        match = matches[0] if matches else None
+        confidence = match["confidence"] if match else 0.0
+        
+        if match and self.answer_index.is_confident(match):
+            self.llm_service.telemetry.record_outcome("answer_index", "question", self.session_id)
+            prompt = self._create_prompt("question", {"question": question})
+            answer = self._record_message("question", prompt, match["answer"])
+            return {"answer": answer, "source": "index", "confidence": confidence}
+        
+        # Not sure enough to answer directly, but the closest passage still helps the LLM
+        context = {"question": question, "reference": " ".join(match["answer"].split()) if match else "none"}
+        answer = self.generate_message("question", context, deadline)
+        return {"answer": answer, "source": "llm", "confidence": confidence}
+
+    def iter_messages(self, items, deadline=None):
+        """Generates several messages at once, yielding (index, message) as each one is ready.
+        
+        items is a list of (message_type, context) pairs. Bank, bundle and cache hits come
+        first; the remaining LLM calls run concurrently. Every item is prompted with the same
+        conversation history, and the exchanges are recorded in item order at the end.
+        """
+        prepared = [(message_type, context, *self._prepare_request(message_type, context))
+                    for message_type, context in items]
+        messages = [self._get_local_message(message_type, context, prompt, cleaned_history)
+                    for message_type, context, prompt, cleaned_history in prepared]
+        for index, message in enumerate(messages):
+            if message is not None:
+                yield index, message
+        
+        pending = [index for index, message in enumerate(messages) if message is None]
+        if pending:
+            # Each missing bundle type is asked for once, and not at all if the batch requests it itself
+            claimed = {prepared[index][0] for index in pending}
+            later = {}
+            for index in pending:
+                later[index] = [
+                    t for t in self._missing_bundle_types(prepared[index][0], deadline) if t not in claimed
+                ]
+                claimed.update(later[index])
+            
+            for index, completed in iterate_sync(self._complete_concurrently(prepared, later, deadline)):
+                message_type, _, prompt, cleaned_history = prepared[index]
+                message = self._take_completion(message_type, completed)
+                self._cache_message(prompt, cleaned_history, message)
+                messages[index] = message
+                yield index, message
         
-        # Get completion from LLM
-        message = self.llm_service.get_completion(prompt, cleaned_history)
+        for (message_type, _, prompt, _), message in zip(prepared, messages):
+            self._record_message(message_type, prompt, message)
+
+    async def _complete_concurrently(self, prepared, later, deadline):
+        """Runs the LLM calls for the items in `later` in parallel, yielding (index, messages) as they finish."""
+        async def complete(index):
+            message_type, _, prompt, cleaned_history = prepared[index]
+            return index, await self._complete(message_type, prompt, cleaned_history, deadline, later[index])
+        
+        for next_completed in asyncio.as_completed([complete(index) for index in later]):
+            yield await next_completed
+
+    async def _complete(self, message_type, prompt, cleaned_history, deadline, later=None):
+        """Gets a message from the LLM, asking for the `later` message types in the same call.
+        
+        Returns message_type -> message, including whichever later messages could be parsed.
+        """
+        if not later:
+            message = await self.llm_service.get_completion_async(
+                prompt, cleaned_history, deadline, message_type, self.session_id
+            )
+            return {message_type: message}
+        
+        bundle_prompt = {
+            **prompt,
+            "user": self._create_bundle_prompt(message_type, prompt["user"], later),
+            "max_tokens": AI_BUNDLE_CONFIG["max_tokens"],
+            "timeout_seconds": AI_BUNDLE_CONFIG["timeout_seconds"]
+        }
+        response = await self.llm_service.get_completion_async(
+            bundle_prompt, cleaned_history, deadline, message_type, self.session_id
+        )
+        messages = _parse_bundle(response, [message_type, *later])
+        if message_type in messages:
+            return messages
+        if self.llm_service.is_fallback_message(bundle_prompt, response) or "{" in response:
+            # A fallback, or JSON cut short, can't be split into messages
+            logger.info(f"LLM bundle for {message_type} was not usable; using fallback message")
+            return {message_type: self.llm_service.get_fallback_message(message_type, self.current_stage)}
+        # A plain reply instead of the JSON asked for is still the requested message
+        logger.info(f"LLM bundle for {message_type} came back as plain text; using it as the message")
+        return {message_type: response}
+
+    def _take_completion(self, message_type, messages):
+        """Returns the requested message and keeps the rest of its bundle for later in this stage."""
+        message = messages.pop(message_type)
+        if messages:
+            self.memory.store_bundled(self.current_stage, messages)
+        return message
+
+    def _missing_bundle_types(self, message_type, deadline=None):
+        """Returns the other bundle types worth writing alongside an LLM call for message_type.
         
-        # Store this interaction in history (make sure to strip the content)
-        self.conversation_history.append({"role": "user", "content": prompt["user"].strip()})
-        self.conversation_history.append({"role": "assistant", "content": message.strip()})
+        A bundle takes several times as long to write as one message, so calls with a deadline
+        shorter than AI_BUNDLE_CONFIG["min_deadline_seconds"] are never bundled.
+        """
+        bundle_types = AI_BUNDLE_CONFIG["message_types"]
+        if not AI_BUNDLE_CONFIG["enabled"] or message_type not in bundle_types or not self.current_stage:
+            return []
+        if deadline is not None and deadline < AI_BUNDLE_CONFIG["min_deadline_seconds"]:
+            return []
+        return [
+            t for t in bundle_types
+            if t != message_type and not self.memory.has_bundled(t, self.current_stage)
+            and not self.message_bank.covers(t, self.current_stage)
+        ]
+
+    def has_bundled_message(self, message_type, context=None):
+        """Returns True if a bundled message is waiting for this type and stage."""
+        return self.memory.has_bundled(message_type, self._bundle_stage(message_type, context or {}))
+
+    def _bundle_stage(self, message_type, context):
+        """The stage a bundled message must have been written for; transitions are written before leaving it."""
+        if message_type == "stage_transition" and context.get("previous_stage"):
+            return context["previous_stage"]
+        return self.current_stage
+
+    def _prepare_request(self, message_type, context):
+        """Builds the prompt and token-bounded conversation history for a message."""
+        logger.info(f"Generating AI message of type: {message_type}")
+        
+        # Recent exchanges go in as messages; older ones only as a short summary
+        cleaned_history = self.memory.window()
+        
+        # Create prompt based on message type and context
+        prompt = self._create_prompt(message_type, context or {})
+        summary = self.memory.get_summary()
+        if summary:
+            prompt["summary"] = summary
+        return prompt, cleaned_history
+
+    def _get_local_message(self, message_type, context, prompt, cleaned_history):
+        """Returns a message from the bank, this session's bundle or the response cache, counting where it came from."""
+        message, source = self._get_banked_message(message_type, context), "message_bank"
+        if message is None:
+            message, source = self.memory.take_bundled(
+                message_type, self._bundle_stage(message_type, context or {})
+            ), "message_bundle"
+        if message is None:
+            message, source = self._get_cached_message(prompt, cleaned_history), "response_cache"
+        if message is not None:
+            self.llm_service.telemetry.record_outcome(source, message_type, self.session_id)
+        return message
+
+    def _get_banked_message(self, message_type, context):
+        """Returns a pre-generated message for this type and stage, with slots filled in."""
+        enriched_context = self._enrich_context(context or {})
+        stage = enriched_context.get("current_stage")
+        return self.message_bank.get_message(message_type, stage, enriched_context)
+
+    def _get_cached_message(self, prompt, cleaned_history):
+        """Returns a cached response for this prompt, if the cache has enough variants."""
+        if not self.response_cache:
+            return None
+        return self.response_cache.get(prompt, cleaned_history)
+
+    def _cache_message(self, prompt, cleaned_history, message):
+        """Caches a live LLM response (fallback messages are never cached)."""
+        if self.response_cache and not self.llm_service.is_fallback_message(prompt, message):
+            self.response_cache.put(prompt, cleaned_history, message)
+
+    def _record_message(self, message_type, prompt, message):
+        """Stores an interaction in the conversation memory, folding older turns if needed."""
+        self.memory.add_exchange(message_type, prompt["user"], message)
         
         # Increment message counter
         self.message_count += 1
@@ -47,9 +373,8 @@ class AICompanion:
         return message
 
     
-    def _create_prompt(self, message_type, context):
-        """Creates a prompt for the LLM based on message type and context."""
-        # Enrich context with current state
+    def _enrich_context(self, context):
+        """Adds the companion's current state to a message context."""
         enriched_context = {**context}
         if self.current_stage:
             enriched_context["current_stage"] = self.current_stage
@@ -58,54 +383,32 @@ class AICompanion:
             
         # Add message count to context
         enriched_context["message_count"] = self.message_count
+        return enriched_context
+
+    def _create_prompt(self, message_type, context):
+        """Creates a prompt for the LLM based on message type and context."""
+        # Enrich context with current state
+        enriched_context = self._enrich_context(context)
         
-        # Base system prompt
-        system_prompt = """
-        You are an encouraging math tutor assistant helping students learn how to round decimal numbers. 
-        Your name is Math Helper. Your personality is friendly, patient, and slightly playful but focused on learning.
-        You should be concise (2-3 sentences max per message) and engaging for students aged 10-14.
-        
-        Your primary goals are:
-        1. Motivate students by acknowledging their efforts and progress
-        2. Provide age-appropriate encouragement when they struggle
-        3. Explain the learning journey clearly
-        4. Celebrate achievements meaningfully
-        
-        Never directly solve problems for students but guide their thinking process.
-        """
-        
-        # Different prompt templates based on message type
-        if message_type == "welcome":
-            user_prompt = f"""
-            Introduce yourself briefly as Math Helper. Mention you're here to help with rounding practice.
-            Express enthusiasm about working with the student. Keep it to 2 sentences maximum.
-            Current stage: {enriched_context.get('current_stage', 'beginning')}
-            """
-        elif message_type == "stage_transition":
-            user_prompt = f"""
-            The student is transitioning from stage {enriched_context.get('previous_stage', 'previous')} to {enriched_context.get('current_stage', 'new')}.
-            Previous stage focus: {enriched_context.get('previous_stage_description', 'rounding basics')}
-            New stage focus: {enriched_context.get('current_stage_description', 'advanced rounding')}
-            Congratulate them on their progress and briefly explain what they'll learn next.
-            """
-        elif message_type == "encouragement":
-            user_prompt = f"""
-            The student has answered {enriched_context.get('consecutive_correct', 'several')} questions correctly in a row.
-            They've attempted {enriched_context.get('questions_attempted', 'multiple')} questions total in this stage.
-            Give them specific encouragement about their consistency or improvement.
-            """
-        elif message_type == "struggle_support":
-            user_prompt = f"""
-            The student has made {enriched_context.get('wrong_answers', 'some')} incorrect attempts recently.
-            The concept they're working on is {enriched_context.get('current_concept', 'rounding to decimal places')}.
-            Their specific error pattern might be {enriched_context.get('error_pattern', 'inconsistent application of rounding rules')}.
-            Provide supportive encouragement and a gentle reminder about the concept.
-            Don't directly tell them the answer or approach.
-            """
+        template = USER_PROMPT_TEMPLATES.get(message_type)
+        if template is None:
+            user_prompt = DEFAULT_USER_PROMPT
         else:
-            user_prompt = "Provide a helpful response about decimal rounding practice."
+            text, defaults = template
+            user_prompt = text.format_map({**defaults, **enriched_context})
             
         return {
-            "system": system_prompt,
+            "system": SYSTEM_PROMPT,
             "user": user_prompt
-        }
\ No newline at end of file
+        }
+
+    def _create_bundle_prompt(self, message_type, request, later):
+        """Wraps a message's prompt with a request for the stage's later messages as JSON."""
+        return BUNDLE_PROMPT_TEMPLATE.format(
+            message_type=message_type,
+            request=request,
+            current_stage=self.current_stage,
+            current_stage_description=STAGE_DESCRIPTIONS.get(self.current_stage, "rounding practice"),
+            later="\n".join(f"- {t}: {BUNDLE_MESSAGE_GUIDES.get(t, t.replace('_', ' '))}" for t in later),
+            keys=", ".join([message_type, *later])
+        )
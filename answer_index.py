@@ -0,0 +1,161 @@
+"""In-memory BM25 index that answers common student questions without calling the LLM."""
+
+import math
+import re
+import textwrap
+import threading
+from collections import Counter
+from config import AI_ANSWER_INDEX_CONFIG, QUESTION_RULES
+from services.content_service import ContentService
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+TOKEN_PATTERN = re.compile(r"\d+\.\d+|[a-z0-9]+")
+STOP_WORDS = frozenset("""
+    a an and are at be but by can could do does did for from how i if in into is it its me my of on or
+    so that the then this to was we what when where which why will with would you your please
+""".split())
+EXAMPLE_PATTERN = re.compile(r"Round (\d+\.\d+) to (\d+) decimal place")
+
+
+def tokenize(text):
+    """Lowercased word and number tokens, without stop words; plurals are folded ("places", "9s")."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower().replace("'", "")):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        elif len(token) > 1 and token[-1] == "s" and token[:-1].isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class AnswerIndex:
+    """BM25 over curated answers, with a confidence score for the best match.
+
+    Confidence is the IDF-weighted share of the question's terms that the best
+    document contains, so a question with specifics the corpus has never seen
+    (say, a number) scores low and goes to the LLM instead. A share says little
+    about a one- or two-word question, so a match also has to cover a minimum
+    number of the question's terms before it is trusted.
+    """
+
+    def __init__(self, k1=None, b=None):
+        self.k1 = AI_ANSWER_INDEX_CONFIG["k1"] if k1 is None else k1
+        self.b = AI_ANSWER_INDEX_CONFIG["b"] if b is None else b
+        self._documents = []  # dicts with answer, source, terms (Counter), length
+        self._postings = {}  # term -> list of document indexes
+        self._idf = {}
+        self._average_length = 0.0
+
+    def add(self, text, answer, source):
+        terms = Counter(tokenize(text))
+        index = len(self._documents)
+        self._documents.append({"answer": answer, "source": source, "terms": terms, "length": sum(terms.values())})
+        for term in terms:
+            self._postings.setdefault(term, []).append(index)
+        self._refresh_statistics()
+
+    def _refresh_statistics(self):
+        count = len(self._documents)
+        self._average_length = sum(doc["length"] for doc in self._documents) / count
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self):
+        return len(self._documents)
+
+    def search(self, question, limit=3):
+        """Returns up to `limit` matches (best first) as dicts with answer, source, score, confidence
+        and matched_terms."""
+        query = set(tokenize(question))
+        if not query or not self._documents:
+            return []
+
+        scores = {}
+        for term in query:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for index in self._postings[term]:
+                doc = self._documents[index]
+                frequency = doc["terms"][term]
+                norm = self.k1 * (1 - self.b + self.b * doc["length"] / self._average_length)
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        # Terms the corpus has never seen weigh as much as the rarest known term
+        unseen_weight = math.log(1 + (len(self._documents) + 0.5) / 0.5)
+        query_weight = sum(self._idf.get(term, unseen_weight) for term in query)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {
+                "answer": self._documents[index]["answer"],
+                "source": self._documents[index]["source"],
+                "score": round(score, 3),
+                "confidence": round(sum(
+                    self._idf[term] for term in query if term in self._documents[index]["terms"]
+                ) / query_weight, 3),
+                "matched_terms": sum(1 for term in query if term in self._documents[index]["terms"])
+            }
+            for index, score in ranked
+        ]
+
+    @staticmethod
+    def is_confident(match, min_confidence=None):
+        """True if a search match covers enough of the question, both as a share and in matched terms."""
+        min_confidence = AI_ANSWER_INDEX_CONFIG["min_confidence"] if min_confidence is None else min_confidence
+        return (
+            match is not None
+            and match["confidence"] >= min_confidence
+            and match["matched_terms"] >= AI_ANSWER_INDEX_CONFIG["min_matched_terms"]
+        )
+
+    def answer(self, question, min_confidence=None):
+        """Returns the best match if it is confident enough, otherwise None."""
+        matches = self.search(question, limit=1)
+        if matches and self.is_confident(matches[0], min_confidence):
+            return matches[0]
+        return None
+
+
+def build_answer_index(content_service=None):
+    """Indexes ContentService's concept explanations and the worked examples in QUESTION_RULES.
+
+    Worked examples are indexed without their final answer, so a student who
+    asks about an example is walked through it rather than given the result.
+    """
+    content_service = content_service or ContentService()
+    index = AnswerIndex()
+    for entry in content_service.get_concept_explanations():
+        # Phrasings are repeated so a question matches them more than incidental words in the answer
+        text = " ".join(entry["questions"] * 3 + [entry["answer"]])
+        index.add(text, entry["answer"], "concept")
+
+    for stage, rules in QUESTION_RULES.items():
+        for key in ("example1", "example2"):
+            match = EXAMPLE_PATTERN.match(rules.get(key, ""))
+            if not match:
+                continue
+            explanation = content_service.get_worked_example(
+                match.group(1), int(match.group(2)), include_answer=False
+            )
+            answer = "\n".join(line for line in textwrap.dedent(explanation).strip().splitlines() if line.strip())
+            index.add(f"how do i {rules[key].lower()} {answer}", answer, f"example:{stage}")
+    return index
+
+
+def get_answer_index():
+    """Returns the worker-wide answer index, or None if local answers are disabled."""
+    global _shared_index
+    if not AI_ANSWER_INDEX_CONFIG["enabled"]:
+        return None
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = build_answer_index()
+    return _shared_index
@@ -2,11 +2,14 @@
 Rounding Tutor - Main Application
 A Flask application that teaches students to round decimal numbers.
 """
-from flask import Flask, render_template, request, jsonify, session, url_for, redirect
+from flask import Flask, Response, render_template, request, jsonify, session, url_for, redirect, stream_with_context
 import os
+import asyncio
 import json
 import logging
-from functools import wraps
+import math
+import time
+from functools import wraps, partial
 import uuid
 from dotenv import load_dotenv
 
@@ -14,18 +17,35 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Local imports
-from config import SESSION_KEY, STAGES
-from models.learning_sequence import LearningSequence
+from config import (
+    SESSION_KEY, STAGES, STAGE_DESCRIPTIONS, AI_MESSAGE_DEADLINE_SECONDS, AI_BATCH_MAX_ITEMS, AI_ANSWER_INDEX_CONFIG,
+    AI_PREFETCH_CONFIG
+)
 from models.question_generator import QuestionGenerator
 from models.verifier import Verifier
 from models.ai_companion import AICompanion
 from services.content_service import ContentService
-from helpers.session_helper import prepare_session_data, load_learning_sequence_from_session
+from services.llm_service import get_llm_service
+from services.response_cache import get_response_cache
+from services.message_bank import get_message_bank
+from services.message_prefetcher import get_message_prefetcher
+from services.conversation_store import get_conversation_store
+from services.llm_telemetry import get_llm_telemetry
+from services.session_store import get_session_store
+from services.student_event_log import get_student_event_log
+from helpers.session_helper import (
+    get_learning_sequence,
+    save_learning_sequence_to_session,
+    learning_state_changes,
+    write_back_session_state
+)
+from helpers.session_interface import CompactCookieSessionInterface, ServerSideSessionInterface
 from helpers.response_helper import (
     format_example_response, 
     format_practice_response, 
     format_complete_response,
-    format_error_response
+    format_error_response,
+    format_sse_event
 )
 
 # Configure logging
@@ -36,11 +56,18 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = SESSION_KEY if 'SESSION_KEY' in globals() else os.urandom(24)
 
+# Keep session data server-side; the cookie only carries the session id
+session_store = get_session_store()
+if session_store:
+    app.session_interface = ServerSideSessionInterface(session_store)
+else:
+    app.session_interface = CompactCookieSessionInterface()
+
 # Initialize services
-learning_sequence = LearningSequence()
 question_generator = QuestionGenerator()
 verifier = Verifier()
 content_service = ContentService()
+message_bank = get_message_bank()  # Load pre-generated companion messages at startup
 
 # Error handler decorator
 def handle_errors(f):
@@ -59,10 +86,165 @@ def handle_errors(f):
 def before_request():
     if 'user_id' not in session:
         session['user_id'] = str(uuid.uuid4())
-    if 'ai_conversation' not in session:
-        session['ai_conversation'] = []
+    if 'ai_conversation_id' not in session:
+        session['ai_conversation_id'] = str(uuid.uuid4())
+
+# Write lesson state and the student profile back once per request, before the session is saved
+@app.after_request
+def after_request(response):
+    write_back_session_state(response)
+    return response
 
 # AI Companion Route - Place early in the file
+AI_FALLBACK_MESSAGES = {
+    'welcome': "Hi there! I'm Math Helper, ready to support your decimal rounding practice.",
+    'encouragement': "Great job! You're doing really well with your rounding practice.",
+    'stage_transition': "Excellent progress! You're ready to move on to the next level.",
+    'struggle_support': "Don't worry, everyone makes mistakes while learning. Keep practicing!",
+    'completion': "Congratulations! You've done an amazing job completing this lesson.",
+    'question': "Good question! Find the target digit, then check the digit to its right to decide how to round."
+}
+
+def build_ai_companion():
+    """Create an AI companion primed with the student's current learning state."""
+    # Get current learning state
+    current_sequence = get_learning_sequence()
+    
+    # Set up AI companion with current state
+    ai_companion = AICompanion()
+    ai_companion.session_id = session.get('user_id')
+    ai_companion.current_stage = current_sequence.get_current_stage()
+    ai_companion.student_profile = {
+        'correct_answers': current_sequence.correct_answers,
+        'questions_attempted': current_sequence.questions_attempted,
+        'consecutive_correct': current_sequence.consecutive_correct
+    }
+    
+    # Load conversation memory from the server-side store; the session only holds its id
+    ai_companion.memory = get_conversation_store().load(session['ai_conversation_id'])
+    return ai_companion
+
+def save_ai_conversation(ai_companion, conversation_id=None):
+    """Persist the companion's conversation memory for the current session."""
+    get_conversation_store().save(conversation_id or session['ai_conversation_id'], ai_companion.memory)
+
+def get_ai_message_deadline(data):
+    """Return the latency budget (seconds) for an AI message, or None for no limit.
+    
+    Callers may ask for a tighter budget with 'deadline_ms' in the request body.
+    """
+    deadline = AI_MESSAGE_DEADLINE_SECONDS or None
+    if data.get('deadline_ms') is not None:
+        requested = float(data['deadline_ms']) / 1000
+        deadline = min(requested, deadline) if deadline else requested
+    return deadline
+
+def is_valid_deadline(data):
+    """Return False if the request body has a 'deadline_ms' that isn't a positive, finite number."""
+    deadline_ms = data.get('deadline_ms')
+    if deadline_ms is None:
+        return True
+    if isinstance(deadline_ms, bool):
+        return False
+    try:
+        deadline_ms = float(deadline_ms)
+    except (TypeError, ValueError):
+        return False
+    return math.isfinite(deadline_ms) and deadline_ms > 0
+
+INVALID_DEADLINE_ERROR = {'error': 'deadline_ms must be a positive number of milliseconds'}
+
+def predict_ai_messages(is_correct, student_profile, old_stage, new_stage):
+    """Return the (message_type, context) pairs the practice page will ask for after this answer.
+    
+    Mirrors the triggers in practice_common.js so the messages can be prefetched.
+    """
+    predictions = []
+    if is_correct and student_profile.consecutive_correct >= 3 and student_profile.consecutive_correct % 3 == 0:
+        predictions.append(('encouragement', {
+            'consecutive_correct': student_profile.consecutive_correct,
+            'questions_attempted': student_profile.total_questions,
+            'total_correct': student_profile.total_correct
+        }))
+    if not is_correct and student_profile.consecutive_errors >= 2:
+        predictions.append(('struggle_support', {
+            'wrong_answers': student_profile.consecutive_errors,
+            'current_concept': STAGE_DESCRIPTIONS.get(new_stage, 'rounding to decimal places'),
+            'questions_attempted': student_profile.total_questions
+        }))
+    if old_stage != new_stage:
+        predictions.append(('stage_transition', {
+            'previous_stage': old_stage,
+            'current_stage': new_stage,
+            'previous_stage_description': STAGE_DESCRIPTIONS.get(old_stage, 'rounding practice'),
+            'current_stage_description': STAGE_DESCRIPTIONS.get(new_stage, 'rounding practice')
+        }))
+    if new_stage == STAGES["COMPLETE"]:
+        predictions.append(('completion', {
+            'correct_answers': student_profile.total_correct,
+            'total_questions': student_profile.total_questions
+        }))
+    return predictions
+
+def generate_prefetched_ai_message(ai_companion, message_type, context):
+    """Background task: generate a message and return it with the exchange and bundled messages it added."""
+    bundled_before = dict(ai_companion.memory.bundled)
+    message = ai_companion.generate_message(message_type, context)
+    bundled = {t: entry for t, entry in ai_companion.memory.bundled.items() if bundled_before.get(t) != entry}
+    return message, ai_companion.memory.last_exchange(), bundled
+
+def prefetch_ai_messages(predictions):
+    """Start generating predicted companion messages in the background."""
+    prefetcher = get_message_prefetcher()
+    if not prefetcher or not get_llm_service().api_url:
+        return
+    
+    for message_type, context in predictions:
+        ai_companion = build_ai_companion()
+        # Banked and bundled messages are already instant
+        if (message_bank.covers(message_type, ai_companion.current_stage) or
+                ai_companion.has_bundled_message(message_type, context)):
+            continue
+        # Keyed on the stage it was written for, so it is never served once the student moves on
+        prefetcher.prefetch(
+            session['user_id'],
+            message_type,
+            partial(generate_prefetched_ai_message, ai_companion, message_type, context),
+            fingerprint=ai_companion.current_stage
+        )
+
+def take_prefetched_ai_message(ai_companion, message_type, deadline):
+    """Return this session's prefetched message for the current stage, if any, adding it to the companion's history.
+    
+    A prefetch that is still running is only waited on for a short slice
+    (AI_PREFETCH_CONFIG["take_wait_ms"]); the rest of the deadline is left for
+    generating the message directly.
+    """
+    prefetcher = get_message_prefetcher()
+    if not prefetcher:
+        return None
+    
+    wait = AI_PREFETCH_CONFIG["take_wait_ms"] / 1000
+    result = prefetcher.take(session['user_id'], message_type, fingerprint=ai_companion.current_stage,
+                             timeout=min(wait, deadline) if deadline else wait)
+    if result is None:
+        return None
+    message, exchange, bundled = result
+    ai_companion.memory.add_exchange(**exchange)
+    ai_companion.memory.bundled.update(bundled)
+    return message
+
+def remaining_deadline(deadline, started):
+    """Return what is left of a latency budget that began at `started` (time.monotonic())."""
+    if deadline is None:
+        return None
+    return max(deadline - (time.monotonic() - started), 0.01)
+
+def get_fallback_ai_message(data):
+    """Return the canned message for a request's message type."""
+    message_type = data.get('message_type', 'welcome') if data else 'welcome'
+    return AI_FALLBACK_MESSAGES.get(message_type, "I'm here to help with your math practice!")
+
 @app.route('/api/ai/message', methods=['POST'])
 @handle_errors
 def get_ai_message():
@@ -74,6 +256,8 @@ def get_ai_message():
         if not data:
             logger.error("No JSON data provided")
             return jsonify({'error': 'No JSON data provided'}), 400
+        if not is_valid_deadline(data):
+            return jsonify(INVALID_DEADLINE_ERROR), 400
             
         message_type = data.get('message_type', 'general')
         context = data.get('context', {})
@@ -81,54 +265,245 @@ def get_ai_message():
         logger.info(f"Message type: {message_type}")
         logger.info(f"Context: {context}")
         
-        # Get current learning state
-        current_sequence = load_learning_sequence_from_session(learning_sequence)
-        
-        # Set up AI companion with current state
-        ai_companion = AICompanion()
-        ai_companion.current_stage = current_sequence.get_current_stage()
-        ai_companion.student_profile = {
-            'correct_answers': current_sequence.correct_answers,
-            'questions_attempted': current_sequence.questions_attempted,
-            'consecutive_correct': current_sequence.consecutive_correct
-        }
+        ai_companion = build_ai_companion()
+        started = time.monotonic()
+        deadline = get_ai_message_deadline(data)
         
-        # Load conversation history from session
-        ai_companion.conversation_history = session.get('ai_conversation', [])
-        
-        # Generate message
-        logger.info("Generating AI message...")
-        message = ai_companion.generate_message(message_type, context)
+        # Use the message prefetched during answer verification, otherwise generate it now
+        message = take_prefetched_ai_message(ai_companion, message_type, deadline)
+        if message is None:
+            logger.info("Generating AI message...")
+            message = ai_companion.generate_message(message_type, context, remaining_deadline(deadline, started))
         logger.info(f"Generated message: {message}")
         
-        # Save updated conversation history to session
-        session['ai_conversation'] = ai_companion.conversation_history
+        # Save updated conversation memory
+        save_ai_conversation(ai_companion)
         
         return jsonify({'message': message})
         
     except Exception as e:
         logger.error(f"Error in AI message endpoint: {e}", exc_info=True)
         # Return a fallback message instead of an error
-        fallback_messages = {
-            'welcome': "Hi there! I'm Math Helper, ready to support your decimal rounding practice.",
-            'encouragement': "Great job! You're doing really well with your rounding practice.",
-            'stage_transition': "Excellent progress! You're ready to move on to the next level.",
-            'struggle_support': "Don't worry, everyone makes mistakes while learning. Keep practicing!",
-            'completion': "Congratulations! You've done an amazing job completing this lesson."
-        }
-        
-        message_type = data.get('message_type', 'welcome') if data else 'welcome'
-        fallback_message = fallback_messages.get(message_type, "I'm here to help with your math practice!")
-        
-        return jsonify({'message': fallback_message})
+        return jsonify({'message': get_fallback_ai_message(data)})
+
+@app.route('/api/ai/message/async', methods=['POST'])
+async def get_ai_message_async():
+    """Async variant of /api/ai/message; the LLM call is awaited on the shared LLM event loop.
+    
+    The blocking steps (conversation store, waiting on a prefetch) run in a thread so
+    they never stall the view's event loop. Under a WSGI server Flask still gives each
+    async view its own loop on the request's worker thread, so this route offers an
+    awaitable API rather than more request capacity than /api/ai/message.
+    """
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No JSON data provided'}), 400
+    if not is_valid_deadline(data):
+        return jsonify(INVALID_DEADLINE_ERROR), 400
+    
+    try:
+        ai_companion = await asyncio.to_thread(build_ai_companion)
+        message_type = data.get('message_type', 'general')
+        started = time.monotonic()
+        deadline = get_ai_message_deadline(data)
+        message = await asyncio.to_thread(take_prefetched_ai_message, ai_companion, message_type, deadline)
+        if message is None:
+            message = await ai_companion.generate_message_async(
+                message_type,
+                data.get('context', {}),
+                remaining_deadline(deadline, started)
+            )
+        await asyncio.to_thread(save_ai_conversation, ai_companion)
+        return jsonify({'message': message})
+    except Exception as e:
+        logger.error(f"Error in async AI message endpoint: {e}", exc_info=True)
+        return jsonify({'message': get_fallback_ai_message(data)})
+
+@app.route('/api/ai/ask', methods=['POST'])
+@handle_errors
+def ask_ai_companion():
+    """API endpoint for free-form student questions to Math Helper.
+    
+    Common questions are answered from the local answer index; the LLM is only
+    asked when the index isn't confident.
+    """
+    data = request.json
+    question = (data or {}).get('question', '').strip()
+    if not question:
+        return jsonify({'error': 'A question is required'}), 400
+    if len(question) > AI_ANSWER_INDEX_CONFIG['max_question_chars']:
+        return jsonify({'error': 'Question is too long'}), 400
+    if not is_valid_deadline(data):
+        return jsonify(INVALID_DEADLINE_ERROR), 400
+    
+    try:
+        ai_companion = build_ai_companion()
+        result = ai_companion.answer_question(question, get_ai_message_deadline(data))
+        save_ai_conversation(ai_companion)
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error answering student question: {e}", exc_info=True)
+        return jsonify({
+            'answer': get_fallback_ai_message({'message_type': 'question'}),
+            'source': 'fallback',
+            'confidence': 0.0
+        })
+
+@app.route('/api/ai/message/stream', methods=['POST'])
+@handle_errors
+def stream_ai_message():
+    """Streams an AI companion message to the browser as Server-Sent Events.
+    
+    Emits 'token' events as text arrives, then a 'done' event with the full message.
+    Conversation memory lives server-side, so it is saved once the message is complete.
+    """
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No JSON data provided'}), 400
+    if not is_valid_deadline(data):
+        return jsonify(INVALID_DEADLINE_ERROR), 400
+    
+    message_type = data.get('message_type', 'general')
+    ai_companion = build_ai_companion()
+    
+    # A prefetched message is complete already, so it goes out as a single event
+    prefetched = take_prefetched_ai_message(ai_companion, message_type, get_ai_message_deadline(data))
+    if prefetched is not None:
+        save_ai_conversation(ai_companion)
+        return Response(
+            format_sse_event('token', {'text': prefetched}) + format_sse_event('done', {'message': prefetched}),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache'}
+        )
+    
+    conversation_id = session['ai_conversation_id']
+    
+    def generate():
+        chunks = []
+        try:
+            for chunk in ai_companion.stream_message(message_type, data.get('context', {})):
+                chunks.append(chunk)
+                yield format_sse_event('token', {'text': chunk})
+            save_ai_conversation(ai_companion, conversation_id)
+        except Exception as e:
+            logger.error(f"Error streaming AI message: {e}", exc_info=True)
+            if not chunks:
+                chunks.append(get_fallback_ai_message(data))
+                yield format_sse_event('token', {'text': chunks[0]})
+        yield format_sse_event('done', {'message': "".join(chunks).strip()})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/ai/messages/batch', methods=['POST'])
+@handle_errors
+def get_ai_message_batch():
+    """Generates several companion messages in one request, running their LLM calls concurrently.
+    
+    Body: {"items": [{"message_type", "context"}, ...], "stream": false, "deadline_ms": optional}.
+    Returns {"messages": [...]} in item order, or with "stream": true emits a 'message'
+    event ({index, message_type, message}) as each completes, then 'done' with all of them.
+    """
+    data = request.json
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > AI_BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {AI_BATCH_MAX_ITEMS} items per batch'}), 400
+    if not all(isinstance(item, dict) and isinstance(item.get('context', {}), dict) for item in items):
+        return jsonify({'error': 'Each item must be an object, with context an object if given'}), 400
+    if not is_valid_deadline(data):
+        return jsonify(INVALID_DEADLINE_ERROR), 400
+    
+    items = [(item.get('message_type', 'general'), item.get('context', {})) for item in items]
+    ai_companion = build_ai_companion()
+    conversation_id = session['ai_conversation_id']
+    started = time.monotonic()
+    deadline = get_ai_message_deadline(data)
+    
+    # Claim anything prefetched during answer verification; the rest is generated together
+    messages = [take_prefetched_ai_message(ai_companion, message_type, remaining_deadline(deadline, started))
+                for message_type, _ in items]
+    pending = [index for index, message in enumerate(messages) if message is None]
+    
+    def generate_messages():
+        """Fills in `messages`, yielding (index, message) as each is ready, prefetched ones first."""
+        for index, message in enumerate(messages):
+            if message is not None:
+                yield index, message
+        try:
+            pending_items = [items[index] for index in pending]
+            for position, message in ai_companion.iter_messages(pending_items, remaining_deadline(deadline, started)):
+                messages[pending[position]] = message
+                yield pending[position], message
+            save_ai_conversation(ai_companion, conversation_id)
+        except Exception as e:
+            logger.error(f"Error generating AI message batch: {e}", exc_info=True)
+            for index in pending:
+                if messages[index] is None:
+                    messages[index] = get_fallback_ai_message({'message_type': items[index][0]})
+                    yield index, messages[index]
+    
+    if not data.get('stream'):
+        for _ in generate_messages():
+            pass
+        return jsonify({'messages': [
+            {'message_type': message_type, 'message': message}
+            for (message_type, _), message in zip(items, messages)
+        ]})
+    
+    def stream():
+        for index, message in generate_messages():
+            yield format_sse_event('message', {'index': index, 'message_type': items[index][0], 'message': message})
+        yield format_sse_event('done', {'messages': messages})
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/ai/status')
+@handle_errors
+def get_ai_status():
+    """API endpoint reporting LLM configuration and performance counters."""
+    response_cache = get_response_cache()
+    prefetcher = get_message_prefetcher()
+    return jsonify({
+        'llm': get_llm_service().get_api_status(),
+        'response_cache': response_cache.get_stats() if response_cache else None,
+        'message_bank': message_bank.get_stats(),
+        'prefetch': prefetcher.get_stats() if prefetcher else None,
+        'conversations': get_conversation_store().get_stats()
+    })
+
+@app.route('/api/ai/telemetry')
+@handle_errors
+def get_ai_telemetry():
+    """API endpoint with LLM token, cost and latency breakdowns.
+    
+    Includes totals, per-model and per-message-type histograms, the costliest
+    sessions, the calling session's own numbers, and what request hedging saves.
+    """
+    top_sessions = request.args.get('top_sessions', '20')
+    if not top_sessions.isdecimal():
+        return jsonify({'error': 'top_sessions must be a non-negative integer'}), 400
+    telemetry = get_llm_telemetry()
+    stats = telemetry.get_stats(top_sessions=int(top_sessions))
+    stats['current_session'] = telemetry.get_session_stats(session.get('user_id'))
+    hedging = get_llm_service().hedging
+    stats['hedging'] = hedging.get_stats() if hedging else None
+    return jsonify(stats)
 
 # Routes
 @app.route('/')
 def index():
     """Home page route."""
-    # Reset the learning sequence when starting
+    # Clearing the session resets the learning sequence when starting
     session.clear()
-    learning_sequence.reset()
     return render_template('pages/index.html')
 
 @app.route('/lesson')
@@ -143,7 +518,7 @@ def next_step():
     logger.info("--- NEXT STEP REQUEST ---")
     
     # Load or create learning sequence from session
-    current_sequence = load_learning_sequence_from_session(learning_sequence)
+    current_sequence = get_learning_sequence()
     logger.debug(f"Current stage: {current_sequence.get_current_stage()}")
     
     # Get current stage details
@@ -174,14 +549,14 @@ def serve_example(current_sequence, stage_rules):
     logger.info(f"Redirecting for example #{current_sequence.current_example}")
     
     # Update session state
-    session['learning_state'] = prepare_session_data(current_sequence)
+    save_learning_sequence_to_session(current_sequence)
     
     # Redirect to the appropriate examples page based on stage
     if current_sequence.current_stage == STAGES["ROUNDING_1DP_NO_UP"]:
         logger.info("Stage 1.1 detected - redirecting to examples page")
         return jsonify({'redirect': url_for('examples')})
     elif current_sequence.current_stage == STAGES["ROUNDING_2DP"]:
-        if session['learning_state']['showing_example']:
+        if current_sequence.showing_example:
             logger.info("Redirecting to decimal2_examples from current_stage check")
             return jsonify({'redirect': url_for('decimal2_examples')})
         else:
@@ -209,7 +584,7 @@ def serve_practice_question(current_sequence, stage_rules):
     session['current_question'] = json.dumps(formatted_question)
     
     # Update session
-    session['learning_state'] = prepare_session_data(current_sequence)
+    save_learning_sequence_to_session(current_sequence)
     
     return format_practice_response(current_sequence, formatted_question)
 
@@ -217,6 +592,7 @@ def serve_practice_question(current_sequence, stage_rules):
 @handle_errors
 def verify_answer():
     """API endpoint to verify a student's answer."""
+    learning_sequence = get_learning_sequence()
     # Get the student's answer
     data = request.json
     student_answer = data.get('answer')
@@ -294,7 +670,10 @@ def verify_answer():
     showing_new_examples = stage_completed and learning_sequence.showing_example
     
     # Update session with new state
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
+    
+    # Start the companion message the page is about to ask for while the student reads the feedback
+    prefetch_ai_messages(predict_ai_messages(is_correct, student_profile, old_stage, new_stage))
     
     # Get feedback (enhanced with misconception data)
     logger.info("Generating feedback...")
@@ -335,6 +714,7 @@ def verify_answer():
 @handle_errors
 def next_example():
     """API endpoint to advance to the next example or to practice."""
+    learning_sequence = get_learning_sequence()
     logger.info("--- /api/next-example CALLED ---")
     logger.debug(f"Before update: stage={learning_sequence.current_stage}, "
                 f"example={learning_sequence.current_example}, "
@@ -383,8 +763,8 @@ def next_example():
                 f"showing={learning_sequence.showing_example}")
     
     # Update session
-    session['learning_state'] = prepare_session_data(learning_sequence)
-    logger.debug(f"Session updated: {session['learning_state']}")
+    save_learning_sequence_to_session(learning_sequence)
+    logger.debug(f"Session changes: {learning_state_changes()}")
     
     return jsonify({'status': 'success'})
 
@@ -398,9 +778,6 @@ def reset_lesson():
     from helpers.session_helper import reset_student_profile
     session.clear()
     reset_student_profile()
-    
-    # Reset learning sequence
-    learning_sequence.reset()
     logger.info("Session cleared and learning sequence reset")
     
     # Return a redirect instruction
@@ -409,8 +786,7 @@ def reset_lesson():
 @app.route('/lesson-intro')
 def lesson_intro():
     """Lesson introduction page route."""
-    # Reset the learning sequence when starting the intro
-    learning_sequence.reset()
+    # Clearing the session resets the learning sequence when starting the intro
     session.clear()
     return render_template('pages/lesson_intro.html')
 
@@ -458,6 +834,7 @@ def current_stage():
 @app.route('/examples')
 def examples():
     """Examples page route."""
+    learning_sequence = get_learning_sequence()
     # Check if user is in the correct stage
     if 'learning_state' not in session:
         # New user, initialize the learning sequence
@@ -465,7 +842,7 @@ def examples():
         learning_sequence.current_stage = STAGES["ROUNDING_1DP_NO_UP"]
         learning_sequence.showing_example = True
         learning_sequence.current_example = 1
-        session['learning_state'] = prepare_session_data(learning_sequence)
+        save_learning_sequence_to_session(learning_sequence)
     elif session['learning_state']['stage'] != STAGES["ROUNDING_1DP_NO_UP"] or not session['learning_state']['showing_example']:
         # User is in the wrong stage, redirect to appropriate page
         return redirect(url_for('current_stage'))
@@ -477,10 +854,11 @@ def examples():
 @handle_errors
 def decimal1_examples_first():
     """API endpoint to get the first example data."""
+    learning_sequence = get_learning_sequence()
     # Update session state
     learning_sequence.current_example = 1
     learning_sequence.showing_example = True
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
 
     # Hardcoded example data - no dependency on question_generator
     example_data = {
@@ -508,9 +886,10 @@ def decimal1_examples_first():
 @handle_errors
 def decimal1_examples_second():
     """API endpoint to get the second example data."""
+    learning_sequence = get_learning_sequence()
     # Update learning sequence to show second example
     learning_sequence.current_example = 2
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
     
     # Hardcoded example data - no dependency on question_generator
     example_data = {
@@ -538,10 +917,11 @@ def decimal1_examples_second():
 @handle_errors
 def decimal1_examples_complete():
     """API endpoint to mark examples as complete and move to practice."""
+    learning_sequence = get_learning_sequence()
     # Update learning sequence to show practice
     learning_sequence.showing_example = False
     learning_sequence.current_example = 3  # This should trigger practice mode based on your code
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
     
     return jsonify({"status": "success"})
 
@@ -566,7 +946,7 @@ def practice():
 def decimal1_practice_question():
     """API endpoint to get a practice question."""
     # Load current sequence from session
-    current_sequence = load_learning_sequence_from_session(learning_sequence)
+    current_sequence = get_learning_sequence()
     
     # Check if we've reached the end of the lesson
     if current_sequence.get_current_stage() == STAGES["COMPLETE"]:
@@ -586,7 +966,7 @@ def decimal1_practice_question():
     session['current_question'] = json.dumps(formatted_question)
     
     # Update session
-    session['learning_state'] = prepare_session_data(current_sequence)
+    save_learning_sequence_to_session(current_sequence)
     
     return jsonify({
         'lesson_complete': False,
@@ -613,6 +993,7 @@ def decimal1_practice():
 @app.route('/decimal2/examples')
 def decimal2_examples():
     """Decimal 2 Examples page route."""
+    learning_sequence = get_learning_sequence()
     logger.info("Decimal2 examples page requested")
     
     # Check if user is in the correct stage
@@ -632,7 +1013,7 @@ def decimal2_examples():
         learning_sequence.current_stage = STAGES["ROUNDING_2DP"]  # Ensure correct stage
         learning_sequence.showing_example = True
         learning_sequence.current_example = 1
-        session['learning_state'] = prepare_session_data(learning_sequence)
+        save_learning_sequence_to_session(learning_sequence)
     else:
         # If not in the right stage, update to proper stage
         logger.info(f"Not in stage 2.1, currently in {session['learning_state']['stage']}")
@@ -640,10 +1021,10 @@ def decimal2_examples():
         learning_sequence.current_stage = STAGES["ROUNDING_2DP"]
         learning_sequence.showing_example = True
         learning_sequence.current_example = 1
-        session['learning_state'] = prepare_session_data(learning_sequence)
+        save_learning_sequence_to_session(learning_sequence)
     
     # Log current state for debugging
-    logger.info(f"Rendering decimal23_examples.html with session state: {session['learning_state']}")
+    logger.info(f"Rendering decimal23_examples.html with session changes: {learning_state_changes()}")
     
     # Use the correct template
     return render_template('pages/decimal23_examples.html')
@@ -651,6 +1032,7 @@ def decimal2_examples():
 @app.route('/decimal2/practice')
 def decimal2_practice():
     """Decimal 2 Practice page route."""
+    learning_sequence = get_learning_sequence()
     # Check if user is in the correct stage
     if 'learning_state' not in session:
         # New user, should start from intro
@@ -663,7 +1045,7 @@ def decimal2_practice():
     
     # Set up practice mode
     learning_sequence.showing_example = False
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
     
     # Use a practice template
     return render_template('pages/decimal23_practice.html')
@@ -672,10 +1054,11 @@ def decimal2_practice():
 @handle_errors
 def decimal2_examples_first():
     """API endpoint to get the first example data for decimal2."""
+    learning_sequence = get_learning_sequence()
     # Update session state
     learning_sequence.current_example = 1
     learning_sequence.showing_example = True
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
     
     # Hardcoded example data - no dependency on question_generator
     example_data = {
@@ -703,9 +1086,10 @@ def decimal2_examples_first():
 @handle_errors
 def decimal2_examples_second():
     """API endpoint to get the second example data for decimal2."""
+    learning_sequence = get_learning_sequence()
     # Update learning sequence to show second example
     learning_sequence.current_example = 2
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    save_learning_sequence_to_session(learning_sequence)
     
     # Hardcoded example data - no dependency on question_generator
     example_data = {
@@ -733,10 +1117,11 @@ def decimal2_examples_second():
 @handle_errors
 def decimal2_examples_complete():
    """API endpoint to mark decimal2 examples as complete and move to practice."""
+   learning_sequence = get_learning_sequence()
    # Update learning sequence to show practice
    learning_sequence.showing_example = False
    learning_sequence.current_example = 3  # This should trigger practice mode
-   session['learning_state'] = prepare_session_data(learning_sequence)
+   save_learning_sequence_to_session(learning_sequence)
    
    return jsonify({"status": "success"})
 
@@ -745,7 +1130,7 @@ def decimal2_examples_complete():
 def decimal2_practice_question():
    """API endpoint to get a practice question for decimal2 stage."""
    # Load current sequence from session
-   current_sequence = load_learning_sequence_from_session(learning_sequence)
+   current_sequence = get_learning_sequence()
    
    # Check if we've reached the end of the lesson
    if current_sequence.get_current_stage() == STAGES["COMPLETE"]:
@@ -765,7 +1150,7 @@ def decimal2_practice_question():
    session['current_question'] = json.dumps(formatted_question)
    
    # Update session
-   session['learning_state'] = prepare_session_data(current_sequence)
+   save_learning_sequence_to_session(current_sequence)
    
    return jsonify({
        'lesson_complete': False,
@@ -776,6 +1161,7 @@ def decimal2_practice_question():
 @app.route('/decimal23/practice')
 def decimal23_practice():
    """Decimal 2 and 3 Practice page route."""
+   learning_sequence = get_learning_sequence()
    # Check if user is in the correct stage
    if 'learning_state' not in session:
        # New user, should start from intro
@@ -788,7 +1174,7 @@ def decimal23_practice():
    
    # Set up practice mode
    learning_sequence.showing_example = False
-   session['learning_state'] = prepare_session_data(learning_sequence)
+   save_learning_sequence_to_session(learning_sequence)
    
    # Use a practice template
    return render_template('pages/decimal23_practice.html')
@@ -798,7 +1184,7 @@ def decimal23_practice():
 def decimal23_practice_question():
    """API endpoint to get a practice question for decimal 2 and 3 stage."""
    # Load current sequence from session
-   current_sequence = load_learning_sequence_from_session(learning_sequence)
+   current_sequence = get_learning_sequence()
    
    # Check if we've reached the end of the lesson
    if current_sequence.get_current_stage() == STAGES["COMPLETE"]:
@@ -818,7 +1204,7 @@ def decimal23_practice_question():
    session['current_question'] = json.dumps(formatted_question)
    
    # Update session
-   session['learning_state'] = prepare_session_data(current_sequence)
+   save_learning_sequence_to_session(current_sequence)
    
    return jsonify({
        'lesson_complete': False,
@@ -830,6 +1216,7 @@ def decimal23_practice_question():
 @app.route('/stretch/examples')
 def stretch_examples():
    """Stretch Examples page route."""
+   learning_sequence = get_learning_sequence()
    # Check if user is in the correct stage
    if 'learning_state' not in session:
        # New user, should start from intro
@@ -843,7 +1230,7 @@ def stretch_examples():
    if session['learning_state']['stage'] == STAGES["STRETCH"]:
        learning_sequence.showing_example = True
        learning_sequence.current_example = 1
-       session['learning_state'] = prepare_session_data(learning_sequence)
+       save_learning_sequence_to_session(learning_sequence)
    
    # Use the correct template
    return render_template('pages/stretch_examples.html')
@@ -879,7 +1266,9 @@ def debug_session():
    return jsonify({
        'learning_state': session.get('learning_state', {}),
        'current_question': session.get('current_question', {}),
-       'ai_conversation': session.get('ai_conversation', [])
+       'ai_conversation': get_conversation_store().load(session.get('ai_conversation_id', '')).to_dict(),
+       'session_store': session_store.get_stats() if session_store else None,
+       'student_event_log': get_student_event_log().get_stats() if get_student_event_log() else None
    })
 
 # Test endpoint for debugging
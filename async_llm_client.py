@@ -0,0 +1,222 @@
+"""Asyncio HTTP client for the LLM API with a shared keep-alive connection pool.
+
+Uses aiohttp when it is installed. Otherwise each call runs in a thread on the
+pooled requests client (llm_http_client.PooledHTTPClient), and streamed
+completions arrive as one chunk.
+"""
+
+import asyncio
+import functools
+import json
+import threading
+import time
+import logging
+import requests
+from config import LLM_HTTP_CONFIG
+from services.llm_http_client import get_shared_http_client
+
+try:
+    import aiohttp
+except ImportError:  # Without aiohttp, calls run on the pooled requests client in a thread
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+class LLMRequestError(Exception):
+    """Raised when the LLM API cannot be reached or returns an error status."""
+
+    def __init__(self, message, status=None, headers=None, body=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+
+
+class AsyncLLMClient:
+    """Non-blocking LLM HTTP client; all calls share one connection pool on the LLM loop."""
+
+    def __init__(self, pool_maxsize=None, keep_alive=None, connect_timeout=None, read_timeout=None,
+                 fallback_client=None):
+        self.pool_maxsize = pool_maxsize or LLM_HTTP_CONFIG["pool_maxsize"]
+        self.keep_alive = LLM_HTTP_CONFIG["keep_alive"] if keep_alive is None else keep_alive
+        self.connect_timeout = connect_timeout or LLM_HTTP_CONFIG["connect_timeout"]
+        self.read_timeout = read_timeout or LLM_HTTP_CONFIG["read_timeout"]
+        self.fallback_client = fallback_client or (get_shared_http_client() if aiohttp is None else None)
+
+        self._session = None
+        self._stats_lock = threading.Lock()
+        self._requests_sent = 0
+        self._new_connections = 0
+        self._reused_connections = 0
+        self._in_flight = 0
+
+    @property
+    def transport(self):
+        return "aiohttp" if aiohttp is not None else "requests"
+
+    @property
+    def supports_streaming(self):
+        """Streaming needs aiohttp; the threaded requests fallback is single-shot only."""
+        return aiohttp is not None
+
+    def _get_session(self):
+        """Creates the aiohttp session lazily so it binds to the running (LLM) loop."""
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize,
+                force_close=not self.keep_alive,
+                keepalive_timeout=LLM_HTTP_CONFIG["keepalive_timeout"] if self.keep_alive else None
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self._client_timeout((self.connect_timeout, self.read_timeout)),
+                trace_configs=[trace_config]
+            )
+        return self._session
+
+    @staticmethod
+    def _client_timeout(timeout):
+        connect_timeout, read_timeout = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+    async def _on_connection_created(self, session, context, params):
+        with self._stats_lock:
+            self._new_connections += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        with self._stats_lock:
+            self._reused_connections += 1
+
+    async def post_json(self, url, headers=None, data=None, timeout=None, timings=None):
+        """POSTs a request body and returns the decoded JSON response.
+        
+        If a timings dict is passed, its "ttfb" is set to the seconds until response headers arrived.
+        """
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        timings = {} if timings is None else timings
+        with self._stats_lock:
+            self._requests_sent += 1
+            self._in_flight += 1
+        try:
+            if aiohttp is None:
+                return await self._post_json_in_thread(url, headers, data, timeout, timings)
+            return await self._post_json_aiohttp(url, headers, data, timeout, timings)
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+
+    async def _post_json_aiohttp(self, url, headers, data, timeout, timings):
+        started = time.monotonic()
+        try:
+            async with self._get_session().post(
+                url, headers=headers, data=data, timeout=self._client_timeout(timeout)
+            ) as response:
+                timings["ttfb"] = time.monotonic() - started
+                body = await response.text()
+                if response.status >= 400:
+                    raise LLMRequestError(
+                        f"{response.status} error from LLM API",
+                        status=response.status,
+                        headers=dict(response.headers),
+                        body=body
+                    )
+        except aiohttp.ClientError as e:
+            raise LLMRequestError(str(e) or e.__class__.__name__) from e
+        except asyncio.TimeoutError as e:
+            raise LLMRequestError("Timed out waiting for LLM API") from e
+        return json.loads(body)
+
+    async def _post_json_in_thread(self, url, headers, data, timeout, timings):
+        loop = asyncio.get_running_loop()
+        post = functools.partial(self.fallback_client.post, url, headers=headers, data=data, timeout=timeout)
+        try:
+            response = await loop.run_in_executor(None, post)
+            timings["ttfb"] = response.elapsed.total_seconds()  # requests measures up to the response headers
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            response = getattr(e, "response", None)
+            if response is not None:
+                raise LLMRequestError(
+                    str(e), status=response.status_code, headers=dict(response.headers), body=response.text
+                ) from e
+            raise LLMRequestError(str(e)) from e
+        return json.loads(response.text)
+
+    async def stream_events(self, url, headers=None, data=None, timeout=None):
+        """POSTs a streaming request and yields (event, data) pairs from the Server-Sent Events body."""
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        with self._stats_lock:
+            self._requests_sent += 1
+            self._in_flight += 1
+        try:
+            async with self._get_session().post(
+                url, headers=headers, data=data, timeout=self._client_timeout(timeout)
+            ) as response:
+                if response.status >= 400:
+                    raise LLMRequestError(
+                        f"{response.status} error from LLM API",
+                        status=response.status,
+                        headers=dict(response.headers),
+                        body=await response.text()
+                    )
+                event, data_lines = None, []
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").rstrip("\r\n")
+                    if not line:
+                        if data_lines:
+                            yield event or "message", json.loads("\n".join(data_lines))
+                        event, data_lines = None, []
+                    elif line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data_lines.append(line[len("data:"):].strip())
+        except aiohttp.ClientError as e:
+            raise LLMRequestError(str(e) or e.__class__.__name__) from e
+        except asyncio.TimeoutError as e:
+            raise LLMRequestError("Timed out waiting for LLM API") from e
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+
+    def get_stats(self):
+        """Returns counters for new vs reused connections and in-flight calls."""
+        if aiohttp is None:
+            stats = self.fallback_client.get_stats()
+        else:
+            with self._stats_lock:
+                stats = {
+                    "requests": self._requests_sent,
+                    "new_connections": self._new_connections,
+                    "reused_connections": self._reused_connections,
+                    "pool_maxsize": self.pool_maxsize,
+                    "keep_alive": self.keep_alive,
+                    "connect_timeout": self.connect_timeout,
+                    "read_timeout": self.read_timeout
+                }
+        with self._stats_lock:
+            stats["in_flight"] = self._in_flight
+        stats["transport"] = self.transport
+        return stats
+
+    async def close(self):
+        """Closes the underlying connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+def get_shared_async_client():
+    """Returns the worker-wide async LLM client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = AsyncLLMClient()
+                logger.info(f"Created async LLM client (transport={_shared_client.transport})")
+    return _shared_client
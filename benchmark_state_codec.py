@@ -0,0 +1,99 @@
+"""
+Compare session payloads for the learning state and student profile: today's
+tagged JSON against the compact state codec, raw and zlib-compressed.
+
+Usage:
+    python benchmark_state_codec.py --iterations 20000
+
+Reports payload bytes and per-call encode/decode time for a fresh student and
+for one well into the lesson.
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+from flask.json.tag import TaggedJSONSerializer
+
+from config import STAGES, SESSION_CODEC_CONFIG
+from models.learning_sequence import LearningSequence
+from models.student_profile import QuestionResult, StudentProfile
+from helpers.session_helper import prepare_session_data
+from helpers.state_codec import encode_session_values, decode_session_values
+
+serializer = TaggedJSONSerializer()
+
+
+def build_session(questions_answered, seed=7):
+    """Returns session values after a student has answered this many questions."""
+    rng = random.Random(seed)
+    learning_sequence = LearningSequence()
+    profile = StudentProfile()
+    profile.session_start_time = datetime(2026, 3, 9, 10, 15, 30, 123456)
+    stages = list(STAGES.values())[:5]
+    for number in range(questions_answered):
+        stage = stages[min(number // 12, len(stages) - 1)]
+        correct = rng.random() < 0.75
+        learning_sequence.used_questions[stage].add(rng.randrange(40))
+        if stage in learning_sequence.stage_results:
+            learning_sequence.stage_results[stage]["attempted"] += 1
+            learning_sequence.stage_results[stage]["correct"] += correct
+        learning_sequence.current_stage = stage
+        learning_sequence.questions_attempted += 1
+        learning_sequence.correct_answers += correct
+        misconception = None if correct else rng.choice(["rounding_direction_confusion", "nines_difficulty"])
+        profile.add_question_result(QuestionResult(
+            question_id=f"q{number}", stage=stage, is_correct=correct, student_answer="3.4",
+            correct_answer="3.4", response_time_seconds=rng.uniform(4, 30), misconception_type=misconception
+        ))
+    return {
+        "learning_state": prepare_session_data(learning_sequence),
+        "student_profile": profile.to_dict()
+    }
+
+
+def time_per_call(function, argument, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_case(name, values, iterations):
+    json_payload = serializer.dumps(values)
+
+    def restore(loaded):
+        # Decoding is only done once the request has its StudentProfile back
+        return StudentProfile.from_dict(loaded["student_profile"])
+
+    print(f"\n{name}")
+    print(f"{'format':<16}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    print(f"{'tagged json':<16}{len(json_payload):>8}"
+          f"{time_per_call(serializer.dumps, values, iterations):>12.1f}"
+          f"{time_per_call(lambda p: restore(serializer.loads(p)), json_payload, iterations):>12.1f}")
+
+    compress_min_bytes = SESSION_CODEC_CONFIG["compress_min_bytes"]
+    for label, threshold in (("codec", 1 << 30), ("codec + zlib", 0)):
+        SESSION_CODEC_CONFIG["compress_min_bytes"] = threshold
+        encoded = encode_session_values(values)
+        sizes = "/".join(str(len(encoded[key])) for key in ("learning_state", "student_profile"))
+        payload = serializer.dumps(encoded)
+        encode_us = time_per_call(lambda v: serializer.dumps(encode_session_values(v)), values, iterations)
+        decode_us = time_per_call(lambda p: restore(decode_session_values(serializer.loads(p))), payload, iterations)
+        print(f"{label:<16}{len(payload):>8}{encode_us:>12.1f}{decode_us:>12.1f}   (state/profile {sizes} raw bytes)")
+        decoded = decode_session_values(serializer.loads(payload))
+        assert decoded["student_profile"] == values["student_profile"], "student profile did not round-trip"
+        assert decoded["learning_state"]["stage_results"] == values["learning_state"]["stage_results"]
+    SESSION_CODEC_CONFIG["compress_min_bytes"] = compress_min_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000, help="calls timed per measurement")
+    args = parser.parse_args()
+
+    run_case("fresh student", build_session(0), args.iterations)
+    run_case("after 45 questions", build_session(45), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-answer cost and memory of a StudentProfile as its answer history grows.
+
+Usage:
+    python benchmark_student_profile.py --sizes 10 100 1000 10000 --updates 2000
+
+For each history size, builds a profile with that many answers, then times
+further add_question_result() and get_recent_performance_summary() calls and
+measures the profile's memory with tracemalloc. Also compares one slotted
+QuestionResult against the same record as a plain dataclass with a datetime.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from models.student_profile import QuestionResult, StudentProfile, HISTORY_LIMIT, RECENT_WINDOW
+
+
+@dataclass
+class PlainQuestionResult:
+    """QuestionResult's previous layout, for the record size comparison"""
+    question_id: str
+    stage: str
+    is_correct: bool
+    student_answer: str
+    correct_answer: str
+    response_time_seconds: float
+    misconception_type: Optional[str] = None
+    timestamp: datetime = field(default_factory=datetime.now)
+
+
+def make_result(record_type, rng, number):
+    return record_type(
+        question_id=f"{number}_1", stage=rng.choice(["1.1", "1.2", "1.3", "2.1"]), is_correct=rng.random() < 0.7,
+        student_answer=f"{rng.randrange(100)}.{rng.randrange(10)}", correct_answer="12.6",
+        response_time_seconds=rng.uniform(3, 40), misconception_type=rng.choice([None, None, "nines_difficulty"])
+    )
+
+
+def build_profile(size, rng):
+    profile = StudentProfile()
+    for number in range(size):
+        profile.add_question_result(make_result(QuestionResult, rng, number))
+    return profile
+
+
+def measure_memory(function):
+    """Returns (result, bytes still allocated by it)."""
+    tracemalloc.start()
+    result = function()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated
+
+
+def time_updates(profile, rng, updates):
+    """Returns microseconds per add_question_result() and per get_recent_performance_summary()."""
+    results = [make_result(QuestionResult, rng, number) for number in range(updates)]
+    started = time.perf_counter()
+    for result in results:
+        profile.add_question_result(result)
+    add_us = (time.perf_counter() - started) / updates * 1e6
+    started = time.perf_counter()
+    for _ in range(updates):
+        profile.get_recent_performance_summary()
+    return add_us, (time.perf_counter() - started) / updates * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="history sizes")
+    parser.add_argument("--updates", type=int, default=2000, help="answers timed at each size")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"recent window {RECENT_WINDOW} answers, in-memory history limit {HISTORY_LIMIT} answers")
+    print(f"{'answers':>8}{'add us':>10}{'summary us':>12}{'profile KiB':>13}{'kept':>7}")
+    for size in args.sizes:
+        profile, allocated = measure_memory(lambda: build_profile(size, random.Random(size)))
+        add_us, summary_us = time_updates(build_profile(size, rng), rng, args.updates)
+        print(f"{size:>8}{add_us:>10.2f}{summary_us:>12.2f}{allocated / 1024:>13.1f}{len(profile.question_history):>7}")
+
+    for record_type in (PlainQuestionResult, QuestionResult):
+        records, allocated = measure_memory(lambda: [make_result(record_type, random.Random(1), n) for n in range(1000)])
+        print(f"{record_type.__name__}: {allocated / len(records):.0f} bytes per record")
+
+
+if __name__ == "__main__":
+    main()
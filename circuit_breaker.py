@@ -0,0 +1,141 @@
+"""Circuit breaker that stops calling the LLM API while it is failing or slow."""
+
+import threading
+import time
+import logging
+from collections import deque
+from config import LLM_CIRCUIT_BREAKER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by recent error rate and latency.
+
+    While open, allow_request() returns False so callers can use their fallback
+    immediately. After open_seconds a limited number of probe calls are let
+    through (half-open); a successful probe closes the circuit again. A caller
+    whose call never reaches the API (shed or cancelled) hands its probe slot
+    back with release_probe(); slots nobody reports on expire after
+    probe_timeout_seconds.
+    """
+
+    def __init__(self, name="llm", **overrides):
+        config = {**LLM_CIRCUIT_BREAKER_CONFIG, **overrides}
+        self.name = name
+        self.window_size = config["window_size"]
+        self.min_calls = config["min_calls"]
+        self.error_rate_threshold = config["error_rate_threshold"]
+        self.slow_call_seconds = config["slow_call_seconds"]
+        self.slow_call_rate_threshold = config["slow_call_rate_threshold"]
+        self.open_seconds = config["open_seconds"]
+        self.half_open_max_calls = config["half_open_max_calls"]
+        self.probe_timeout_seconds = config["probe_timeout_seconds"]
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._last_probe_at = 0.0
+        self._expired_probes = 0
+        self._outcomes = deque(maxlen=self.window_size)  # (succeeded, latency_seconds)
+        self._transitions = {}
+        self._rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._check_open_timeout()
+            return self._state
+
+    def allow_request(self):
+        """Returns True if a call may go upstream now."""
+        with self._lock:
+            self._check_open_timeout()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                now = time.monotonic()
+                if self._half_open_calls >= self.half_open_max_calls and \
+                        now - self._last_probe_at >= self.probe_timeout_seconds:
+                    logger.warning(f"Circuit '{self.name}' probe never reported back; allowing a new one")
+                    self._expired_probes += self._half_open_calls
+                    self._half_open_calls = 0
+                if self._half_open_calls < self.half_open_max_calls:
+                    self._half_open_calls += 1
+                    self._last_probe_at = now
+                    return True
+            self._rejected += 1
+            return False
+
+    def release_probe(self):
+        """Gives back a probe slot taken by allow_request() for a call that never reached the API."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_calls = max(self._half_open_calls - 1, 0)
+
+    def record_success(self, latency):
+        with self._lock:
+            self._record(True, latency)
+
+    def record_failure(self, latency):
+        with self._lock:
+            self._record(False, latency)
+
+    def _record(self, succeeded, latency):
+        slow = latency >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            # A probe decides the state: a healthy response closes, anything else reopens
+            self._half_open_calls = max(self._half_open_calls - 1, 0)
+            if succeeded and not slow:
+                self._outcomes.clear()
+                self._transition(CLOSED)
+            else:
+                self._trip()
+            return
+
+        self._outcomes.append((succeeded, latency))
+        if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+            calls = len(self._outcomes)
+            error_rate = sum(1 for ok, _ in self._outcomes if not ok) / calls
+            slow_rate = sum(1 for _, seconds in self._outcomes if seconds >= self.slow_call_seconds) / calls
+            if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                logger.warning(
+                    f"Circuit '{self.name}' tripping: error_rate={error_rate:.2f}, slow_rate={slow_rate:.2f}"
+                )
+                self._trip()
+
+    def _trip(self):
+        self._opened_at = time.monotonic()
+        self._half_open_calls = 0
+        self._transition(OPEN)
+
+    def _check_open_timeout(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, new_state):
+        if new_state == self._state:
+            return
+        key = f"{self._state}->{new_state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        logger.warning(f"Circuit '{self.name}' state change: {key}")
+        self._state = new_state
+
+    def get_stats(self):
+        with self._lock:
+            self._check_open_timeout()
+            calls = len(self._outcomes)
+            return {
+                "state": self._state,
+                "window_calls": calls,
+                "window_error_rate": round(sum(1 for ok, _ in self._outcomes if not ok) / calls, 3) if calls else 0.0,
+                "rejected_calls": self._rejected,
+                "half_open_calls": self._half_open_calls,
+                "expired_probes": self._expired_probes,
+                "transitions": dict(self._transitions)
+            }
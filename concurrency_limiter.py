@@ -0,0 +1,170 @@
+"""Token-bucket plus max-in-flight limiter for outbound LLM calls, with priorities and load shedding."""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from config import LLM_LIMITER_CONFIG
+
+
+class ConcurrencyLimiter:
+    """Admits LLM calls in priority order within a rate and concurrency budget.
+
+    Lives on the LLM event loop, so one instance is shared by every request
+    thread in the worker. Low-priority calls are shed (acquire returns False)
+    when the queue is too deep or the estimated wait is too long.
+    """
+
+    def __init__(self, **overrides):
+        config = {**LLM_LIMITER_CONFIG, **overrides}
+        self.rate_per_second = config["rate_per_second"]
+        self.burst = config["burst"]
+        self.max_in_flight = config["max_in_flight"]
+        self.max_queue_depth = config["max_queue_depth"]
+        self.max_estimated_wait_seconds = config["max_estimated_wait_seconds"]
+        self.shed_priority = config["shed_priority"]
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._dispatch_handle = None
+        self._average_latency = 1.0  # Seconds per call, exponentially weighted
+
+        self._stats_lock = threading.Lock()
+        self._admitted = 0
+        self._timed_out = 0
+        self._shed = {}
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    # Token bucket
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_per_second)
+        self._last_refill = now
+
+    def _queue_depth(self, max_priority=None):
+        return sum(
+            1 for priority, _, future in self._waiters
+            if not future.done() and (max_priority is None or priority <= max_priority)
+        )
+
+    def estimated_wait(self, priority):
+        """Estimates seconds until a new call at this priority would be admitted."""
+        self._refill()
+        ahead = self._queue_depth(priority)
+        token_wait = max(0.0, (ahead + 1 - self._tokens) / self.rate_per_second)
+        if self._in_flight + ahead < self.max_in_flight:
+            slot_wait = 0.0
+        else:
+            slot_wait = (ahead + 1) / self.max_in_flight * self._average_latency
+        return max(token_wait, slot_wait)
+
+    # Admission
+
+    async def acquire(self, priority, timeout=None, label=None):
+        """Waits for a slot. Returns False if the call was shed or timed out in the queue."""
+        estimated = self.estimated_wait(priority)
+        sheddable = priority >= self.shed_priority
+        if sheddable and (self._queue_depth() >= self.max_queue_depth or
+                          estimated > self.max_estimated_wait_seconds):
+            self._record_shed(label or f"priority_{priority}")
+            return False
+        if timeout is not None and estimated > timeout:
+            self._record_shed(label or f"priority_{priority}")
+            return False
+
+        queued_at = time.monotonic()
+        if not await self._wait_for_slot(priority, timeout):
+            with self._stats_lock:
+                self._timed_out += 1
+            return False
+
+        waited = time.monotonic() - queued_at
+        with self._stats_lock:
+            self._admitted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return True
+
+    async def try_acquire(self, priority, timeout):
+        """Takes a slot if one frees up within timeout seconds, otherwise returns False.
+
+        For optional extra calls (e.g. hedges): going without a slot is expected, so it
+        is neither shed nor counted against the limiter's shed and timeout stats.
+        """
+        if self.estimated_wait(priority) > timeout:
+            return False
+        return await self._wait_for_slot(priority, timeout)
+
+    async def _wait_for_slot(self, priority, timeout):
+        """Queues for a slot; returns False if none was granted within timeout."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._dispatch()
+
+        try:
+            if timeout is None:
+                await future
+            else:
+                await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release()  # Admitted just as the caller gave up
+            future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+        return True
+
+    def release(self, latency=None):
+        """Frees a slot taken by acquire() and admits the next waiter."""
+        self._in_flight = max(self._in_flight - 1, 0)
+        if latency is not None:
+            self._average_latency = 0.8 * self._average_latency + 0.2 * latency
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admits queued calls in priority order while tokens and slots allow."""
+        while self._waiters and self._in_flight < self.max_in_flight:
+            _, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            self._refill()
+            if self._tokens < 1:
+                if self._dispatch_handle is None:
+                    delay = (1 - self._tokens) / self.rate_per_second
+                    self._dispatch_handle = asyncio.get_running_loop().call_later(delay, self._on_refill)
+                return
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            self._in_flight += 1
+            future.set_result(True)
+
+    def _on_refill(self):
+        self._dispatch_handle = None
+        self._dispatch()
+
+    def _record_shed(self, label):
+        with self._stats_lock:
+            self._shed[label] = self._shed.get(label, 0) + 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            admitted = self._admitted
+            stats = {
+                "admitted": admitted,
+                "timed_out": self._timed_out,
+                "shed": dict(self._shed),
+                "average_wait_seconds": round(self._total_wait / admitted, 4) if admitted else 0.0,
+                "max_wait_seconds": round(self._max_wait, 4)
+            }
+        stats["in_flight"] = self._in_flight
+        stats["queue_depth"] = sum(1 for _, _, future in list(self._waiters) if not future.done())
+        stats["average_call_seconds"] = round(self._average_latency, 3)
+        return stats
@@ -67,3 +67,211 @@ QUESTION_RULES = {
         "example2": "Round 0.952 to 1 decimal place"
     }
 }
+
+# LLM HTTP Client Configuration
+LLM_HTTP_CONFIG = {
+    "pool_connections": int(os.environ.get("LLM_POOL_CONNECTIONS", 4)),  # Distinct hosts kept pooled
+    "pool_maxsize": int(os.environ.get("LLM_POOL_MAXSIZE", 16)),  # Connections kept per host
+    "keep_alive": os.environ.get("LLM_KEEP_ALIVE", "true").lower() != "false",
+    "keepalive_timeout": float(os.environ.get("LLM_KEEPALIVE_TIMEOUT", 60)),  # Idle seconds before closing
+    "connect_timeout": float(os.environ.get("LLM_CONNECT_TIMEOUT", 3.05)),
+    "read_timeout": float(os.environ.get("LLM_READ_TIMEOUT", 10))
+}
+
+# AI Companion Response Cache
+AI_RESPONSE_CACHE_CONFIG = {
+    "enabled": os.environ.get("AI_CACHE_ENABLED", "true").lower() != "false",
+    "memory_max_entries": int(os.environ.get("AI_CACHE_MEMORY_ENTRIES", 256)),
+    "disk_path": os.environ.get("AI_CACHE_PATH", "ai_response_cache.sqlite3"),  # Shared by all workers; "" disables
+    "disk_max_entries": int(os.environ.get("AI_CACHE_DISK_ENTRIES", 5000)),
+    "ttl_seconds": int(os.environ.get("AI_CACHE_TTL_SECONDS", 24 * 60 * 60)),
+    "variety": int(os.environ.get("AI_CACHE_VARIETY", 3))  # Distinct variants kept per prompt
+}
+
+# Pre-generated AI companion message bank (see generate_message_bank.py)
+AI_MESSAGE_BANK_PATH = os.environ.get("AI_MESSAGE_BANK_PATH", "ai_message_bank.json")
+
+# LLM Circuit Breaker
+LLM_CIRCUIT_BREAKER_CONFIG = {
+    "window_size": int(os.environ.get("LLM_BREAKER_WINDOW", 20)),  # Recent calls considered
+    "min_calls": int(os.environ.get("LLM_BREAKER_MIN_CALLS", 5)),  # Calls needed before tripping
+    "error_rate_threshold": float(os.environ.get("LLM_BREAKER_ERROR_RATE", 0.5)),
+    "slow_call_seconds": float(os.environ.get("LLM_BREAKER_SLOW_CALL_SECONDS", 5)),
+    "slow_call_rate_threshold": float(os.environ.get("LLM_BREAKER_SLOW_CALL_RATE", 0.8)),
+    "open_seconds": float(os.environ.get("LLM_BREAKER_OPEN_SECONDS", 30)),  # Wait before probing again
+    "half_open_max_calls": int(os.environ.get("LLM_BREAKER_HALF_OPEN_CALLS", 1)),
+    # A probe that never reports back (e.g. lost to a merged call) frees its slot after this long
+    "probe_timeout_seconds": float(os.environ.get("LLM_BREAKER_PROBE_TIMEOUT_SECONDS", 30))
+}
+
+# Latency budget for /api/ai/message before the fallback message is used
+AI_MESSAGE_DEADLINE_SECONDS = float(os.environ.get("AI_MESSAGE_DEADLINE_SECONDS", 5))
+
+# Outbound LLM Concurrency Limiter
+LLM_LIMITER_CONFIG = {
+    "rate_per_second": float(os.environ.get("LLM_RATE_PER_SECOND", 5)),  # Token bucket refill rate
+    "burst": int(os.environ.get("LLM_RATE_BURST", 10)),  # Token bucket capacity
+    "max_in_flight": int(os.environ.get("LLM_MAX_IN_FLIGHT", 8)),
+    "max_queue_depth": int(os.environ.get("LLM_MAX_QUEUE_DEPTH", 40)),
+    "max_estimated_wait_seconds": float(os.environ.get("LLM_MAX_ESTIMATED_WAIT", 2)),
+    "shed_priority": int(os.environ.get("LLM_SHED_PRIORITY", 2))  # Priorities at or above this may be shed
+}
+
+# Lower numbers are served first when LLM calls are queued
+LLM_MESSAGE_PRIORITIES = {
+    "stage_transition": 0,
+    "struggle_support": 0,
+    "welcome": 1,
+    "completion": 1,
+    "encouragement": 2
+}
+LLM_DEFAULT_PRIORITY = 1
+
+# Provider prompt caching for stable prompt prefixes (the tutor system prompt)
+LLM_PROMPT_CACHING = os.environ.get("LLM_PROMPT_CACHING", "true").lower() != "false"
+
+# Speculative generation of the next companion message while the student reads feedback
+AI_PREFETCH_CONFIG = {
+    "enabled": os.environ.get("AI_PREFETCH_ENABLED", "true").lower() != "false",
+    "ttl_seconds": float(os.environ.get("AI_PREFETCH_TTL_SECONDS", 60)),  # Unclaimed results are discarded after this
+    # How long a request waits for a prefetch still running before generating the message itself
+    "take_wait_ms": float(os.environ.get("AI_PREFETCH_TAKE_WAIT_MS", 150)),
+    "max_workers": int(os.environ.get("AI_PREFETCH_WORKERS", 4)),
+    "max_entries": int(os.environ.get("AI_PREFETCH_MAX_ENTRIES", 1000))
+}
+
+# Stage descriptions used in companion prompts (mirrors getStageDescription in practice_common.js)
+STAGE_DESCRIPTIONS = {
+    "1.1": "rounding to 1 decimal place without rounding up",
+    "1.2": "rounding to 1 decimal place with rounding up",
+    "1.3": "rounding to 1 decimal place with mixed problems",
+    "2.1": "rounding to 2 decimal places",
+    "2.2": "rounding to 2 decimal places with more complex numbers",
+    "stretch": "challenging rounding problems",
+    "complete": "all rounding concepts"
+}
+
+# AI companion conversation memory (kept server-side, referenced from the session by id)
+AI_CONVERSATION_CONFIG = {
+    "max_window_tokens": int(os.environ.get("AI_HISTORY_MAX_TOKENS", 400)),  # Recent turns sent to the LLM
+    "max_summary_chars": int(os.environ.get("AI_HISTORY_SUMMARY_CHARS", 400)),  # Older turns fold into this
+    "store_path": os.environ.get("AI_CONVERSATION_STORE_PATH", "ai_conversations.sqlite3"),  # "" keeps them in memory
+    "ttl_seconds": int(os.environ.get("AI_CONVERSATION_TTL_SECONDS", 24 * 60 * 60)),
+    "max_entries": int(os.environ.get("AI_CONVERSATION_MAX_ENTRIES", 10000))
+}
+
+# LLM record/replay cassette: "off", "record" (call the API and save responses) or "replay" (no network)
+LLM_CASSETTE_CONFIG = {
+    "mode": os.environ.get("LLM_CASSETTE_MODE", "off").lower(),
+    "path": os.environ.get("LLM_CASSETTE_PATH", "llm_cassette.jsonl")
+}
+
+# LLM price list in USD per million tokens, used for cost telemetry
+LLM_PRICING = {
+    "claude-3-haiku-20240307": {"input": 0.25, "output": 1.25, "cache_write": 0.30, "cache_read": 0.03},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.00, "cache_write": 1.00, "cache_read": 0.08},
+    "claude-3-5-sonnet-20241022": {"input": 3.00, "output": 15.00, "cache_write": 3.75, "cache_read": 0.30}
+}
+LLM_DEFAULT_PRICING = {"input": 3.00, "output": 15.00, "cache_write": 3.75, "cache_read": 0.30}
+
+# Per-session LLM telemetry is kept for this many recent sessions
+LLM_TELEMETRY_MAX_SESSIONS = int(os.environ.get("LLM_TELEMETRY_MAX_SESSIONS", 500))
+
+# Most companion messages accepted by one /api/ai/messages/batch request
+AI_BATCH_MAX_ITEMS = int(os.environ.get("AI_BATCH_MAX_ITEMS", 6))
+
+# Bundled companion messages: one LLM call also writes the stage's other messages of these types
+AI_BUNDLE_CONFIG = {
+    "enabled": os.environ.get("AI_BUNDLE_ENABLED", "true").lower() == "true",
+    "message_types": ["encouragement", "struggle_support", "stage_transition"],
+    "max_tokens": int(os.environ.get("AI_BUNDLE_MAX_TOKENS", 400)),  # Output budget for a bundle call
+    "timeout_seconds": float(os.environ.get("AI_BUNDLE_TIMEOUT", 30)),  # Read timeout, instead of the route's
+    # Calls with a shorter deadline (e.g. a student waiting) get a single message; the prefetcher,
+    # which has no deadline, writes the bundles
+    "min_deadline_seconds": float(os.environ.get("AI_BUNDLE_MIN_DEADLINE", 20))
+}
+
+# Hedged LLM requests: a second identical request is sent when the first is slower than recent calls
+LLM_HEDGE_CONFIG = {
+    "enabled": os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true",
+    "percentile": float(os.environ.get("LLM_HEDGE_PERCENTILE", 0.95)),  # Hedge after this latency percentile
+    "window_size": int(os.environ.get("LLM_HEDGE_WINDOW", 200)),  # Recent calls the percentile is taken over
+    "min_samples": int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", 20)),  # Calls needed before hedging starts
+    "min_delay_seconds": float(os.environ.get("LLM_HEDGE_MIN_DELAY", 0.1)),
+    "max_hedge_fraction": float(os.environ.get("LLM_HEDGE_MAX_FRACTION", 0.1)),  # Of recent requests
+    "holdout_fraction": float(os.environ.get("LLM_HEDGE_HOLDOUT", 0.05))  # Never hedged, as a baseline
+}
+
+# LLM routing per companion message type; unset fields come from LLM_DEFAULT_ROUTE ("model": None is LLM_MODEL)
+LLM_DEFAULT_ROUTE = {
+    "model": None,
+    "max_tokens": 150,
+    "temperature": 0.7,
+    "timeout_seconds": None,  # Read timeout; None uses LLM_READ_TIMEOUT
+    "latency_budget_ms": None  # Downgrade to the fastest model while this model is slower than this
+}
+LLM_MODEL_ROUTES = {
+    "welcome": {"max_tokens": 150},
+    "encouragement": {"max_tokens": 150, "timeout_seconds": 5},
+    "completion": {"max_tokens": 150},
+    "stage_transition": {"max_tokens": 150},
+    "struggle_support": {
+        # LLM_MODEL unless a deployment opts in to a larger (costlier) model, e.g. claude-3-5-sonnet-20241022
+        "model": os.environ.get("LLM_SUPPORT_MODEL") or None,
+        "max_tokens": 200,
+        "latency_budget_ms": float(os.environ.get("LLM_SUPPORT_LATENCY_BUDGET_MS", 3000))
+    }
+}
+LLM_ROUTER_CONFIG = {
+    "window_seconds": float(os.environ.get("LLM_ROUTER_WINDOW_SECONDS", 120)),  # Latency samples expire after this
+    "min_samples": int(os.environ.get("LLM_ROUTER_MIN_SAMPLES", 5)),  # Needed before a model is judged
+    "percentile": float(os.environ.get("LLM_ROUTER_PERCENTILE", 0.9)),  # Compared with latency_budget_ms
+    "fast_model": os.environ.get("LLM_FAST_MODEL", "claude-3-haiku-20240307")  # Used before others are measured
+}
+
+# Local answers to free-form student questions, looked up before asking the LLM
+AI_ANSWER_INDEX_CONFIG = {
+    "enabled": os.environ.get("AI_ANSWER_INDEX_ENABLED", "true").lower() == "true",
+    "min_confidence": float(os.environ.get("AI_ANSWER_MIN_CONFIDENCE", 0.7)),  # Share of the question matched
+    "min_matched_terms": int(os.environ.get("AI_ANSWER_MIN_MATCHED_TERMS", 2)),  # So "round?" alone isn't enough
+    "k1": 1.2,  # BM25 term frequency saturation
+    "b": 0.75,  # BM25 document length normalization
+    "max_question_chars": int(os.environ.get("AI_QUESTION_MAX_CHARS", 300))
+}
+
+# Server-side Flask sessions: the cookie only carries a session id
+SESSION_STORE_CONFIG = {
+    "backend": os.environ.get("SESSION_BACKEND", "sqlite").lower(),  # "memory", "sqlite", "redis" or "cookie"
+    "sqlite_path": os.environ.get("SESSION_SQLITE_PATH", "sessions.sqlite3"),
+    "redis_url": os.environ.get("SESSION_REDIS_URL", "redis://localhost:6379/0"),  # Any Redis-compatible server
+    "cookie_name": os.environ.get("SESSION_COOKIE_NAME", "tutor_sid"),
+    "ttl_seconds": int(os.environ.get("SESSION_TTL_SECONDS", 7 * 24 * 3600)),
+    "max_entries": int(os.environ.get("SESSION_MAX_ENTRIES", 50000)),
+    "cache_entries": int(os.environ.get("SESSION_CACHE_ENTRIES", 2000)),  # Recent sessions cached per worker
+    # 0 writes every save straight through. Batching saves for this long is only safe with sticky
+    # routing: another worker serving the same session would read, and overwrite, the older state
+    "flush_interval_ms": float(os.environ.get("SESSION_FLUSH_INTERVAL_MS", 0)),
+    "max_batch": int(os.environ.get("SESSION_MAX_BATCH", 200))
+}
+
+# Compact binary encoding of the learning state and student profile inside the session
+SESSION_CODEC_CONFIG = {
+    "enabled": os.environ.get("SESSION_CODEC_ENABLED", "true").lower() == "true",
+    "compress_min_bytes": int(os.environ.get("SESSION_CODEC_COMPRESS_MIN_BYTES", 96))  # Try zlib from this size
+}
+
+# Durable log of every answered question, with a running profile snapshot per student
+STUDENT_EVENT_LOG_CONFIG = {
+    "enabled": os.environ.get("STUDENT_EVENT_LOG_ENABLED", "true").lower() == "true",
+    "path": os.environ.get("STUDENT_EVENT_LOG_PATH", "student_events.sqlite3"),
+    "flush_interval_ms": float(os.environ.get("STUDENT_EVENT_LOG_FLUSH_INTERVAL_MS", 50)),  # Group commit window
+    "max_batch": int(os.environ.get("STUDENT_EVENT_LOG_MAX_BATCH", 500)),
+    "history_events": int(os.environ.get("STUDENT_EVENT_LOG_HISTORY_EVENTS", 10)),  # Tail loaded into a profile
+    "cache_entries": int(os.environ.get("STUDENT_EVENT_LOG_CACHE_ENTRIES", 2000))  # Students' tails cached per worker
+}
+
+# Answer history kept in memory per student profile; the student event log keeps all of it
+STUDENT_PROFILE_CONFIG = {
+    "recent_window": 5,  # Answers behind the trend, learns-from-mistakes and recent performance metrics
+    "history_limit": int(os.environ.get("STUDENT_PROFILE_HISTORY_LIMIT", 200))
+}
@@ -1,9 +1,90 @@
 """Provides explanations and feedback for rounding questions."""
 
+import decimal
+
+# The rounding method, worded once for worked explanations and for answers to students' questions
+ROUNDING_STEPS = (
+    "Identify the digit in the target decimal place.",
+    "Look at the digit to the right of this target digit.",
+    "Apply the rounding rule.",
+    "Remove all digits after the target decimal place."
+)
+ROUNDING_RULE = ("If the digit to the right is 5 or more, we round up the target digit. "
+                 "If it is less than 5, we keep the target digit the same.")
+PLACE_NAMES = {1: "tenths", 2: "hundredths", 3: "thousandths"}
+
+
 class ContentService:
     """Handles generation of explanations and feedback for rounding questions."""
 
-    def get_explanation(self, question, verification_steps):
+    def get_concept_explanations(self):
+        """Returns answers to common student questions, each with a few ways of asking it.
+        
+        Answers are built from the same step wording as the worked explanations, and
+        explain the method without solving any particular question.
+        """
+        steps = " ".join(
+            f"Step {number}: {step}" + (f" {ROUNDING_RULE}" if number == 3 else "")
+            for number, step in enumerate(ROUNDING_STEPS, 1)
+        )
+        places = ", ".join(
+            f"the {places}{self._get_ordinal_suffix(places)} is the {name}" for places, name in PLACE_NAMES.items()
+        )
+        explanations = [
+            {
+                "questions": ["How do I round a decimal?", "What are the steps for rounding?", "How does rounding work?"],
+                "answer": steps
+            },
+            {
+                "questions": ["How do I know whether to round up or down?", "When do I round up?",
+                              "What is the rounding rule?", "Does 5 round up or down?"],
+                "answer": f"{ROUNDING_STEPS[0]} {ROUNDING_STEPS[1]} {ROUNDING_RULE}"
+            },
+            {
+                "questions": ["Which digit do I look at?", "Which digit decides the rounding?", "What is the target digit?"],
+                "answer": f"Step 1: {ROUNDING_STEPS[0]} Step 2: {ROUNDING_STEPS[1]} That digit decides the rounding: "
+                          f"{ROUNDING_RULE}"
+            },
+            {
+                "questions": ["What happens to the digits after the target digit?", "Do I keep the other digits?"],
+                "answer": f"Once you have applied the rounding rule: {ROUNDING_STEPS[3]}"
+            },
+            {
+                "questions": ["What does decimal place mean?", "What is a decimal place?",
+                              "What are tenths, hundredths and thousandths?"],
+                "answer": f"Decimal places are counted from the decimal point: {places}."
+            }
+        ]
+        for places, name in PLACE_NAMES.items():
+            unit = "place" if places == 1 else "places"
+            explanations.append({
+                "questions": [f"How do I round to {places} decimal {unit}?", f"How do I round to the nearest {name[:-1]}?"],
+                "answer": f"The target decimal place is the {places}{self._get_ordinal_suffix(places)} digit after "
+                          f"the decimal point (the {name}). {steps}"
+            })
+        return explanations
+
+    def get_worked_example(self, number, decimal_places, include_answer=True):
+        """Builds the step-by-step explanation for rounding number (a string) to decimal_places.
+        
+        Without include_answer the steps stop short of the rounded result.
+        """
+        answer = str(decimal.Decimal(number).quantize(
+            decimal.Decimal(1).scaleb(-decimal_places), rounding=decimal.ROUND_HALF_UP
+        ))
+        target_index = number.find(".") + decimal_places
+        right_index = target_index + 1
+        target_digit = number[target_index] if target_index < len(number) else "0"
+        right_digit = number[right_index] if right_index < len(number) else "0"
+        question = {"original_question": {"number": number, "decimal_places": decimal_places, "answer": answer}}
+        verification_steps = {
+            "target_digit": target_digit,
+            "right_digit": right_digit,
+            "round_up": int(right_digit) >= 5
+        }
+        return self.get_explanation(question, verification_steps, include_answer)
+
+    def get_explanation(self, question, verification_steps, include_answer=True):
         """
         Gets a hardcoded explanation for a question.
         Used for modeling examples.
@@ -22,29 +103,34 @@ class ContentService:
         round_action = "round up" if should_round_up else "keep the same"
         
         change_text = f"This means we change {target_digit} to {int(target_digit) + 1}." if should_round_up else f"This means we keep {target_digit} as is."
+        final_text = f"The final answer is {answer}."
+        if not include_answer:
+            change_text = ""
+            final_text = "What number does that leave you with?"
         
+
         explanation = f"""
         Let's work through how to round {number} to {decimal_places} decimal place(s).
 
-        Step 1: Identify the digit in the target decimal place.
+        Step 1: {ROUNDING_STEPS[0]}
         
         The target decimal place is the {decimal_places}{ordinal} digit after the decimal point.
         
         In {number}, this digit is {target_digit}.
         
-        Step 2: Look at the digit to the right of this target digit.
+        Step 2: {ROUNDING_STEPS[1]}
         
         The digit to the right of {target_digit} is {right_digit}.
         
-        Step 3: Apply the rounding rule.
+        Step 3: {ROUNDING_STEPS[2]}
         
         Since {right_digit} is {'5 or more' if should_round_up else 'less than 5'}, we {round_action} the target digit.
         
         {change_text}
         
-        Step 4: Remove all digits after the target decimal place.
+        Step 4: {ROUNDING_STEPS[3]}
         
-        The final answer is {answer}.
+        {final_text}
         """
         
         return explanation
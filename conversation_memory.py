@@ -0,0 +1,109 @@
+"""Token-bounded AI companion conversation history with a rolling summary of older turns."""
+
+from config import AI_CONVERSATION_CONFIG
+
+# Keep this many folded-away companion messages around to steer new messages away from repeats
+RECENT_FOLDED_MESSAGES = 3
+
+
+def estimate_tokens(text):
+    """Rough estimation: 1 token ≈ 4 characters for English text."""
+    return len(text) // 4 + 1
+
+
+class ConversationMemory:
+    """Recent companion exchanges, plus a compact record of the ones folded out of the window.
+
+    Each exchange is one prompt and the companion's reply. Once the exchanges exceed
+    max_window_tokens, the oldest are folded into per-type counts and a few recent message
+    snippets, so the stored size and the tokens sent to the LLM stay flat however long the
+    lesson runs.
+
+    It also holds messages the LLM wrote ahead of time in a bundle, each usable once while
+    the student is still on the stage it was written for.
+    """
+
+    def __init__(self, exchanges=None, folded_counts=None, folded_messages=None, bundled=None,
+                 max_window_tokens=None, max_summary_chars=None):
+        self.exchanges = list(exchanges or [])  # dicts with message_type, user, assistant
+        self.folded_counts = dict(folded_counts or {})
+        self.folded_messages = list(folded_messages or [])
+        self.bundled = dict(bundled or {})  # message_type -> {"stage": ..., "message": ...}
+        self.max_window_tokens = max_window_tokens or AI_CONVERSATION_CONFIG["max_window_tokens"]
+        self.max_summary_chars = max_summary_chars or AI_CONVERSATION_CONFIG["max_summary_chars"]
+
+    def add_exchange(self, message_type, user, assistant):
+        self.exchanges.append({"message_type": message_type, "user": user.strip(), "assistant": assistant.strip()})
+        self.compact()
+
+    def last_exchange(self):
+        return dict(self.exchanges[-1]) if self.exchanges else None
+
+    def compact(self):
+        """Folds the oldest exchanges into the summary until the window fits its token budget."""
+        while self.exchanges and self._window_tokens() > self.max_window_tokens:
+            exchange = self.exchanges.pop(0)
+            message_type = exchange.get("message_type") or "general"
+            self.folded_counts[message_type] = self.folded_counts.get(message_type, 0) + 1
+            self.folded_messages = (self.folded_messages + [exchange["assistant"]])[-RECENT_FOLDED_MESSAGES:]
+
+    def store_bundled(self, stage, messages):
+        """Keeps messages (message_type -> text) written ahead of time for the given stage."""
+        for message_type, message in messages.items():
+            self.bundled[message_type] = {"stage": stage, "message": message}
+
+    def has_bundled(self, message_type, stage):
+        entry = self.bundled.get(message_type)
+        return entry is not None and entry["stage"] == stage
+
+    def take_bundled(self, message_type, stage):
+        """Returns and removes the bundled message of this type, if it was written for this stage."""
+        if not self.has_bundled(message_type, stage):
+            return None
+        return self.bundled.pop(message_type)["message"]
+
+    def _window_tokens(self):
+        return sum(estimate_tokens(e["user"]) + estimate_tokens(e["assistant"]) for e in self.exchanges)
+
+    def window(self):
+        """Returns the retained exchanges as alternating user/assistant messages, oldest first."""
+        messages = []
+        for exchange in self.exchanges:
+            messages.append({"role": "user", "content": exchange["user"]})
+            messages.append({"role": "assistant", "content": exchange["assistant"]})
+        return messages
+
+    def get_summary(self):
+        """Returns a short description of the folded-away turns, or None if nothing was folded."""
+        if not self.folded_counts:
+            return None
+
+        counts = ", ".join(
+            f"{count} {message_type.replace('_', ' ')}" for message_type, count in self.folded_counts.items()
+        )
+        summary = f"Earlier in this lesson you already sent these messages: {counts}."
+        # Most recent snippets first, as many as fit
+        for text in reversed(self.folded_messages):
+            line = f'\nAvoid repeating: "{text}"'
+            if len(summary) + len(line) > self.max_summary_chars:
+                break
+            summary += line
+        return summary[:self.max_summary_chars]
+
+    def to_dict(self):
+        return {
+            "exchanges": self.exchanges,
+            "folded_counts": self.folded_counts,
+            "folded_messages": self.folded_messages,
+            "bundled": self.bundled
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(
+            exchanges=data.get("exchanges"),
+            folded_counts=data.get("folded_counts"),
+            folded_messages=data.get("folded_messages"),
+            bundled=data.get("bundled")
+        )
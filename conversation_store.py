@@ -0,0 +1,161 @@
+"""Server-side storage for AI companion conversations, so the session cookie only carries an id."""
+
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from config import AI_CONVERSATION_CONFIG
+from services.conversation_memory import ConversationMemory
+
+logger = logging.getLogger(__name__)
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+class ConversationStore:
+    """Maps conversation ids to ConversationMemory, in SQLite (shared by workers) or in memory."""
+
+    def __init__(self, store_path=None, ttl_seconds=None, max_entries=None):
+        self.store_path = AI_CONVERSATION_CONFIG["store_path"] if store_path is None else store_path
+        self.ttl_seconds = ttl_seconds or AI_CONVERSATION_CONFIG["ttl_seconds"]
+        self.max_entries = max_entries or AI_CONVERSATION_CONFIG["max_entries"]
+
+        self._memory = OrderedDict()  # Used when there is no store_path: id -> (data, updated_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._saves_since_eviction = 0
+        self._stats = {"loads": 0, "saves": 0, "evictions": 0, "errors": 0}
+
+        if self.store_path:
+            self._init_disk()
+
+    def load(self, conversation_id):
+        """Returns the conversation's memory (empty for unknown or expired ids)."""
+        with self._lock:
+            self._stats["loads"] += 1
+        data = self._get_disk(conversation_id) if self.store_path else self._get_memory(conversation_id)
+        return ConversationMemory.from_dict(data)
+
+    def save(self, conversation_id, memory):
+        with self._lock:
+            self._stats["saves"] += 1
+        data = memory.to_dict()
+        if self.store_path:
+            self._put_disk(conversation_id, data)
+        else:
+            self._put_memory(conversation_id, data)
+
+    def delete(self, conversation_id):
+        if self.store_path:
+            try:
+                self._connection().execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            except sqlite3.Error as e:
+                self._record_error(e)
+        else:
+            with self._lock:
+                self._memory.pop(conversation_id, None)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = "sqlite" if self.store_path else "memory"
+        return stats
+
+    # Memory backend
+
+    def _get_memory(self, conversation_id):
+        with self._lock:
+            entry = self._memory.get(conversation_id)
+            if entry is None or entry[1] < time.time() - self.ttl_seconds:
+                return None
+            return entry[0]
+
+    def _put_memory(self, conversation_id, data):
+        with self._lock:
+            self._memory[conversation_id] = (data, time.time())
+            self._memory.move_to_end(conversation_id)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    # SQLite backend
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.store_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_disk(self):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)")
+        except sqlite3.Error as e:
+            logger.warning(f"AI conversation store falling back to memory: {e}")
+            self.store_path = ""
+
+    def _get_disk(self, conversation_id):
+        try:
+            row = self._connection().execute(
+                "SELECT data FROM conversations WHERE id = ? AND updated_at >= ?",
+                (conversation_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._record_error(e)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _put_disk(self, conversation_id, data):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (id, data, updated_at) VALUES (?, ?, ?)",
+                (conversation_id, json.dumps(data), time.time())
+            )
+            with self._lock:
+                self._saves_since_eviction += 1
+                should_evict = self._saves_since_eviction >= 100
+                if should_evict:
+                    self._saves_since_eviction = 0
+            if should_evict:
+                self._evict_disk(conn)
+        except sqlite3.Error as e:
+            self._record_error(e)
+
+    def _evict_disk(self, conn):
+        """Drops expired conversations and the least recently updated beyond max_entries."""
+        expired = conn.execute(
+            "DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            "DELETE FROM conversations WHERE id IN ("
+            "SELECT id FROM conversations ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        with self._lock:
+            self._stats["evictions"] += expired + overflow
+
+    def _record_error(self, error):
+        logger.warning(f"AI conversation store error: {error}")
+        with self._lock:
+            self._stats["errors"] += 1
+
+
+def get_conversation_store():
+    """Returns the worker-wide conversation store, creating it on first use."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = ConversationStore()
+    return _shared_store
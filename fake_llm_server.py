@@ -0,0 +1,404 @@
+"""
+Local stand-in for the LLM Messages API, for load and latency testing without the network.
+
+Usage:
+    python fake_llm_server.py --port 8090 --latency lognormal --latency-ms 800 --error-rate 0.05
+
+Then point the tutor at it:
+    LLM_API_URL=http://127.0.0.1:8090/v1/messages LLM_API_KEY=fake python app.py
+
+Accepts the same headers and payload as the real API and returns well-formed
+message (or streamed event) responses. Latency distribution, error, 429 and
+timeout rates can be changed while it runs by POSTing JSON to /fake/config;
+counters are at GET /fake/stats.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "normal", "lognormal"]
+
+DEFAULT_CONFIG = {
+    "latency": "lognormal",  # Distribution of time before the first byte
+    "latency_ms": 600.0,  # Mean (or fixed value)
+    "latency_jitter_ms": 300.0,  # Spread: half-width for uniform, standard deviation otherwise
+    "token_delay_ms": 20.0,  # Gap between streamed text chunks
+    "error_rate": 0.0,  # Share of requests answered 500 api_error
+    "rate_limit_rate": 0.0,  # Share answered 429 rate_limit_error
+    "timeout_rate": 0.0,  # Share that hang for timeout_seconds, then drop the connection
+    "timeout_seconds": 30.0,
+    "retry_after_seconds": 1
+}
+
+REPLIES = {
+    "welcome": [
+        "Hi, I'm Math Helper! I'm excited to practice rounding decimals with you today.",
+        "Hello there! I'm Math Helper, and I can't wait to help you become a rounding pro."
+    ],
+    "encouragement": [
+        "Fantastic streak! You're checking the next digit carefully every time.",
+        "Wow, you're on a roll! Your rounding is getting more confident with every question."
+    ],
+    "stage_transition": [
+        "Brilliant work, you've mastered that stage! Next we'll round to a new place value.",
+        "Level up! You've nailed this stage, so let's try something a little trickier."
+    ],
+    "struggle_support": [
+        "That's okay, rounding takes practice! Look at the digit just to the right of the place you're rounding to.",
+        "Mistakes help us learn. Take a breath and check which digit decides whether to round up."
+    ],
+    "completion": [
+        "Congratulations, you finished the lesson! You can now round decimals like a pro.",
+        "You did it! You've mastered rounding to one and two decimal places."
+    ],
+    "general": [
+        "I'm here to help with your rounding practice. Keep going!"
+    ]
+}
+
+
+class FakeLLMState:
+    """Live configuration, counters and the simulated prompt cache, shared by all handler threads."""
+
+    def __init__(self, **config):
+        self.lock = threading.Lock()
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.cached_prefixes = set()
+        self.stats = {"requests": 0, "ok": 0, "streamed": 0, "errors": 0, "rate_limited": 0,
+                      "timeouts": 0, "invalid": 0}
+
+    def update_config(self, changes):
+        with self.lock:
+            unknown = set(changes) - set(self.config)
+            if unknown:
+                raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+            if changes.get("latency", self.config["latency"]) not in LATENCY_DISTRIBUTIONS:
+                raise ValueError(f"latency must be one of {LATENCY_DISTRIBUTIONS}")
+            self.config.update(changes)
+            return dict(self.config)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def sample_latency(self):
+        """Returns seconds to wait before responding, drawn from the configured distribution."""
+        config = self.config
+        mean, jitter = config["latency_ms"], config["latency_jitter_ms"]
+        if config["latency"] == "uniform":
+            value = random.uniform(mean - jitter, mean + jitter)
+        elif config["latency"] == "normal":
+            value = random.gauss(mean, jitter)
+        elif config["latency"] == "lognormal" and mean > 0:
+            # Parameterized so the samples have the requested mean and standard deviation
+            sigma_squared = math.log(1 + (jitter / mean) ** 2)
+            mu = math.log(mean) - sigma_squared / 2
+            value = random.lognormvariate(mu, sigma_squared ** 0.5)
+        else:
+            value = mean
+        return max(value, 0.0) / 1000
+
+    def pick_outcome(self):
+        """Returns 'timeout', 'rate_limited', 'error' or 'ok' according to the configured rates."""
+        roll = random.random()
+        for outcome, rate_key in (("timeout", "timeout_rate"), ("rate_limited", "rate_limit_rate"),
+                                  ("error", "error_rate")):
+            rate = self.config[rate_key]
+            if roll < rate:
+                return outcome
+            roll -= rate
+        return "ok"
+
+    def cache_usage(self, data):
+        """Simulates prompt caching: a cache_control prefix is written once, then read."""
+        system = data.get("system")
+        if not isinstance(system, list):
+            return 0, 0
+        prefix = ""
+        for block in system:
+            prefix += block.get("text", "")
+            if block.get("cache_control"):
+                key = hashlib.sha256(f"{data.get('model')}:{prefix}".encode("utf-8")).hexdigest()
+                tokens = estimate_tokens(prefix)
+                with self.lock:
+                    if key in self.cached_prefixes:
+                        return 0, tokens
+                    self.cached_prefixes.add(key)
+                return tokens, 0
+        return 0, 0
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def message_text(content):
+    """Flattens a message's content (a string or a list of blocks) to text."""
+    if isinstance(content, list):
+        return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return str(content)
+
+
+def validate_request(headers, data):
+    """Returns an error message for requests the real API would reject, else None."""
+    if not headers.get("x-api-key"):
+        return "x-api-key header is required"
+    if not headers.get("anthropic-version"):
+        return "anthropic-version header is required"
+    if not isinstance(data, dict):
+        return "Request body must be a JSON object"
+    for field in ("model", "messages", "max_tokens"):
+        if field not in data:
+            return f"{field}: Field required"
+    messages = data["messages"]
+    if not isinstance(messages, list) or not messages:
+        return "messages: at least one message is required"
+    for i, message in enumerate(messages):
+        if not isinstance(message, dict) or message.get("role") not in ("user", "assistant"):
+            return f"messages.{i}.role: Input should be 'user' or 'assistant'"
+        if "content" not in message:
+            return f"messages.{i}.content: Field required"
+    return None
+
+
+def compose_reply(data):
+    """Picks a plausible companion reply for the prompt, trimmed to max_tokens."""
+    prompt = message_text(data["messages"][-1].get("content", "")).lower()
+    bundle = re.search(r"json object with the keys ([a-z_, ]+), each", prompt)
+    if "connected" in prompt:
+        text = "connected"
+    elif bundle:
+        keys = [key.strip() for key in bundle.group(1).split(",") if key.strip()]
+        text = json.dumps({key: random.choice(REPLIES.get(key, REPLIES["general"])) for key in keys})
+    elif "say hello" in prompt:
+        text = "Hello! How can I help you today?"
+    else:
+        if "introduce" in prompt or "welcome" in prompt:
+            message_type = "welcome"
+        elif "transition" in prompt:
+            message_type = "stage_transition"
+        elif "incorrect" in prompt or "struggl" in prompt:
+            message_type = "struggle_support"
+        elif "completed the lesson" in prompt:
+            message_type = "completion"
+        elif "correctly in a row" in prompt or "encourage" in prompt:
+            message_type = "encouragement"
+        else:
+            message_type = "general"
+        text = random.choice(REPLIES[message_type])
+
+    words = text.split(" ")
+    max_words = max(int(data.get("max_tokens", 150) * 0.75), 1)
+    stop_reason = "end_turn" if len(words) <= max_words else "max_tokens"
+    return " ".join(words[:max_words]), stop_reason
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeLLM/1.0"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path == "/fake/stats":
+            with self.state.lock:
+                self._send_json(200, {"stats": dict(self.state.stats), "config": dict(self.state.config)})
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, self._error_body("not_found_error", f"No route for GET {self.path}"))
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        except json.JSONDecodeError:
+            body = None
+
+        if self.path == "/fake/config":
+            try:
+                self._send_json(200, self.state.update_config(body or {}))
+            except (ValueError, AttributeError, TypeError) as e:
+                self._send_json(400, self._error_body("invalid_request_error", str(e)))
+            return
+        if self.path.rstrip("/") != "/v1/messages":
+            self._send_json(404, self._error_body("not_found_error", f"No route for POST {self.path}"))
+            return
+        self._handle_messages(body)
+
+    def _handle_messages(self, data):
+        state = self.state
+        state.count("requests")
+        error = validate_request(self.headers, data)
+        if error:
+            state.count("invalid")
+            self._send_json(400, self._error_body("invalid_request_error", error))
+            return
+
+        outcome = state.pick_outcome()
+        if outcome == "timeout":
+            state.count("timeouts")
+            time.sleep(state.config["timeout_seconds"])
+            self.close_connection = True
+            return
+
+        time.sleep(state.sample_latency())
+        if outcome == "rate_limited":
+            state.count("rate_limited")
+            self._send_json(429, self._error_body("rate_limit_error", "Number of requests has exceeded your rate limit"),
+                            {"retry-after": str(state.config["retry_after_seconds"])})
+            return
+        if outcome == "error":
+            state.count("errors")
+            self._send_json(500, self._error_body("api_error", "Internal server error"))
+            return
+
+        text, stop_reason = compose_reply(data)
+        cache_creation, cache_read = state.cache_usage(data)
+        system_text = data.get("system", "")
+        prompt_text = message_text(system_text) + " ".join(message_text(m.get("content", "")) for m in data["messages"])
+        usage = {
+            "input_tokens": max(estimate_tokens(prompt_text) - cache_creation - cache_read, 1),
+            "cache_creation_input_tokens": cache_creation,
+            "cache_read_input_tokens": cache_read,
+            "output_tokens": estimate_tokens(text)
+        }
+        message = {
+            "id": f"msg_fake_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": data["model"],
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage
+        }
+        if data.get("stream"):
+            state.count("streamed")
+            self._stream_message(message)
+        else:
+            state.count("ok")
+            self._send_json(200, message)
+
+    def _stream_message(self, message):
+        """Sends the message as the API's Server-Sent Events sequence, one word per delta."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("request-id", f"req_fake_{uuid.uuid4().hex[:24]}")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        text = message["content"][0]["text"]
+        start_usage = {**message["usage"], "output_tokens": 1}
+        events = [
+            ("message_start", {"type": "message_start", "message": {
+                **message, "content": [], "stop_reason": None, "usage": start_usage}}),
+            ("content_block_start", {"type": "content_block_start", "index": 0,
+                                     "content_block": {"type": "text", "text": ""}}),
+            ("ping", {"type": "ping"})
+        ]
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = word if i == len(words) - 1 else word + " "
+            events.append(("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                   "delta": {"type": "text_delta", "text": chunk}}))
+        events += [
+            ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+            ("message_delta", {"type": "message_delta",
+                               "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                               "usage": {"output_tokens": message["usage"]["output_tokens"]}}),
+            ("message_stop", {"type": "message_stop"})
+        ]
+        try:
+            for event, payload in events:
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if event == "content_block_delta":
+                    time.sleep(self.state.config["token_delay_ms"] / 1000)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up mid-stream
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("request-id", f"req_fake_{uuid.uuid4().hex[:24]}")
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _error_body(error_type, message):
+        return {"type": "error", "error": {"type": error_type, "message": message}}
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hanging up early (timeouts, cancelled hedges) are expected, not server errors
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def create_server(host="127.0.0.1", port=0, verbose=False, **config):
+    """Creates (but does not start) a fake server; server.url is its Messages endpoint."""
+    server = FakeLLMServer((host, port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.state = FakeLLMState(**config)
+    server.verbose = verbose
+    server.url = f"http://{host}:{server.server_port}/v1/messages"
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, verbose=False, **config):
+    """Starts a fake server on a background thread, e.g. inside a test or benchmark script."""
+    server = create_server(host, port, verbose, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default=DEFAULT_CONFIG["latency"])
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_CONFIG["latency_ms"])
+    parser.add_argument("--latency-jitter-ms", type=float, default=DEFAULT_CONFIG["latency_jitter_ms"])
+    parser.add_argument("--token-delay-ms", type=float, default=DEFAULT_CONFIG["token_delay_ms"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=DEFAULT_CONFIG["rate_limit_rate"])
+    parser.add_argument("--timeout-rate", type=float, default=DEFAULT_CONFIG["timeout_rate"])
+    parser.add_argument("--timeout-seconds", type=float, default=DEFAULT_CONFIG["timeout_seconds"])
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key in DEFAULT_CONFIG}
+    server = create_server(args.host, args.port, args.verbose, **config)
+    print(f"Fake LLM API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
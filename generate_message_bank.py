@@ -0,0 +1,103 @@
+"""
+Pre-generate AI companion message variants for every message type and stage.
+
+Usage:
+    python generate_message_bank.py --variants 8 --concurrency 6 --output ai_message_bank.json
+
+Variants may contain {slot} placeholders (see message_bank.MESSAGE_SLOTS) that
+AICompanion fills in locally, so most companion messages never reach the LLM.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import STAGES, AI_MESSAGE_BANK_PATH
+from models.ai_companion import AICompanion
+from services.llm_service import get_llm_service
+from services.llm_runtime import run_sync
+from services.message_bank import MessageBank, MESSAGE_SLOTS
+
+logger = logging.getLogger(__name__)
+
+BANK_STAGES = list(STAGES.values())
+
+TEMPLATE_INSTRUCTIONS = """
+Write one new variation of this message.
+Copy any placeholder in curly braces, such as {example}, exactly as written; it will be filled in later.
+Do not add any other curly braces. Reply with the message text only.
+"""
+
+
+def build_template_prompt(companion, message_type, stage):
+    """Builds a prompt whose slot values are the placeholders themselves."""
+    companion.current_stage = stage
+    context = {slot: "{" + slot + "}" for slot in MESSAGE_SLOTS[message_type]}
+    prompt = companion._create_prompt(message_type, context)
+    prompt["user"] = prompt["user"] + TEMPLATE_INSTRUCTIONS
+    return prompt
+
+
+async def generate_variants(llm_service, prompt, count, semaphore):
+    """Requests `count` variants of one prompt, at most `semaphore` calls at a time."""
+    async def generate_one():
+        async with semaphore:
+            # Each call must be its own sample, so identical in-flight prompts aren't merged
+            return await llm_service.get_completion_async(prompt, coalesce=False)
+
+    results = await asyncio.gather(*(generate_one() for _ in range(count)))
+    return [r for r in results if not llm_service.is_fallback_message(prompt, r)]
+
+
+async def generate_bank(message_types, stages, variants, concurrency):
+    """Generates a MessageBank covering every message type x stage."""
+    llm_service = get_llm_service()
+    companion = AICompanion(llm_service=llm_service)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    jobs = [(message_type, stage, build_template_prompt(companion, message_type, stage))
+            for message_type in message_types for stage in stages]
+    results = await asyncio.gather(
+        *(generate_variants(llm_service, prompt, variants, semaphore) for _, _, prompt in jobs)
+    )
+
+    bank = MessageBank(metadata={
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "model": llm_service.model
+    })
+    rejected = 0
+    for (message_type, stage, _), texts in zip(jobs, results):
+        for text in dict.fromkeys(texts):  # Drop exact duplicates, keep order
+            if not bank.add(message_type, stage, text):
+                rejected += 1
+                logger.debug(f"Rejected {message_type}/{stage} variant with unknown slots: {text}")
+    return bank, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variants", type=int, default=8, help="variants requested per message type and stage")
+    parser.add_argument("--concurrency", type=int, default=6, help="maximum simultaneous LLM calls")
+    parser.add_argument("--types", nargs="+", default=list(MESSAGE_SLOTS), choices=list(MESSAGE_SLOTS))
+    parser.add_argument("--stages", nargs="+", default=BANK_STAGES, choices=BANK_STAGES)
+    parser.add_argument("--output", default=AI_MESSAGE_BANK_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not get_llm_service().get_api_status()["ready"]:
+        parser.error("LLM_API_KEY and LLM_API_URL must be set to generate a message bank")
+
+    bank, rejected = run_sync(generate_bank(args.types, args.stages, args.variants, args.concurrency))
+    bank.save(args.output)
+
+    stats = bank.get_stats()
+    print(f"Wrote {stats['variants']} variants for {stats['entries']} type/stage pairs to {args.output}")
+    if rejected:
+        print(f"Rejected {rejected} variants with unexpected placeholders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Decides when to hedge an LLM request and tracks what hedging buys."""
+
+import random
+import threading
+import logging
+from collections import deque
+from config import LLM_HEDGE_CONFIG
+from services.llm_telemetry import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Log a hedging summary every this many requests
+LOG_EVERY_REQUESTS = 500
+
+
+class HedgePolicy:
+    """Rolling-percentile hedge delay with a cap on the share of requests that are hedged.
+
+    A request still running after get_delay() seconds may be hedged if allow_hedge()
+    agrees. The first response wins and the other attempt is cancelled. A small random
+    holdout of requests is never hedged, so their latency shows what hedging saves.
+    """
+
+    def __init__(self, **overrides):
+        config = {**LLM_HEDGE_CONFIG, **overrides}
+        self.percentile = config["percentile"]
+        self.min_samples = config["min_samples"]
+        self.min_delay_seconds = config["min_delay_seconds"]
+        self.max_hedge_fraction = config["max_hedge_fraction"]
+        self.holdout_fraction = config["holdout_fraction"]
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=config["window_size"])  # Seconds, successful requests only
+        self._recent_hedged = deque(maxlen=config["window_size"])  # One flag per request
+        self._hedged_in_window = 0
+        self._requests = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._skipped = 0
+        self._latency_ms = Histogram()
+        self._holdout_latency_ms = Histogram()
+
+    def get_delay(self):
+        """Seconds to wait for the original request before hedging, or None until there is enough history."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(int(self.percentile * len(ordered)), len(ordered) - 1)
+        return max(ordered[index], self.min_delay_seconds)
+
+    def hold_out(self):
+        """Returns True if this request should be left unhedged as a baseline sample."""
+        return random.random() < self.holdout_fraction
+
+    def allow_hedge(self):
+        """Returns True if hedging one more request keeps hedges within max_hedge_fraction."""
+        with self._lock:
+            allowed = self._hedged_in_window + 1 <= self.max_hedge_fraction * max(len(self._recent_hedged), 1)
+            if not allowed:
+                self._skipped += 1
+            return allowed
+
+    def record(self, latency, succeeded=True, hedged=False, hedge_won=False, held_out=False):
+        """Records one finished request."""
+        with self._lock:
+            if succeeded:
+                self._latencies.append(latency)
+            if len(self._recent_hedged) == self._recent_hedged.maxlen and self._recent_hedged[0]:
+                self._hedged_in_window -= 1
+            self._recent_hedged.append(hedged)
+            self._hedged_in_window += hedged
+            self._requests += 1
+            self._hedges += hedged
+            self._hedge_wins += hedge_won
+            (self._holdout_latency_ms if held_out else self._latency_ms).observe(latency * 1000)
+            should_log = self._requests % LOG_EVERY_REQUESTS == 0
+        if should_log:
+            stats = self.get_stats()
+            logger.info(
+                f"LLM hedging: rate={stats['hedge_rate']:.3f}, wins={stats['hedge_wins']}, "
+                f"p99={stats['p99_ms']}ms, holdout p99={stats['holdout_p99_ms']}ms"
+            )
+
+    def get_stats(self):
+        delay = self.get_delay()
+        with self._lock:
+            p99 = self._latency_ms.percentile(0.99)
+            holdout_p99 = self._holdout_latency_ms.percentile(0.99)
+            return {
+                "requests": self._requests,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "skipped_over_budget": self._skipped,
+                "hedge_rate": round(self._hedges / self._requests, 4) if self._requests else 0.0,
+                "delay_ms": round(delay * 1000, 1) if delay is not None else None,
+                "p99_ms": p99,
+                "holdout_requests": self._holdout_latency_ms.count,
+                "holdout_p99_ms": holdout_p99,
+                "p99_improvement_ms": round(holdout_p99 - p99, 1) if p99 is not None and holdout_p99 is not None
+                else None
+            }
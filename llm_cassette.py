@@ -0,0 +1,108 @@
+"""Records LLM request/response pairs to an on-disk cassette and replays them without the network."""
+
+import json
+import os
+import threading
+import logging
+from config import LLM_CASSETTE_CONFIG
+from services.single_flight import make_request_key
+
+logger = logging.getLogger(__name__)
+
+_shared_cassette = None
+_shared_cassette_lock = threading.Lock()
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+CASSETTE_MODES = (OFF, RECORD, REPLAY)
+
+
+# Left out of the key: streaming and non-streaming requests share an entry, and so do
+# requests sent to a faster model while the router had downgraded the route
+UNKEYED_FIELDS = ("stream", "model")
+
+
+def make_cassette_key(data):
+    """Hashes a request payload, ignoring UNKEYED_FIELDS."""
+    return make_request_key({k: v for k, v in data.items() if k not in UNKEYED_FIELDS})
+
+
+class LLMCassette:
+    """Append-only JSON Lines file of {"key", "request", "response"} entries.
+
+    On open, the file is scanned once to build a key -> byte offset index, so a
+    lookup is a dict hit plus one seek however many entries the cassette holds.
+    When a key is recorded more than once, the latest entry wins.
+    """
+
+    def __init__(self, path=None, mode=None):
+        self.path = path or LLM_CASSETTE_CONFIG["path"]
+        self.mode = (mode or LLM_CASSETTE_CONFIG["mode"]).lower()
+        if self.mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{self.mode}'; expected one of {CASSETTE_MODES}")
+
+        self._index = {}  # key -> byte offset of its latest line
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "recorded": 0}
+        if os.path.exists(self.path):
+            self._build_index()
+        logger.info(f"LLM cassette in {self.mode} mode with {len(self._index)} entries from {self.path}")
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    @property
+    def recording(self):
+        return self.mode == RECORD
+
+    def _build_index(self):
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    self._index[json.loads(line)["key"]] = offset
+                except (ValueError, KeyError):
+                    logger.warning(f"Skipping unreadable cassette line at byte {offset} of {self.path}")
+                offset += len(line)
+
+    def lookup(self, data):
+        """Returns the recorded response for a request payload, or None."""
+        key = make_cassette_key(data)
+        with self._lock:
+            offset = self._index.get(key)
+            if offset is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["response"]
+
+    def record(self, data, response):
+        """Appends a request/response pair and indexes it."""
+        key = make_cassette_key(data)
+        line = (json.dumps({"key": key, "request": data, "response": response}, sort_keys=True) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            self._index[key] = offset
+            self._stats["recorded"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {**self._stats, "mode": self.mode, "entries": len(self._index), "path": self.path}
+
+
+def get_llm_cassette():
+    """Returns the worker-wide cassette, or None when record/replay is off."""
+    global _shared_cassette
+    if LLM_CASSETTE_CONFIG["mode"] == OFF:
+        return None
+    if _shared_cassette is None:
+        with _shared_cassette_lock:
+            if _shared_cassette is None:
+                _shared_cassette = LLMCassette()
+    return _shared_cassette
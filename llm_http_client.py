@@ -0,0 +1,123 @@
+"""Pooled, keep-alive HTTP client shared by all LLM calls in a worker.
+
+AsyncLLMClient uses aiohttp when it is installed; this client is its fallback
+where it isn't, with each call run in a thread. aiohttp is optional, so the
+fallback is tested (test_llm_http_client.py) rather than removed. Without aiohttp
+completions still work, but streaming arrives as a single chunk.
+"""
+
+import socket
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from config import LLM_HTTP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive and counts newly opened connections."""
+
+    def __init__(self, client, keep_alive=True, **kwargs):
+        self._client = client
+        self._keep_alive = keep_alive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self._keep_alive:
+            pool_kwargs["socket_options"] = HTTPConnectionPool.ConnectionCls.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+        # Swap in pool classes that report every new connection back to the client
+        client = self._client
+
+        def counting_pool(base):
+            def _new_conn(pool):
+                client._record_new_connection()
+                return base._new_conn(pool)
+            return type(f"Counting{base.__name__}", (base,), {"_new_conn": _new_conn})
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": counting_pool(HTTPConnectionPool),
+            "https": counting_pool(HTTPSConnectionPool)
+        }
+
+
+class PooledHTTPClient:
+    """Thread-safe HTTP client that keeps connections to the LLM API open between calls."""
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, keep_alive=None,
+                 connect_timeout=None, read_timeout=None):
+        self.pool_connections = pool_connections or LLM_HTTP_CONFIG["pool_connections"]
+        self.pool_maxsize = pool_maxsize or LLM_HTTP_CONFIG["pool_maxsize"]
+        self.keep_alive = LLM_HTTP_CONFIG["keep_alive"] if keep_alive is None else keep_alive
+        self.connect_timeout = connect_timeout or LLM_HTTP_CONFIG["connect_timeout"]
+        self.read_timeout = read_timeout or LLM_HTTP_CONFIG["read_timeout"]
+
+        self._stats_lock = threading.Lock()
+        self._requests_sent = 0
+        self._new_connections = 0
+
+        self.session = requests.Session()
+        adapter = _PooledAdapter(
+            self,
+            keep_alive=self.keep_alive,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not self.keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    @property
+    def timeout(self):
+        """Per-phase (connect, read) timeout passed to requests."""
+        return (self.connect_timeout, self.read_timeout)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        """Sends a POST request over a pooled connection."""
+        with self._stats_lock:
+            self._requests_sent += 1
+        return self.session.post(url, headers=headers, data=data, timeout=timeout or self.timeout)
+
+    def _record_new_connection(self):
+        with self._stats_lock:
+            self._new_connections += 1
+
+    def get_stats(self):
+        """Returns counters for new vs reused connections."""
+        with self._stats_lock:
+            requests_sent = self._requests_sent
+            new_connections = self._new_connections
+        return {
+            "requests": requests_sent,
+            "new_connections": new_connections,
+            "reused_connections": max(requests_sent - new_connections, 0),
+            "pool_maxsize": self.pool_maxsize,
+            "keep_alive": self.keep_alive,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout
+        }
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
+
+
+def get_shared_http_client():
+    """Returns the worker-wide pooled HTTP client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = PooledHTTPClient()
+                logger.info(f"Created pooled LLM HTTP client (pool_maxsize={_shared_client.pool_maxsize})")
+    return _shared_client
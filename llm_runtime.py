@@ -0,0 +1,71 @@
+"""Background asyncio event loop that owns all in-flight LLM calls for a worker."""
+
+import asyncio
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_llm_loop():
+    """Returns the worker-wide LLM event loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True)
+                thread.start()
+                _loop = loop
+                logger.info("Started LLM event loop thread")
+    return _loop
+
+
+def submit(coro):
+    """Schedules a coroutine on the LLM loop and returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_llm_loop())
+
+
+def run_sync(coro, timeout=None):
+    """Runs a coroutine on the LLM loop and blocks the calling thread for its result."""
+    return submit(coro).result(timeout)
+
+
+async def run_async(coro):
+    """Awaits a coroutine on the LLM loop from any other event loop (e.g. a Flask async view)."""
+    loop = get_llm_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def iterate_sync(async_iterable, timeout=None):
+    """Iterates an async generator on the LLM loop from a regular (e.g. WSGI) thread."""
+    items = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for item in async_iterable:
+                items.put((item, None))
+        except Exception as e:
+            items.put((None, e))
+            return
+        items.put((finished, None))
+
+    future = submit(pump())
+    try:
+        while True:
+            item, error = items.get(timeout=timeout)
+            if error is not None:
+                raise error
+            if item is finished:
+                return
+            yield item
+    finally:
+        # Stop the upstream stream if the consumer goes away early
+        future.cancel()
@@ -1,33 +1,382 @@
 """Service for communicating with LLM APIs."""
 
 import os
-import requests
+import asyncio
 import json
 import logging
+import threading
+import time
+from services.async_llm_client import get_shared_async_client, LLMRequestError
+from services.llm_runtime import run_sync
+from services.message_bank import get_message_bank
+from services.single_flight import SingleFlight, make_request_key
+from services.circuit_breaker import CircuitBreaker
+from services.concurrency_limiter import ConcurrencyLimiter
+from services.hedge_policy import HedgePolicy
+from services.model_router import ModelRouter
+from services.llm_cassette import get_llm_cassette
+from services.llm_telemetry import get_llm_telemetry
+from config import (
+    LLM_MESSAGE_PRIORITIES, LLM_DEFAULT_PRIORITY, LLM_PROMPT_CACHING, LLM_HEDGE_CONFIG, LLM_DEFAULT_ROUTE,
+    LLM_HTTP_CONFIG
+)
 
 logger = logging.getLogger(__name__)
 
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+FALLBACK_MESSAGES = {
+    "welcome": "Hi there! I'm Math Helper, ready to support your decimal rounding practice.",
+    "encouragement": "Great job! You're doing really well with your rounding practice.",
+    "stage_transition": "Excellent progress! You're ready to move on to the next level.",
+    "struggle_support": "Don't worry, everyone makes mistakes while learning. Keep practicing and you'll get it!",
+    "completion": "Congratulations! You've done an amazing job completing this lesson.",
+    "question": "Good question! Find the target digit, then check the digit to its right to decide how to round."
+}
+DEFAULT_FALLBACK_MESSAGE = "I'm here to help with your math practice! Let me know if you have questions."
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant for students learning math."
+MAX_OUTPUT_TOKENS = LLM_DEFAULT_ROUTE["max_tokens"]
+HEDGE_ADMISSION_TIMEOUT = 0.05  # A hedge only goes out if the limiter has a slot for it almost at once
+
+
+class FallbackMessage(str):
+    """Text of a fallback message, marked so callers can tell it from a live completion."""
+
 class LLMService:
     """Service for interacting with LLM APIs."""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, http_client=None, message_bank=None, cassette=None):
         self.api_key = api_key or os.environ.get("LLM_API_KEY")
         self.api_url = os.environ.get("LLM_API_URL")
         self.model = os.environ.get("LLM_MODEL", "claude-3-haiku-20240307")
+        self.http_client = http_client or get_shared_async_client()
+        self.message_bank = message_bank or get_message_bank()
+        self.single_flight = SingleFlight()
+        self.circuit_breaker = CircuitBreaker("llm")
+        self.limiter = ConcurrencyLimiter()
+        self.hedging = HedgePolicy() if LLM_HEDGE_CONFIG["enabled"] else None
+        self.router = ModelRouter(self.model)
+        self.prompt_caching = LLM_PROMPT_CACHING
+        self.cassette = cassette or get_llm_cassette()
+        self.telemetry = get_llm_telemetry()
+        self._deadline_misses = 0
         
-        if not self.api_key or not self.api_url:
+        if self._replaying:
+            logger.info("LLM responses will be replayed from the cassette; no API calls will be made.")
+        elif not self.api_key or not self.api_url:
             logger.warning("LLM API key or URL not set. AI companion will use fallback messages only.")
         
-    def get_completion(self, prompt, conversation_history=None):
-        """Gets a completion from the LLM API."""
+    @property
+    def _replaying(self):
+        return self.cassette is not None and self.cassette.replaying
+
+    def get_completion(self, prompt, conversation_history=None, deadline=None, message_type=None, session_id=None):
+        """Gets a completion from the LLM API (blocking wrapper around get_completion_async)."""
+        if not self._replaying and (not self.api_key or not self.api_url):
+            return self._get_fallback_message(prompt)
+        return run_sync(self.get_completion_async(prompt, conversation_history, deadline, message_type, session_id))
+
+    async def get_completion_async(self, prompt, conversation_history=None, deadline=None, message_type=None,
+                                   session_id=None, coalesce=True):
+        """Gets a completion from the LLM API without blocking a thread while waiting.
+        
+        If deadline (seconds) passes first, the circuit breaker is open, or the
+        concurrency limiter sheds the call, the fallback message is returned instead.
+        message_type sets the call's priority in the limiter queue; it and session_id
+        label the call in telemetry. It also picks the model route (see LLM_MODEL_ROUTES).
+        Identical requests in flight share one call unless coalesce is False, for
+        callers that want a separate completion each time (e.g. sampling variants).
+        """
+        if self._replaying:
+            self.telemetry.record_outcome("replayed", message_type, session_id)
+            return self._replay_completion(prompt, conversation_history, message_type)
+
         if not self.api_key or not self.api_url:
             return self._get_fallback_message(prompt)
+
+        if not self.circuit_breaker.allow_request():
+            logger.info("LLM circuit is open; using fallback message")
+            self.telemetry.record_outcome("circuit_open", message_type, session_id)
+            return self._get_fallback_message(prompt)
+
+        route = self.router.route(message_type)
+        headers, data = self._build_request(prompt, conversation_history, route)
+        
+        request = lambda: self._request_completion(prompt, headers, data, self._get_priority(message_type),
+                                                   deadline, message_type, session_id,
+                                                   self._get_timeout(route, prompt))
+        if coalesce:
+            # Identical prompts already in flight (e.g. a class starting a lesson together) share one call
+            completion = self.single_flight.do(make_request_key(data), request)
+        else:
+            completion = request()
+        if deadline is None:
+            return await completion
+        
+        try:
+            return await asyncio.wait_for(completion, deadline)
+        except asyncio.TimeoutError:
+            self._deadline_misses += 1
+            self.telemetry.record_outcome("deadline_miss", message_type, session_id)
+            logger.warning(f"LLM completion missed its {deadline:.2f}s deadline; using fallback message")
+            return self._get_fallback_message(prompt)
+
+    def _replay_completion(self, prompt, conversation_history=None, message_type=None):
+        """Serves a recorded response from the cassette; unrecorded requests get the fallback."""
+        # The configured route, so replays don't depend on live latency
+        _, data = self._build_request(prompt, conversation_history, self.router.get_route(message_type))
+        result = self.cassette.lookup(data)
+        if result is None:
+            logger.info("No cassette entry for this LLM request; using fallback message")
+            return self._get_fallback_message(prompt)
+        return self._parse_completion(result, prompt)
+
+    @staticmethod
+    def _get_timeout(route, prompt=None):
+        """The (connect, read) timeout for a route, or None for the client's defaults.
         
+        A prompt may set its own "timeout_seconds" (e.g. a bundle, which writes more than the route expects).
+        """
+        timeout_seconds = (prompt or {}).get("timeout_seconds", route.get("timeout_seconds"))
+        if timeout_seconds is None:
+            return None
+        return LLM_HTTP_CONFIG["connect_timeout"], timeout_seconds
+
+    def _get_priority(self, message_type):
+        """Lower numbers are admitted first; see LLM_MESSAGE_PRIORITIES."""
+        return LLM_MESSAGE_PRIORITIES.get(message_type, LLM_DEFAULT_PRIORITY)
+
+    async def _request_completion(self, prompt, headers, data, priority=LLM_DEFAULT_PRIORITY, deadline=None,
+                                  message_type=None, session_id=None, timeout=None):
+        """Sends one completion request, returning a fallback message on failure or when shed."""
+        try:
+            admitted = await self.limiter.acquire(priority, deadline, message_type)
+        except asyncio.CancelledError:
+            # e.g. the deadline passed while queued in the limiter
+            self.circuit_breaker.release_probe()
+            raise
+        if not admitted:
+            logger.info(f"LLM limiter shed {message_type or 'untyped'} request; using fallback message")
+            self.telemetry.record_outcome("shed", message_type, session_id)
+            self.circuit_breaker.release_probe()
+            return self._get_fallback_message(prompt)
+
+        try:
+            if self.hedging:
+                result = await self._post_hedged(headers, data, priority, message_type, session_id, timeout)
+            else:
+                result = await self._post_completion(headers, data, message_type, session_id, timeout)
+        except Exception:
+            # Already logged and counted by _post_completion
+            return self._get_fallback_message(prompt)
+        
+        if self.cassette and self.cassette.recording:
+            self.cassette.record(data, result)
+        return self._parse_completion(result, prompt)
+
+    async def _post_completion(self, headers, data, message_type=None, session_id=None, timeout=None):
+        """Sends one request on a slot already taken from the limiter, which it releases.
+        
+        Returns the decoded response; errors are logged, counted and re-raised.
+        """
+        started = time.monotonic()
+        timings = {}
+        usage, outcome = None, "error"
+        try:
+            logger.debug(f"Sending request to LLM API: {json.dumps(data)[:200]}...")
+            result = await self.http_client.post_json(
+                self.api_url,
+                headers=headers,
+                data=json.dumps(data),
+                timeout=timeout,
+                timings=timings
+            )
+            logger.debug(f"Received response from LLM API: {json.dumps(result)[:200]}...")
+            self.circuit_breaker.record_success(time.monotonic() - started)
+            self.router.record_latency(data["model"], time.monotonic() - started)
+            usage, outcome = result.get("usage"), "ok"
+            return result
+                
+        except asyncio.CancelledError:
+            # Says nothing about the API's health, so any probe slot is handed back
+            outcome = "cancelled"
+            self.circuit_breaker.release_probe()
+            raise
+        except LLMRequestError as e:
+            outcome = self._get_error_outcome(e)
+            self._record_request_error(e, time.monotonic() - started)
+            raise
+        except json.JSONDecodeError as e:
+            self.circuit_breaker.record_failure(time.monotonic() - started)
+            logger.error(f"JSON decode error from LLM API: {e}")
+            raise
+        except Exception as e:
+            self.circuit_breaker.record_failure(time.monotonic() - started)
+            logger.error(f"Unexpected error getting LLM completion: {e}")
+            raise
+        finally:
+            latency = time.monotonic() - started
+            self.limiter.release(latency)
+            self.telemetry.record_call(data["model"], message_type, session_id, usage, latency,
+                                       timings.get("ttfb"), outcome)
+
+    async def _post_hedged(self, headers, data, priority, message_type=None, session_id=None, timeout=None):
+        """Like _post_completion, but sends an identical second request if the first is unusually slow.
+        
+        Whichever succeeds first is used and the other is cancelled.
+        """
+        started = time.monotonic()
+        original = asyncio.ensure_future(self._post_completion(headers, data, message_type, session_id, timeout))
+        attempts = {original}
+        hedge = None
+        held_out = self.hedging.hold_out()
+        try:
+            delay = None if held_out else self.hedging.get_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self.hedging.allow_hedge() and \
+                        await self.limiter.try_acquire(priority, HEDGE_ADMISSION_TIMEOUT):
+                    if original.done():
+                        # Finished while the hedge waited for its slot, so it isn't needed
+                        self.limiter.release()
+                    else:
+                        logger.info(f"LLM request slower than {delay:.2f}s; sending a hedged request")
+                        self.telemetry.record_outcome("hedged", message_type, session_id)
+                        hedge = asyncio.ensure_future(
+                            self._post_completion(headers, data, message_type, session_id, timeout)
+                        )
+                        attempts.add(hedge)
+            
+            while True:
+                done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [attempt for attempt in done if attempt.exception() is None]
+                if succeeded or not attempts:
+                    winner = succeeded[0] if succeeded else done.pop()
+                    break
+        finally:
+            # The loser, or every attempt if the caller gave up
+            for attempt in attempts:
+                attempt.cancel()
+        
+        if winner is hedge:
+            self.telemetry.record_outcome("hedge_won", message_type, session_id)
+        self.hedging.record(time.monotonic() - started, winner.exception() is None,
+                            hedged=hedge is not None, hedge_won=winner is hedge, held_out=held_out)
+        return winner.result()
+
+    @staticmethod
+    def _get_error_outcome(error):
+        """Telemetry label for a failed call, e.g. 'http_429' or 'connection_error'."""
+        return f"http_{error.status}" if error.status else "connection_error"
+
+    def _record_request_error(self, error, latency):
+        """Logs an HTTP error and counts it against the circuit breaker if the API is unhealthy."""
+        if error.status is None or error.status == 429 or error.status >= 500:
+            self.circuit_breaker.record_failure(latency)
+        else:
+            self.circuit_breaker.record_success(latency)
+        
+        if error.status is None:
+            logger.error(f"HTTP error getting LLM completion: {error}")
+        else:
+            request_id = error.headers.get("request-id", "unknown")
+            logger.error(f"HTTP error getting LLM completion: status {error.status} (request-id {request_id})")
+            logger.debug(f"Response body: {(error.body or '')[:500]}")
+
+    async def stream_completion_async(self, prompt, conversation_history=None, message_type=None, session_id=None):
+        """Yields completion text chunks as the LLM produces them.
+        
+        Falls back to a single chunk with the full completion when streaming isn't available.
+        """
+        if self._replaying or not self.api_key or not self.api_url or not self.http_client.supports_streaming:
+            yield await self.get_completion_async(prompt, conversation_history, message_type=message_type,
+                                                  session_id=session_id)
+            return
+
+        if not self.circuit_breaker.allow_request():
+            logger.info("LLM circuit is open; using fallback message")
+            self.telemetry.record_outcome("circuit_open", message_type, session_id)
+            yield self._get_fallback_message(prompt)
+            return
+
+        try:
+            admitted = await self.limiter.acquire(self._get_priority(message_type), label=message_type)
+        except asyncio.CancelledError:
+            self.circuit_breaker.release_probe()
+            raise
+        if not admitted:
+            logger.info(f"LLM limiter shed {message_type or 'untyped'} stream; using fallback message")
+            self.telemetry.record_outcome("shed", message_type, session_id)
+            self.circuit_breaker.release_probe()
+            yield self._get_fallback_message(prompt)
+            return
+
+        route = self.router.route(message_type)
+        headers, data = self._build_request(prompt, conversation_history, route)
+        data["stream"] = True
+        chunks = []
+        usage = {}
+        outcome = "error"
+        reported = False  # Whether the breaker heard how this call went
+        first_token_at = None
+        started = time.monotonic()
+        
+        try:
+            async for event, payload in self.http_client.stream_events(
+                self.api_url,
+                headers=headers,
+                data=json.dumps(data),
+                timeout=self._get_timeout(route)
+            ):
+                if event == "content_block_delta" and payload.get("delta", {}).get("type") == "text_delta":
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                        self.router.record_latency(data["model"], first_token_at - started)
+                    chunks.append(payload["delta"]["text"])
+                    yield payload["delta"]["text"]
+                elif event == "message_start":
+                    usage = payload.get("message", {}).get("usage") or {}
+                elif event == "message_delta":
+                    # The final output token count arrives here
+                    usage = {**usage, **(payload.get("usage") or {})}
+                elif event == "error":
+                    raise LLMRequestError(payload.get("error", {}).get("message", "Streaming error from LLM API"))
+            self.circuit_breaker.record_success(time.monotonic() - started)
+            reported = True
+            outcome = "ok"
+            if self.cassette and self.cassette.recording and chunks:
+                self.cassette.record(data, {"content": [{"type": "text", "text": "".join(chunks)}], "usage": usage})
+        except (LLMRequestError, json.JSONDecodeError) as e:
+            if isinstance(e, LLMRequestError):
+                outcome = self._get_error_outcome(e)
+                self._record_request_error(e, time.monotonic() - started)
+            else:
+                self.circuit_breaker.record_failure(time.monotonic() - started)
+                logger.error(f"Error streaming LLM completion: {e}")
+            reported = True
+            if not chunks:
+                yield self._get_fallback_message(prompt)
+        finally:
+            latency = time.monotonic() - started
+            self.limiter.release(latency)
+            if not reported:
+                # Abandoned (client gone or cancelled) before the stream finished
+                self.circuit_breaker.release_probe()
+            # Time to first byte of a stream is measured to the first text token
+            self.telemetry.record_call(data["model"], message_type, session_id, usage, latency,
+                                       first_token_at - started if first_token_at else None, outcome)
+
+    def _build_request(self, prompt, conversation_history=None, route=None):
+        """Builds the headers and JSON payload for a completion request on the given model route."""
+        route = route or self.router.default_route
         headers = {
             "Content-Type": "application/json",
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01"
         }
+        if self.prompt_caching:
+            headers["anthropic-beta"] = "prompt-caching-2024-07-31"
         
         # Clean up conversation history - remove trailing whitespace
         messages = []
@@ -40,81 +389,100 @@ class LLMService:
                 else:
                     messages.append(msg)
         
-        # Add the new prompt if it's not already included
-        if prompt.get("user") and not any(m.get("content") == prompt["user"] for m in messages):
+        # Add the new prompt unless the history already ends with it (a repeated prompt
+        # earlier in the history still needs its own turn, or the request would end on the assistant)
+        if prompt.get("user") and not (messages and messages[-1].get("role") == "user" and
+                                       messages[-1].get("content") == prompt["user"].strip()):
             messages.append({"role": "user", "content": prompt["user"].strip()})
         
         data = {
-            "model": self.model,
-            "system": prompt.get("system", "You are a helpful assistant for students learning math.").strip(),
+            "model": route["model"],
+            "system": self._build_system(prompt.get("system", DEFAULT_SYSTEM_PROMPT).strip(), prompt.get("summary")),
             "messages": messages,
-            "max_tokens": 150,
-            "temperature": 0.7
+            "max_tokens": prompt.get("max_tokens", route["max_tokens"]),
+            "temperature": route["temperature"]
         }
+        return headers, data
+
+    def _build_system(self, system_prompt, summary=None):
+        """Marks the system prompt as a cacheable prefix so the provider can reuse it across calls.
         
-        try:
-            logger.debug(f"Sending request to LLM API: {json.dumps(data)[:200]}...")
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                data=json.dumps(data),
-                timeout=10
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            logger.debug(f"Received response from LLM API: {json.dumps(result)[:200]}...")
-            
-            # Extract and clean the content
-            if "content" in result:
-                content = result["content"]
-                if isinstance(content, list) and len(content) > 0:
-                    first_content = content[0]
-                    if isinstance(first_content, dict) and 'text' in first_content:
-                        # IMPORTANT: Strip trailing whitespace from the response
-                        return first_content['text'].strip()
-                    else:
-                        return str(first_content).strip()
-                elif isinstance(content, str):
-                    return content.strip()
-            elif "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"].strip()
-            else:
-                logger.warning("Unexpected response format from LLM API")
-                logger.warning(f"Full response: {json.dumps(result)}")
-                return self._get_fallback_message(prompt)
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"HTTP error getting LLM completion: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response headers: {dict(e.response.headers)}")
-                logger.error(f"Response body: {e.response.text}")
-            return self._get_fallback_message(prompt)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error from LLM API: {e}")
-            return self._get_fallback_message(prompt)
-        except Exception as e:
-            logger.error(f"Unexpected error getting LLM completion: {e}")
-            return self._get_fallback_message(prompt)
+        A per-conversation summary goes after the cache breakpoint so the prefix stays identical.
+        """
+        if not self.prompt_caching:
+            return f"{system_prompt}\n\n{summary}" if summary else system_prompt
+        blocks = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        if summary:
+            blocks.append({"type": "text", "text": summary})
+        return blocks
+
+    def get_usage_stats(self):
+        """Returns token totals and the share of input tokens served from the provider's prompt cache."""
+        return self.telemetry.get_token_totals()
+
+    def _parse_completion(self, result, prompt):
+        """Extracts the completion text from an LLM API response."""
+        # Extract and clean the content
+        if "content" in result:
+            content = result["content"]
+            if isinstance(content, list) and len(content) > 0:
+                first_content = content[0]
+                if isinstance(first_content, dict) and 'text' in first_content:
+                    # IMPORTANT: Strip trailing whitespace from the response
+                    return first_content['text'].strip()
+                else:
+                    return str(first_content).strip()
+            elif isinstance(content, str):
+                return content.strip()
+        elif "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"].strip()
+        
+        logger.warning("Unexpected response format from LLM API")
+        logger.warning(f"Full response: {json.dumps(result)}")
+        return self._get_fallback_message(prompt)
 
     
     def _get_fallback_message(self, prompt):
         """Returns a fallback message when API calls fail."""
+        return self.get_fallback_message(self._get_fallback_message_type(prompt))
+
+    def get_fallback_message(self, message_type, stage=None):
+        """Returns the fallback message for a companion message type at a lesson stage.
+        
+        A pre-generated variant for the stage is preferred so fallbacks don't all read
+        the same; without a stage, the fixed message is used rather than a variant that
+        may have been written for a different stage.
+        """
+        banked_message = self.message_bank.get_message(message_type, stage) if message_type and stage else None
+        return FallbackMessage(banked_message or FALLBACK_MESSAGES.get(message_type, DEFAULT_FALLBACK_MESSAGE))
+
+    def _get_fallback_message_type(self, prompt):
+        """Guesses the companion message type from the prompt text."""
         user_prompt = prompt.get("user", "").lower()
         
-        if "welcome" in user_prompt or "introduce" in user_prompt:
-            return "Hi there! I'm Math Helper, ready to support your decimal rounding practice."
+        # Student questions can contain any of the keywords below
+        if user_prompt.startswith("the student asks:"):
+            return "question"
+        elif "welcome" in user_prompt or "introduce" in user_prompt:
+            return "welcome"
         elif "encouragement" in user_prompt or "correct" in user_prompt:
-            return "Great job! You're doing really well with your rounding practice."
+            return "encouragement"
         elif "transition" in user_prompt or "stage" in user_prompt:
-            return "Excellent progress! You're ready to move on to the next level."
+            return "stage_transition"
         elif "support" in user_prompt or "struggle" in user_prompt:
-            return "Don't worry, everyone makes mistakes while learning. Keep practicing and you'll get it!"
+            return "struggle_support"
         elif "completion" in user_prompt or "complete" in user_prompt:
-            return "Congratulations! You've done an amazing job completing this lesson."
+            return "completion"
         else:
-            return "I'm here to help with your math practice! Let me know if you have questions."
+            return None
+
+    def is_fallback_message(self, prompt, message):
+        """Returns True if a message is a fallback rather than a live LLM response."""
+        return (
+            isinstance(message, FallbackMessage) or
+            message == FALLBACK_MESSAGES.get(self._get_fallback_message_type(prompt), DEFAULT_FALLBACK_MESSAGE) or
+            self.message_bank.is_banked_text(message)
+        )
 
     def test_connection(self):
         """Tests the connection to the LLM API."""
@@ -151,7 +519,17 @@ class LLMService:
             "api_key_configured": bool(self.api_key),
             "api_url_configured": bool(self.api_url),
             "model": self.model,
-            "ready": bool(self.api_key and self.api_url)
+            "ready": bool(self.api_key and self.api_url) or self._replaying,
+            "connection_stats": self.http_client.get_stats(),
+            "coalescing": self.single_flight.get_stats(),
+            "circuit_breaker": self.circuit_breaker.get_stats(),
+            "limiter": self.limiter.get_stats(),
+            "hedging": self.hedging.get_stats() if self.hedging else None,
+            "routing": self.router.get_stats(),
+            "prompt_caching": self.prompt_caching,
+            "token_usage": self.get_usage_stats(),
+            "cassette": self.cassette.get_stats() if self.cassette else None,
+            "deadline_misses": self._deadline_misses
         }
 
     def validate_api_key_format(self):
@@ -168,11 +546,28 @@ class LLMService:
         return True, "API key format appears valid"
 
     def get_usage_estimate(self, text_length):
-        """Estimates token usage for a given text length."""
+        """Estimates token usage for a given text length.
+        
+        Output tokens use the average of recorded calls once there are any; see /api/ai/telemetry.
+        """
         # Rough estimation: 1 token ≈ 4 characters for English text
         estimated_tokens = text_length // 4
+        totals = self.telemetry.get_token_totals()
+        calls = totals["calls"]
+        estimated_output = round(totals["output_tokens"] / calls) if calls else MAX_OUTPUT_TOKENS
         return {
             "estimated_input_tokens": estimated_tokens,
-            "max_output_tokens": 150,  # As configured in get_completion
-            "total_estimated_tokens": estimated_tokens + 150
-        }
\ No newline at end of file
+            "estimated_output_tokens": estimated_output,
+            "max_output_tokens": MAX_OUTPUT_TOKENS,
+            "total_estimated_tokens": estimated_tokens + estimated_output
+        }
+
+
+def get_llm_service():
+    """Returns the worker-wide LLMService so configuration and connections are reused."""
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                _shared_service = LLMService()
+    return _shared_service
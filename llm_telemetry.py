@@ -0,0 +1,206 @@
+"""In-process token, cost and latency telemetry for LLM calls."""
+
+import bisect
+import threading
+from collections import OrderedDict
+from config import LLM_PRICING, LLM_DEFAULT_PRICING, LLM_TELEMETRY_MAX_SESSIONS
+
+_shared_telemetry = None
+_shared_telemetry_lock = threading.Lock()
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 20000]
+
+TOKEN_FIELDS = ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens")
+
+
+class Histogram:
+    """Fixed-bucket histogram with count/sum/min/max and bucket-interpolated percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return round(min(max(estimate, self.min), self.max), 1)
+            seen += bucket_count
+        return round(self.max, 1)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "min": round(self.min, 1) if self.min is not None else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": round(self.max, 1) if self.max is not None else None,
+            "buckets": {
+                f"le_{bound}": count for bound, count in zip(self.buckets + ["inf"], self.counts)
+            }
+        }
+
+
+class UsageAggregate:
+    """Token, cost, outcome and latency totals for one slice of traffic."""
+
+    def __init__(self):
+        self.calls = 0
+        self.outcomes = {}
+        self.tokens = {field: 0 for field in TOKEN_FIELDS}
+        self.cost_usd = 0.0
+        self.wall_ms = Histogram()
+        self.ttfb_ms = Histogram()
+
+    def add_call(self, usage, cost, wall_ms, ttfb_ms, outcome):
+        self.calls += 1
+        self.add_outcome(outcome)
+        for field in TOKEN_FIELDS:
+            self.tokens[field] += usage.get(field) or 0
+        self.cost_usd += cost
+        self.wall_ms.observe(wall_ms)
+        if ttfb_ms is not None:
+            self.ttfb_ms.observe(ttfb_ms)
+
+    def add_outcome(self, outcome):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def to_dict(self, histograms=True):
+        total_input = (self.tokens["input_tokens"] + self.tokens["cache_creation_input_tokens"] +
+                       self.tokens["cache_read_input_tokens"])
+        data = {
+            "calls": self.calls,
+            "outcomes": dict(self.outcomes),
+            "tokens": dict(self.tokens),
+            "cached_input_ratio": round(self.tokens["cache_read_input_tokens"] / total_input, 3) if total_input else 0.0,
+            "cost_usd": round(self.cost_usd, 6),
+            "average_cost_usd": round(self.cost_usd / self.calls, 6) if self.calls else 0.0
+        }
+        if histograms:
+            data["wall_ms"] = self.wall_ms.to_dict()
+            data["ttfb_ms"] = self.ttfb_ms.to_dict()
+        else:
+            data["wall_ms_p50"] = self.wall_ms.percentile(0.5)
+            data["wall_ms_p95"] = self.wall_ms.percentile(0.95)
+        return data
+
+
+def estimate_cost(model, usage):
+    """Returns the USD cost of one call's token usage at the configured prices."""
+    prices = LLM_PRICING.get(model, LLM_DEFAULT_PRICING)
+    return (
+        (usage.get("input_tokens") or 0) * prices["input"] +
+        (usage.get("cache_creation_input_tokens") or 0) * prices["cache_write"] +
+        (usage.get("cache_read_input_tokens") or 0) * prices["cache_read"] +
+        (usage.get("output_tokens") or 0) * prices["output"]
+    ) / 1_000_000
+
+
+class LLMTelemetry:
+    """Aggregates every upstream LLM call overall, per model, per message type and per session.
+
+    Outcomes that never reach the API (circuit open, shed, deadline) are counted too, so
+    fallback rates show up next to latency and spend. Sessions are kept in an LRU bounded
+    by LLM_TELEMETRY_MAX_SESSIONS.
+    """
+
+    def __init__(self, max_sessions=None):
+        self.max_sessions = max_sessions or LLM_TELEMETRY_MAX_SESSIONS
+        self._lock = threading.Lock()
+        self._total = UsageAggregate()
+        self._by_model = {}
+        self._by_message_type = {}
+        self._by_session = OrderedDict()
+
+    def record_call(self, model, message_type, session_id, usage, wall_seconds, ttfb_seconds=None, outcome="ok"):
+        """Records one upstream call with its usage block, wall time and time to first byte."""
+        usage = usage or {}
+        cost = estimate_cost(model, usage)
+        wall_ms = wall_seconds * 1000
+        ttfb_ms = ttfb_seconds * 1000 if ttfb_seconds is not None else None
+        with self._lock:
+            for aggregate in self._aggregates(model, message_type, session_id):
+                aggregate.add_call(usage, cost, wall_ms, ttfb_ms, outcome)
+
+    def record_outcome(self, outcome, message_type=None, session_id=None):
+        """Counts a call that was answered without reaching the API (e.g. 'circuit_open', 'shed')."""
+        with self._lock:
+            for aggregate in self._aggregates(None, message_type, session_id):
+                aggregate.add_outcome(outcome)
+
+    def _aggregates(self, model, message_type, session_id):
+        aggregates = [self._total, self._get(self._by_message_type, message_type or "untyped")]
+        if model:
+            aggregates.append(self._get(self._by_model, model))
+        if session_id:
+            aggregates.append(self._get_session(session_id))
+        return aggregates
+
+    @staticmethod
+    def _get(table, key):
+        if key not in table:
+            table[key] = UsageAggregate()
+        return table[key]
+
+    def _get_session(self, session_id):
+        aggregate = self._by_session.get(session_id)
+        if aggregate is None:
+            aggregate = self._by_session[session_id] = UsageAggregate()
+            while len(self._by_session) > self.max_sessions:
+                self._by_session.popitem(last=False)
+        self._by_session.move_to_end(session_id)
+        return aggregate
+
+    def get_token_totals(self):
+        with self._lock:
+            data = self._total.to_dict(histograms=False)
+        return {"calls": data["calls"], **data["tokens"], "cached_input_ratio": data["cached_input_ratio"]}
+
+    def get_session_stats(self, session_id):
+        with self._lock:
+            aggregate = self._by_session.get(session_id)
+            return aggregate.to_dict() if aggregate else None
+
+    def get_stats(self, top_sessions=20):
+        """Returns totals, per-model and per-message-type breakdowns, and the costliest sessions."""
+        with self._lock:
+            sessions = sorted(self._by_session.items(), key=lambda item: item[1].cost_usd, reverse=True)
+            return {
+                "total": self._total.to_dict(),
+                "by_model": {model: a.to_dict(histograms=False) for model, a in self._by_model.items()},
+                "by_message_type": {t: a.to_dict() for t, a in self._by_message_type.items()},
+                "sessions_tracked": len(self._by_session),
+                "top_sessions": {
+                    session_id: a.to_dict(histograms=False) for session_id, a in sessions[:top_sessions]
+                }
+            }
+
+
+def get_llm_telemetry():
+    """Returns the worker-wide LLM telemetry collector."""
+    global _shared_telemetry
+    if _shared_telemetry is None:
+        with _shared_telemetry_lock:
+            if _shared_telemetry is None:
+                _shared_telemetry = LLMTelemetry()
+    return _shared_telemetry
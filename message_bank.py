@@ -0,0 +1,166 @@
+"""Pre-generated AI companion messages with slots filled in locally at request time."""
+
+import json
+import os
+import random
+import re
+import string
+import threading
+import logging
+from config import AI_MESSAGE_BANK_PATH
+
+logger = logging.getLogger(__name__)
+
+BANK_FORMAT_VERSION = 1
+
+# Context fields each message type may reference as {slot} placeholders
+MESSAGE_SLOTS = {
+    "welcome": [],
+    "encouragement": ["consecutive_correct", "questions_attempted"],
+    "stage_transition": ["previous_stage_description", "current_stage_description"],
+    "struggle_support": ["wrong_answers", "current_concept"],
+    "completion": ["correct_answers", "total_questions"]
+}
+
+_shared_bank = None
+_shared_bank_lock = threading.Lock()
+
+
+def get_template_slots(template):
+    """Returns the set of {slot} names in a template, or None if it is malformed."""
+    try:
+        return {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+    except ValueError:
+        return None
+
+
+def get_template_pattern(template):
+    """Returns a regex matching the template with any values in its slots."""
+    return re.compile("".join(
+        re.escape(literal) + ("" if field is None else "(.+?)")
+        for literal, field, _, _ in string.Formatter().parse(template)
+    ), re.DOTALL)
+
+
+class MessageBank:
+    """Lookup table of message variants keyed by message type and stage."""
+
+    def __init__(self, messages=None, metadata=None):
+        self.metadata = metadata or {}
+        self._entries = {}  # (message_type, stage) -> list of (template, slots)
+        self._slotless_texts = set()
+        self._slot_patterns = {}  # template -> compiled pattern, for templates with slots
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        for message_type, stages in (messages or {}).items():
+            for stage, templates in stages.items():
+                for template in templates:
+                    self.add(message_type, stage, template)
+
+    def add(self, message_type, stage, template):
+        """Adds a variant if its slots are all allowed for the message type."""
+        slots = get_template_slots(template)
+        if slots is None or not slots <= set(MESSAGE_SLOTS.get(message_type, [])):
+            return False
+        self._entries.setdefault((message_type, stage), []).append((template, frozenset(slots)))
+        if not slots:
+            self._slotless_texts.add(template)
+        else:
+            self._slot_patterns.setdefault(template, get_template_pattern(template))
+        return True
+
+    def covers(self, message_type, stage):
+        return (message_type, stage) in self._entries
+
+    def get_message(self, message_type, stage=None, context=None):
+        """Returns a filled-in variant, or None when the bank cannot answer.
+
+        With no stage, variants for every stage of the message type are eligible.
+        Variants whose slots are missing from the context are skipped.
+        """
+        if stage is None:
+            candidates = [v for (t, _), variants in self._entries.items() if t == message_type for v in variants]
+        else:
+            candidates = self._entries.get((message_type, stage), [])
+
+        context = context or {}
+        available = {k for k, v in context.items() if v not in (None, "")}
+        usable = [(template, slots) for template, slots in candidates if slots <= available]
+
+        with self._stats_lock:
+            if not usable:
+                self._misses += 1
+                return None
+            self._hits += 1
+
+        template, slots = random.choice(usable)
+        if not slots:
+            return template
+        return template.format_map({slot: context[slot] for slot in slots})
+
+    def is_banked_text(self, text):
+        """Returns True if text is one of the bank's variants, with or without its slots filled in."""
+        if text in self._slotless_texts:
+            return True
+        return any(pattern.fullmatch(text) for pattern in self._slot_patterns.values())
+
+    def to_dict(self):
+        messages = {}
+        for (message_type, stage), variants in self._entries.items():
+            messages.setdefault(message_type, {})[stage] = [template for template, _ in variants]
+        return {"version": BANK_FORMAT_VERSION, **self.metadata, "messages": messages}
+
+    def save(self, path=None):
+        """Writes the bank as compact JSON."""
+        path = path or AI_MESSAGE_BANK_PATH
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        """Loads a bank file; returns an empty bank if it is missing or unreadable."""
+        path = path or AI_MESSAGE_BANK_PATH
+        if not os.path.exists(path):
+            logger.info(f"No AI message bank at {path}; all companion messages will use the LLM")
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read AI message bank {path}: {e}")
+            return cls()
+
+        if data.get("version") != BANK_FORMAT_VERSION:
+            logger.warning(f"Ignoring AI message bank {path} with unsupported version {data.get('version')}")
+            return cls()
+
+        metadata = {k: v for k, v in data.items() if k not in ("version", "messages")}
+        bank = cls(data.get("messages", {}), metadata)
+        logger.info(f"Loaded AI message bank from {path} ({bank.get_stats()['variants']} variants)")
+        return bank
+
+    def get_stats(self):
+        with self._stats_lock:
+            hits, misses = self._hits, self._misses
+        return {
+            "entries": len(self._entries),
+            "variants": sum(len(v) for v in self._entries.values()),
+            "hits": hits,
+            "misses": misses,
+            "generated_at": self.metadata.get("generated_at"),
+            "model": self.metadata.get("model")
+        }
+
+
+def get_message_bank():
+    """Returns the worker-wide message bank, loading it from disk on first use."""
+    global _shared_bank
+    if _shared_bank is None:
+        with _shared_bank_lock:
+            if _shared_bank is None:
+                _shared_bank = MessageBank.load()
+    return _shared_bank
@@ -0,0 +1,130 @@
+"""Speculatively generates the next AI companion message so it is ready when the browser asks."""
+
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import AI_PREFETCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_shared_prefetcher = None
+_shared_prefetcher_lock = threading.Lock()
+
+
+class MessagePrefetcher:
+    """Runs message generation in a small thread pool, keyed by (session id, message type, fingerprint).
+
+    The fingerprint identifies the context a message was written for (e.g. the lesson
+    stage), so it is never served once that context has moved on. Each result can be
+    taken once; one still running when a take() gives up stays available for a later
+    take(). Results nobody asks for within ttl_seconds are discarded.
+
+    Results live in this process only: with several workers and no sticky routing,
+    the request that asks for a message may reach a worker that never prefetched it.
+    """
+
+    def __init__(self, ttl_seconds=None, max_workers=None, max_entries=None):
+        self.ttl_seconds = ttl_seconds or AI_PREFETCH_CONFIG["ttl_seconds"]
+        self.max_entries = max_entries or AI_PREFETCH_CONFIG["max_entries"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or AI_PREFETCH_CONFIG["max_workers"],
+            thread_name_prefix="ai-prefetch"
+        )
+        self._entries = {}  # (session_id, message_type, fingerprint) -> (created_at, future)
+        self._lock = threading.Lock()
+        self._stats = {
+            "started": 0,
+            "hits": 0,
+            "pending_hits": 0,
+            "misses": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "discarded": 0
+        }
+
+    def prefetch(self, session_id, message_type, generate, fingerprint=None):
+        """Starts generate() in the background, replacing any older prefetch for the same key."""
+        key = (session_id, message_type, fingerprint)
+        with self._lock:
+            self._discard_expired()
+            if key in self._entries:
+                # A newer answer changed the context; the older result would be stale
+                self._entries.pop(key)[1].cancel()
+                self._stats["discarded"] += 1
+            elif len(self._entries) >= self.max_entries:
+                return False
+            self._entries[key] = (time.monotonic(), self._executor.submit(generate))
+            self._stats["started"] += 1
+        logger.debug(f"Prefetching {message_type} message for session {session_id}")
+        return True
+
+    def take(self, session_id, message_type, fingerprint=None, timeout=None):
+        """Claims a prefetched result, waiting up to timeout seconds if it is still running.
+
+        Returns None when nothing was prefetched, it failed, or it wasn't ready in time.
+        A result that wasn't ready is kept, so it can still be taken once it is.
+        """
+        key = (session_id, message_type, fingerprint)
+        with self._lock:
+            self._discard_expired()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+        _, future = entry
+
+        pending = not future.done()
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._count("timeouts")
+            return None
+        except Exception as e:
+            logger.warning(f"Prefetched {message_type} message failed: {e}")
+            self._claim(key, entry)
+            self._count("failures")
+            return None
+
+        if not self._claim(key, entry):
+            # A concurrent take() got it first
+            self._count("misses")
+            return None
+        self._count("pending_hits" if pending else "hits")
+        return result
+
+    def _claim(self, key, entry):
+        """Removes the entry if it is still the one stored under key; returns whether it was."""
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return False
+            del self._entries[key]
+            return True
+
+    def _discard_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, (created_at, _) in self._entries.items() if created_at < cutoff]
+        for key in expired:
+            self._entries.pop(key)
+        self._stats["discarded"] += len(expired)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stats(self):
+        with self._lock:
+            self._discard_expired()
+            return {**self._stats, "entries": len(self._entries), "ttl_seconds": self.ttl_seconds}
+
+
+def get_message_prefetcher():
+    """Returns the worker-wide prefetcher, or None when prefetching is disabled."""
+    global _shared_prefetcher
+    if not AI_PREFETCH_CONFIG["enabled"]:
+        return None
+    if _shared_prefetcher is None:
+        with _shared_prefetcher_lock:
+            if _shared_prefetcher is None:
+                _shared_prefetcher = MessagePrefetcher()
+    return _shared_prefetcher
@@ -0,0 +1,119 @@
+"""Chooses the model, output cap and timeout for each LLM call by message type, within a latency budget."""
+
+import threading
+import time
+from collections import deque
+from config import LLM_DEFAULT_ROUTE, LLM_MODEL_ROUTES, LLM_ROUTER_CONFIG
+
+
+class ModelRouter:
+    """Per-message-type routes, downgraded to the fastest model while the preferred one is too slow.
+
+    Response latency is tracked per model over the last window_seconds. When a route has
+    a latency_budget_ms and its model's recent percentile latency exceeds it, calls go to
+    whichever configured model is currently fastest. Samples expire, so the preferred
+    model gets traffic (and a fresh measurement) again once its slow samples age out.
+    """
+
+    def __init__(self, default_model, routes=None, **overrides):
+        config = {**LLM_ROUTER_CONFIG, **overrides}
+        self.default_model = default_model
+        self.window_seconds = config["window_seconds"]
+        self.min_samples = config["min_samples"]
+        self.percentile = config["percentile"]
+        self.fast_model = config["fast_model"]
+        self.routes = {
+            message_type: self._resolve({**LLM_DEFAULT_ROUTE, **route})
+            for message_type, route in (LLM_MODEL_ROUTES if routes is None else routes).items()
+        }
+        self.default_route = self._resolve(dict(LLM_DEFAULT_ROUTE))
+
+        self._lock = threading.Lock()
+        self._latencies = {}  # model -> deque of (recorded_at, seconds)
+        self._decisions = {}  # message_type -> {model: count}
+        self._downgrades = {}  # message_type -> count
+
+    def _resolve(self, route):
+        route["model"] = route["model"] or self.default_model
+        return route
+
+    def get_route(self, message_type):
+        """The configured route for a message type, ignoring live latency."""
+        return self.routes.get(message_type, self.default_route)
+
+    def route(self, message_type):
+        """Returns the route to use now, with "model" swapped for a faster one if the budget is blown."""
+        route = self.get_route(message_type)
+        model = route["model"]
+        budget = route["latency_budget_ms"]
+        if budget is not None:
+            latency = self._recent_latency(model, self.percentile)
+            if latency is not None and latency * 1000 > budget:
+                fastest = self._fastest_model(exclude=model)
+                if fastest is not None:
+                    route = {**route, "model": fastest, "downgraded_from": model}
+
+        label = message_type or "default"
+        with self._lock:
+            counts = self._decisions.setdefault(label, {})
+            counts[route["model"]] = counts.get(route["model"], 0) + 1
+            if "downgraded_from" in route:
+                self._downgrades[label] = self._downgrades.get(label, 0) + 1
+        return route
+
+    def record_latency(self, model, latency):
+        """Records a successful call's response latency (time to first token for streams)."""
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=500)).append((time.monotonic(), latency))
+
+    def _recent(self, model):
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            samples = self._latencies.get(model)
+            if not samples:
+                return []
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            return sorted(seconds for _, seconds in samples)
+
+    def _recent_latency(self, model, percentile):
+        """The model's recent latency at this percentile, or None with too few samples."""
+        recent = self._recent(model)
+        if len(recent) < self.min_samples:
+            return None
+        return recent[min(int(percentile * len(recent)), len(recent) - 1)]
+
+    def _configured_models(self):
+        models = {self.default_route["model"], self.fast_model}
+        models.update(route["model"] for route in self.routes.values())
+        return models
+
+    def _fastest_model(self, exclude):
+        """The configured model with the lowest recent median, or fast_model if no other is measured."""
+        measured = {
+            model: self._recent_latency(model, 0.5) for model in self._configured_models() if model != exclude
+        }
+        measured = {model: latency for model, latency in measured.items() if latency is not None}
+        if measured:
+            return min(measured, key=measured.get)
+        return self.fast_model if self.fast_model != exclude else None
+
+    def get_stats(self):
+        models = {}
+        for model in sorted(self._configured_models() | set(self._latencies)):
+            recent = self._recent(model)
+            models[model] = {
+                "recent_calls": len(recent),
+                "p50_ms": round(recent[len(recent) // 2] * 1000, 1) if recent else None,
+                "p90_ms": round(recent[min(int(0.9 * len(recent)), len(recent) - 1)] * 1000, 1) if recent else None
+            }
+        with self._lock:
+            return {
+                "routes": {
+                    message_type: {key: value for key, value in route.items() if value is not None}
+                    for message_type, route in self.routes.items()
+                },
+                "decisions": {message_type: dict(counts) for message_type, counts in self._decisions.items()},
+                "downgrades": dict(self._downgrades),
+                "models": models
+            }
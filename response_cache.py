@@ -0,0 +1,236 @@
+"""Two-tier (in-process LRU + shared on-disk) cache for AI companion responses."""
+
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from config import AI_RESPONSE_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+# Conversation history lengths are bucketed so the key stays stable as a lesson goes on
+HISTORY_BUCKETS = [(0, "none"), (2, "short"), (6, "medium")]
+
+
+class ResponseCache:
+    """Caches up to `variety` LLM responses per normalized prompt."""
+
+    def __init__(self, memory_max_entries=None, disk_path=None, disk_max_entries=None,
+                 ttl_seconds=None, variety=None):
+        config = AI_RESPONSE_CACHE_CONFIG
+        self.memory_max_entries = memory_max_entries or config["memory_max_entries"]
+        self.disk_path = config["disk_path"] if disk_path is None else disk_path
+        self.disk_max_entries = disk_max_entries or config["disk_max_entries"]
+        self.ttl_seconds = ttl_seconds or config["ttl_seconds"]
+        self.variety = max(1, variety or config["variety"])
+
+        self._memory = OrderedDict()  # key -> list of (text, created_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts_since_eviction = 0
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "disk_errors": 0
+        }
+
+        if self.disk_path:
+            self._init_disk()
+
+    # Keys
+
+    @staticmethod
+    def _normalize(text):
+        return re.sub(r"\s+", " ", str(text or "")).strip()
+
+    @staticmethod
+    def _history_bucket(conversation_history):
+        length = len(conversation_history or [])
+        for upper, name in HISTORY_BUCKETS:
+            if length <= upper:
+                return name
+        return "long"
+
+    def make_key(self, prompt, conversation_history=None):
+        """Builds the cache key from the normalized prompt, its conversation summary and a bucketed history fingerprint."""
+        parts = [
+            self._normalize(prompt.get("system")),
+            self._normalize(prompt.get("user")),
+            self._normalize(prompt.get("summary")),
+            self._history_bucket(conversation_history)
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    # Public API
+
+    def get(self, prompt, conversation_history=None):
+        """Returns a cached response, or None when the prompt still needs more variants."""
+        key = self.make_key(prompt, conversation_history)
+        variants = self._get_memory(key)
+        tier = "memory_hits"
+
+        # Other workers may have stored the variants this worker is still missing
+        if len(variants or []) < self.variety and self.disk_path:
+            disk_variants = self._get_disk(key)
+            if disk_variants and len(disk_variants) > len(variants or []):
+                variants, tier = disk_variants, "disk_hits"
+                self._set_memory(key, variants)
+
+        with self._lock:
+            if variants and len(variants) >= self.variety:
+                self._stats[tier] += 1
+                return random.choice(variants)[0]
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, prompt, conversation_history, text):
+        """Stores a fresh LLM response as one of the prompt's variants."""
+        key = self.make_key(prompt, conversation_history)
+        now = time.time()
+        with self._lock:
+            variants = (self._memory.get(key, []) + [(text, now)])[-self.variety:]
+            self._stats["stores"] += 1
+        self._set_memory(key, variants)
+
+        if self.disk_path:
+            self._put_disk(key, text, now)
+
+    def get_stats(self):
+        """Returns hit/miss counters for both tiers."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        stats["variety"] = self.variety
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+    def clear(self):
+        """Drops all cached responses from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.disk_path:
+            try:
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM responses")
+            except sqlite3.Error as e:
+                logger.warning(f"Could not clear AI response cache on disk: {e}")
+
+    # Memory tier
+
+    def _get_memory(self, key):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            variants = self._memory.get(key)
+            if variants is None:
+                return None
+            variants = [v for v in variants if v[1] >= cutoff]
+            if not variants:
+                del self._memory[key]
+                return None
+            self._memory[key] = variants
+            self._memory.move_to_end(key)
+            return variants
+
+    def _set_memory(self, key, variants):
+        with self._lock:
+            self._memory[key] = variants
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_max_entries:
+                self._memory.popitem(last=False)
+                self._stats["memory_evictions"] += 1
+
+    # Disk tier (SQLite so every worker process can share it)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_disk(self):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_key ON responses (key, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        except sqlite3.Error as e:
+            logger.warning(f"AI response cache disk tier disabled: {e}")
+            self.disk_path = ""
+
+    def _get_disk(self, key):
+        try:
+            rows = self._connection().execute(
+                "SELECT text, created_at FROM responses WHERE key = ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (key, time.time() - self.ttl_seconds, self.variety)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._record_disk_error(e)
+            return None
+        return [(text, created_at) for text, created_at in rows] or None
+
+    def _put_disk(self, key, text, created_at):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO responses (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, created_at)
+            )
+            with self._lock:
+                self._puts_since_eviction += 1
+                should_evict = self._puts_since_eviction >= 50
+                if should_evict:
+                    self._puts_since_eviction = 0
+            if should_evict:
+                self._evict_disk(conn)
+        except sqlite3.Error as e:
+            self._record_disk_error(e)
+
+    def _evict_disk(self, conn):
+        """Drops expired rows and the oldest rows beyond disk_max_entries."""
+        expired = conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            "DELETE FROM responses WHERE rowid IN ("
+            "SELECT rowid FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,)
+        ).rowcount
+        with self._lock:
+            self._stats["disk_evictions"] += expired + overflow
+
+    def _record_disk_error(self, error):
+        logger.warning(f"AI response cache disk error: {error}")
+        with self._lock:
+            self._stats["disk_errors"] += 1
+
+
+def get_response_cache():
+    """Returns the worker-wide response cache, or None when caching is disabled."""
+    global _shared_cache
+    if not AI_RESPONSE_CACHE_CONFIG["enabled"]:
+        return None
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ResponseCache()
+    return _shared_cache
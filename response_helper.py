@@ -1,4 +1,5 @@
 """Helper functions for formatting API responses."""
+import json
 from flask import jsonify
 
 def format_example_response(learning_sequence, example_question, explanation):
@@ -31,3 +32,7 @@ def format_complete_response():
 def format_error_response(error):
     """Format error response."""
     return jsonify({'error': str(error)}), 500
+
+def format_sse_event(event, data):
+    """Format a Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
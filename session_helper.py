@@ -1,7 +1,10 @@
 """Helper functions for session management with enhanced student profiling."""
-from flask import session
+import copy
+from flask import g, session
 from datetime import datetime
+from models.learning_sequence import LearningSequence
 from models.student_profile import StudentProfile
+from services.student_event_log import get_student_event_log
 
 def prepare_session_data(learning_sequence, section="decimal1"):
     """Convert session data to JSON-serializable format with section prefix."""
@@ -14,7 +17,7 @@ def prepare_session_data(learning_sequence, section="decimal1"):
         'showing_example': learning_sequence.showing_example,
         'current_example': learning_sequence.current_example,
         'stage_results': learning_sequence.stage_results,
-        'used_questions': {k: list(v) for k, v in learning_sequence.used_questions.items()}  # Convert sets to lists
+        'used_questions': {k: sorted(v) for k, v in learning_sequence.used_questions.items()}  # Convert sets to lists
     }
 
 def load_learning_sequence_from_session(learning_sequence, section="decimal1"):
@@ -37,7 +40,7 @@ def load_learning_sequence_from_session(learning_sequence, section="decimal1"):
     learning_sequence.current_example = session[session_key].get('current_example', 1)
     
     if 'stage_results' in session[session_key]:
-        learning_sequence.stage_results = session[session_key]['stage_results']
+        learning_sequence.stage_results = copy.deepcopy(session[session_key]['stage_results'])
     
     if 'used_questions' in session[session_key]:
         used_questions_dict = session[session_key]['used_questions']
@@ -45,26 +48,89 @@ def load_learning_sequence_from_session(learning_sequence, section="decimal1"):
     
     return learning_sequence
 
+def get_learning_sequence(section="decimal1"):
+    """Get this request's learning sequence, hydrated from the session on first use.
+    
+    Every request builds its own LearningSequence, so concurrent students never
+    share lesson state and any worker can serve any session. Changes are written
+    back once, by write_back_session_state(), when the request finishes.
+    """
+    if 'learning_sequence' not in g:
+        learning_sequence = load_learning_sequence_from_session(LearningSequence(), section)
+        state = session.get('learning_state')
+        g.learning_sequence = learning_sequence
+        g.learning_state_section = section
+        # What the session holds now, to compare against at write-back
+        g.learning_state_loaded = (
+            copy.deepcopy(prepare_session_data(learning_sequence, section))
+            if state and state.get('section') == section else None
+        )
+        g.learning_state_saved = False
+    return g.learning_sequence
+
 def save_learning_sequence_to_session(learning_sequence):
-    """Save learning sequence state to session."""
-    session['learning_state'] = prepare_session_data(learning_sequence)
+    """Mark learning sequence state to be saved to the session at the end of the request."""
+    g.learning_sequence = learning_sequence
+    g.learning_state_saved = True
+
+def learning_state_changes():
+    """Return the learning state keys this request saved with changes, or every key if the session has none yet."""
+    if 'learning_sequence' not in g or not g.learning_state_saved:
+        return []
+    state = prepare_session_data(g.learning_sequence, g.learning_state_section)
+    loaded = g.learning_state_loaded
+    if loaded is None:
+        return list(state) if g.learning_state_saved else []
+    return [key for key, value in state.items() if loaded.get(key) != value]
 
 # NEW FUNCTIONS FOR STUDENT PROFILE MANAGEMENT
 
 def get_student_profile() -> StudentProfile:
-    """Get or create student profile from session"""
-    if 'student_profile' not in session:
-        # Create new profile
-        profile = StudentProfile()
-        session['student_profile'] = profile.to_dict()
-        return profile
-    else:
-        # Load existing profile
-        return StudentProfile.from_dict(session['student_profile'])
+    """Get or create this request's student profile, loading it from the session on first use"""
+    if 'student_profile' not in g:
+        event_log = get_student_event_log()
+        student_id = session.get('user_id')
+        if 'student_profile' not in session:
+            # Rebuild from the event log's snapshot, or create a new profile; saving it writes it at write-back
+            profile = event_log.load_profile(student_id) if event_log and student_id else None
+            g.student_profile = profile or StudentProfile()
+            g.student_profile_loaded = None
+        else:
+            # Load existing profile, with its most recent answers from the event log
+            g.student_profile = StudentProfile.from_dict(copy.deepcopy(session['student_profile']))
+            g.student_profile_loaded = copy.deepcopy(g.student_profile.to_dict())
+            if event_log and student_id:
+                g.student_profile.load_history(event_log.recent(student_id, g.student_profile.total_questions))
+        g.student_profile_saved = False
+    return g.student_profile
 
 def save_student_profile(profile: StudentProfile):
-    """Save student profile to session"""
-    session['student_profile'] = profile.to_dict()
+    """Mark the student profile to be saved to the session at the end of the request"""
+    g.student_profile = profile
+    g.setdefault('student_profile_loaded', None)
+    g.student_profile_saved = True
+
+def student_profile_changes():
+    """Return the student profile keys this request saved with changes, or every key if the session has none yet."""
+    if 'student_profile' not in g or not g.get('student_profile_saved'):
+        return []
+    profile = g.student_profile.to_dict()
+    loaded = g.student_profile_loaded
+    return [key for key, value in profile.items() if loaded is None or loaded.get(key) != value]
+
+def write_back_session_state(response):
+    """Write this request's saved learning state and student profile to the session, if either changed.
+    
+    Runs once per request, after the view, so a request that only reads them
+    leaves the session unmodified and it is not encoded and saved again. Nothing
+    is written for an error response, even if the view changed state in place first.
+    """
+    if response.status_code >= 400:
+        return
+    if learning_state_changes():
+        session['learning_state'] = prepare_session_data(g.learning_sequence, g.learning_state_section)
+    if student_profile_changes():
+        session['student_profile'] = g.student_profile.to_dict()
 
 def update_student_profile_with_question(question_data: dict, verification_result: dict, response_time: float = 0):
     """Update student profile with new question result"""
@@ -92,6 +158,11 @@ def update_student_profile_with_question(question_data: dict, verification_resul
     time_diff = (datetime.now() - profile.session_start_time).total_seconds() / 60
     profile.total_time_spent_minutes = time_diff
     
+    # Record the answer durably; the log writes in the background
+    event_log = get_student_event_log()
+    if event_log and session.get('user_id'):
+        event_log.append(session['user_id'], result, profile)
+    
     # Save back to session
     save_student_profile(profile)
     
@@ -158,6 +229,7 @@ def reset_student_profile():
     """Reset student profile (for lesson restart)"""
     if 'student_profile' in session:
         del session['student_profile']
+    g.pop('student_profile', None)
 
 def get_student_context_for_ai() -> dict:
     """Get student context formatted for AI consumption"""
@@ -0,0 +1,86 @@
+"""Flask session interface that keeps session data server-side and only an id in the cookie."""
+
+import secrets
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from config import SESSION_STORE_CONFIG
+from helpers.state_codec import decode_session_values, encode_session_values
+
+
+class CompactSessionSerializer(TaggedJSONSerializer):
+    """Tagged JSON with the learning state and student profile packed by the state codec."""
+
+    def dumps(self, value):
+        return super().dumps(encode_session_values(value))
+
+    def loads(self, value):
+        return decode_session_values(super().loads(value))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that notes when it is changed, like Flask's cookie session."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Loads sessions from a SessionStore by the id in the cookie and saves them back when changed.
+
+    Values are serialized with the same tagged JSON as Flask's cookie sessions, so
+    everything that could go in the cookie can go in the store.
+    """
+
+    serializer = CompactSessionSerializer()
+
+    def __init__(self, store, cookie_name=None):
+        self.store = store
+        self.cookie_name = cookie_name or SESSION_STORE_CONFIG["cookie_name"]
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.cookie_name)
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                try:
+                    return ServerSideSession(self.serializer.loads(data), sid=sid)
+                except ValueError:
+                    pass
+        return ServerSideSession(sid=secrets.token_urlsafe(16), new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(self.cookie_name, domain=domain, path=path)
+            return
+
+        if session.modified or session.new:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)))
+        if session.new or (session.permanent and app.config["SESSION_REFRESH_EACH_REQUEST"]):
+            response.set_cookie(
+                self.cookie_name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+
+class CompactCookieSessionInterface(SecureCookieSessionInterface):
+    """Flask's signed cookie session, with the state codec applied to the payload."""
+
+    serializer = CompactSessionSerializer()
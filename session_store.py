@@ -0,0 +1,319 @@
+"""Server-side storage for Flask session data, with a per-worker cache and batched writes."""
+
+import atexit
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from config import SESSION_STORE_CONFIG
+
+try:
+    import redis
+except ImportError:  # The redis backend is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+class MemorySessionBackend:
+    """Sessions in this process only, evicting the least recently written beyond max_entries."""
+
+    name = "memory"
+
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # sid -> (version, data, updated_at)
+        self._lock = threading.Lock()
+
+    def get(self, sid, known_version=None):
+        """Returns (version, data), with data None if the version is known_version, or None if missing."""
+        with self._lock:
+            entry = self._entries.get(sid)
+        if entry is None or entry[2] < time.time() - self.ttl_seconds:
+            return None
+        version, data, _ = entry
+        return version, (None if version == known_version else data)
+
+    def put_many(self, items):
+        """Writes (sid, version, data) items."""
+        now = time.time()
+        with self._lock:
+            for sid, version, data in items:
+                self._entries[sid] = (version, data, now)
+                self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class SQLiteSessionBackend:
+    """Sessions in a local SQLite file, shared by every worker on the machine."""
+
+    name = "sqlite"
+
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes_since_eviction = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, version TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid, known_version=None):
+        # The data column is only sent back when it differs from the caller's cached version
+        row = self._connection().execute(
+            "SELECT version, CASE WHEN version = ? THEN NULL ELSE data END FROM sessions "
+            "WHERE id = ? AND updated_at >= ?",
+            (known_version, sid, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def put_many(self, items):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sessions (id, version, data, updated_at) VALUES (?, ?, ?, ?)",
+                [(sid, version, data, now) for sid, version, data in items]
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        self._writes_since_eviction += len(items)
+        if self._writes_since_eviction >= 1000:
+            self._writes_since_eviction = 0
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drops expired sessions and the least recently written beyond max_entries."""
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            "SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def delete(self, sid):
+        self._connection().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+
+class RedisSessionBackend:
+    """Sessions in a Redis-compatible server (Redis, Valkey, KeyDB or a local stand-in)."""
+
+    name = "redis"
+    key_prefix = "session:"
+
+    def __init__(self, url, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._client.ping()
+
+    def get(self, sid, known_version=None):
+        key = self.key_prefix + sid
+        if known_version is not None:
+            version = self._client.hget(key, "version")
+            if version is None:
+                return None
+            if version == known_version:
+                return version, None
+        version, data = self._client.hmget(key, "version", "data")
+        return (version, data) if version is not None else None
+
+    def put_many(self, items):
+        pipeline = self._client.pipeline(transaction=False)
+        for sid, version, data in items:
+            key = self.key_prefix + sid
+            pipeline.hset(key, mapping={"version": version, "data": data})
+            pipeline.expire(key, self.ttl_seconds)
+        pipeline.execute()
+
+    def delete(self, sid):
+        self._client.delete(self.key_prefix + sid)
+
+
+class SessionStore:
+    """Loads and saves serialized session data through a backend.
+
+    Each worker caches the serialized data and version of recently used sessions; a
+    load only transfers the data again when another worker has written a newer
+    version. Saves are written straight through by default; with flush_interval_ms
+    set, they are queued and written in one batch by a background thread, and loads
+    on this worker see queued saves immediately.
+    """
+
+    def __init__(self, backend, cache_entries=None, flush_interval_ms=None, max_batch=None):
+        self.backend = backend
+        self.cache_entries = cache_entries or SESSION_STORE_CONFIG["cache_entries"]
+        self.flush_interval = (SESSION_STORE_CONFIG["flush_interval_ms"] if flush_interval_ms is None
+                               else flush_interval_ms) / 1000
+        self.max_batch = max_batch or SESSION_STORE_CONFIG["max_batch"]
+
+        self._cache = OrderedDict()  # sid -> (version, data)
+        self._pending = OrderedDict()  # sid -> (version, data), or None for a delete
+        self._flushing = {}  # The batch being written right now, in the same form
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # One batch in flight at a time
+        self._versions = 0
+        self._stats = {"loads": 0, "cache_hits": 0, "misses": 0, "saves": 0, "flushes": 0,
+                       "written": 0, "errors": 0}
+
+        if self.flush_interval > 0:
+            threading.Thread(target=self._flush_loop, name="session-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def load(self, sid):
+        """Returns the session's serialized data, or None for unknown or expired sessions."""
+        with self._lock:
+            self._stats["loads"] += 1
+            # Saves that haven't reached the backend yet win over whatever it holds
+            for queue in (self._pending, self._flushing):
+                if sid in queue:
+                    self._stats["cache_hits"] += 1
+                    return queue[sid][1] if queue[sid] else None
+            cached = self._cache.get(sid)
+
+        try:
+            result = self.backend.get(sid, cached[0] if cached else None)
+        except Exception as e:
+            self._record_error(e)
+            return cached[1] if cached else None
+
+        with self._lock:
+            if result is None:
+                self._cache.pop(sid, None)
+                self._stats["misses"] += 1
+                return None
+            version, data = result
+            if data is None:
+                self._stats["cache_hits"] += 1
+                data = cached[1]
+            self._remember(sid, version, data)
+        return data
+
+    def save(self, sid, data):
+        with self._lock:
+            self._stats["saves"] += 1
+            self._versions += 1
+            version = f"{time.time_ns():x}-{self._versions:x}"
+            self._remember(sid, version, data)
+            self._pending[sid] = (version, data)
+            self._pending.move_to_end(sid)
+            flush_now = self.flush_interval <= 0
+            if not flush_now and len(self._pending) >= self.max_batch:
+                self._flush_requested.notify()
+        if flush_now:
+            self.flush()
+
+    def delete(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+            self._pending[sid] = None
+            flush_now = self.flush_interval <= 0
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """Writes every queued save and delete to the backend."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, OrderedDict()
+                self._flushing = pending
+            if not pending:
+                return
+            writes = [(sid, entry[0], entry[1]) for sid, entry in pending.items() if entry is not None]
+            try:
+                if writes:
+                    self.backend.put_many(writes)
+                for sid, entry in pending.items():
+                    if entry is None:
+                        self.backend.delete(sid)
+            except Exception as e:
+                self._record_error(e)
+                with self._lock:
+                    # Retry on the next flush unless a newer save has replaced them
+                    for sid, entry in pending.items():
+                        self._pending.setdefault(sid, entry)
+                    self._flushing = {}
+                return
+            with self._lock:
+                self._flushing = {}
+                self._stats["flushes"] += 1
+                self._stats["written"] += len(pending)
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                self._flush_requested.wait(self.flush_interval)
+            self.flush()
+
+    def _remember(self, sid, version, data):
+        self._cache[sid] = (version, data)
+        self._cache.move_to_end(sid)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+    def _record_error(self, error):
+        logger.warning(f"Session store error: {error}")
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_writes"] = len(self._pending)
+            stats["cached_sessions"] = len(self._cache)
+        stats["backend"] = self.backend.name
+        return stats
+
+
+def create_session_backend(config=None):
+    """Creates the configured backend, falling back to memory if it can't be used."""
+    config = {**SESSION_STORE_CONFIG, **(config or {})}
+    backend = config["backend"]
+    try:
+        if backend == "sqlite":
+            return SQLiteSessionBackend(config["sqlite_path"], config["ttl_seconds"], config["max_entries"])
+        if backend == "redis":
+            if redis is None:
+                raise RuntimeError("the redis package is not installed")
+            return RedisSessionBackend(config["redis_url"], config["ttl_seconds"])
+    except Exception as e:
+        logger.warning(f"Session backend '{backend}' unavailable, keeping sessions in memory: {e}")
+    return MemorySessionBackend(config["ttl_seconds"], config["max_entries"])
+
+
+def get_session_store():
+    """Returns the worker-wide session store, or None when sessions stay in the signed cookie."""
+    global _shared_store
+    if SESSION_STORE_CONFIG["backend"] == "cookie":
+        return None
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = SessionStore(create_session_backend())
+    return _shared_store
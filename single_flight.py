@@ -0,0 +1,55 @@
+"""Collapses concurrent identical LLM calls into a single upstream request."""
+
+import asyncio
+import hashlib
+import json
+import threading
+
+
+def make_request_key(data):
+    """Hashes a normalized request payload so identical prompts share a key."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share its result.
+
+    All callers must be on the same event loop. Every LLM call in a worker runs on
+    the LLM loop (see llm_runtime), so this covers both request threads using the
+    sync wrapper and asyncio tasks.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._upstream_calls = 0
+        self._collapsed = 0
+
+    async def do(self, key, call):
+        """Awaits call() for the first caller of a key; later callers await the same task."""
+        task = self._in_flight.get(key)
+        with self._stats_lock:
+            self._calls += 1
+            if task is not None:
+                self._collapsed += 1
+            else:
+                self._upstream_calls += 1
+
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # Shield so one caller giving up doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def get_stats(self):
+        with self._stats_lock:
+            calls, upstream_calls, collapsed = self._calls, self._upstream_calls, self._collapsed
+        return {
+            "calls": calls,
+            "upstream_calls": upstream_calls,
+            "collapsed": collapsed,
+            "in_flight": len(self._in_flight)
+        }
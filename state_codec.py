@@ -0,0 +1,293 @@
+"""Compact, versioned binary encoding for the learning state and student profile kept in the session.
+
+Counts are varints, stages and other known strings are small-integer codes, and
+used-question indexes are bitsets. Payloads that shrink under zlib are stored
+compressed. Anything the codec can't represent exactly stays in its JSON shape,
+and JSON-shaped values written before the codec existed still load unchanged.
+"""
+
+import struct
+import zlib
+from datetime import datetime, timedelta
+from config import SESSION_CODEC_CONFIG
+
+CODEC_VERSION = 1
+VERSION_MASK = 0x0F
+COMPRESSED = 0x80
+
+# Code tables are append-only: a value's position is its code in stored sessions
+STAGE_CODES = ["1.1", "1.2", "1.3", "2.1", "2.2", "stretch", "complete"]
+SECTION_CODES = ["decimal1", "decimal23"]
+MISCONCEPTION_CODES = [
+    "rounding_direction_confusion", "decimal_place_confusion", "rounding_to_whole_number",
+    "trailing_zero_error", "nines_difficulty", "general_rounding_error", "unknown_error",
+    "place_value_confusion", "decimal_notation_confusion"
+]
+TREND_CODES = ["stable", "improving", "declining"]
+ENGAGEMENT_CODES = ["normal", "high", "low"]
+
+LEARNING_STATE_KEYS = (
+    "section", "stage", "correct_answers", "consecutive_correct", "questions_attempted",
+    "showing_example", "current_example", "stage_results", "used_questions"
+)
+STUDENT_PROFILE_KEYS = (
+    "total_questions", "total_correct", "consecutive_correct", "consecutive_errors", "current_stage",
+    "misconception_patterns", "stage_performance", "session_start_time", "total_time_spent_minutes",
+    "questions_this_session", "average_response_time", "response_time_trend", "engagement_level",
+    "learns_from_mistakes_quickly", "prefers_encouragement", "responds_to_challenges"
+)
+PROFILE_FLAGS = ("learns_from_mistakes_quickly", "prefers_encouragement", "responds_to_challenges")
+EPOCH = datetime(1970, 1, 1)
+DOUBLE = struct.Struct("<d")
+
+
+class _Writer:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def uint(self, value):
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(f"not a non-negative integer: {value!r}")
+        while value > 0x7F:
+            self.buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def sint(self, value):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"not an integer: {value!r}")
+        self.uint(value * 2 if value >= 0 else -value * 2 - 1)
+
+    def string(self, value):
+        if not isinstance(value, str):
+            raise ValueError(f"not a string: {value!r}")
+        data = value.encode("utf-8")
+        self.uint(len(data))
+        self.buffer += data
+
+    def code(self, table, value):
+        """Known values are their table position + 1; 0 is followed by the literal string."""
+        if value in table:
+            self.uint(table.index(value) + 1)
+        else:
+            self.uint(0)
+            self.string(value)
+
+    def double(self, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"not a number: {value!r}")
+        self.buffer += DOUBLE.pack(value)
+
+    def bitset(self, indexes):
+        bits = 0
+        for index in indexes:
+            if isinstance(index, bool) or not isinstance(index, int) or index < 0:
+                raise ValueError(f"not a question index: {index!r}")
+            bits |= 1 << index
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        self.uint(len(data))
+        self.buffer += data
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def uint(self):
+        value = shift = 0
+        while True:
+            byte = self.data[self.position]
+            self.position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def sint(self):
+        value = self.uint()
+        return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+    def _take(self, length):
+        data = self.data[self.position:self.position + length]
+        if len(data) != length:
+            raise ValueError("truncated state payload")
+        self.position += length
+        return data
+
+    def string(self):
+        return self._take(self.uint()).decode("utf-8")
+
+    def code(self, table):
+        code = self.uint()
+        return self.string() if code == 0 else table[code - 1]
+
+    def double(self):
+        return DOUBLE.unpack(self._take(DOUBLE.size))[0]
+
+    def bitset(self):
+        bits = int.from_bytes(self._take(self.uint()), "little")
+        indexes = []
+        index = 0
+        while bits:
+            if bits & 1:
+                indexes.append(index)
+            bits >>= 1
+            index += 1
+        return indexes
+
+
+def _check_keys(value, keys):
+    if not isinstance(value, dict) or set(value) != set(keys):
+        raise ValueError("unexpected state shape")
+
+
+def _write_stage_counts(writer, counts):
+    """{stage: {"attempted": n, "correct": n}}"""
+    writer.uint(len(counts))
+    for stage, entry in counts.items():
+        _check_keys(entry, ("attempted", "correct"))
+        writer.code(STAGE_CODES, stage)
+        writer.uint(entry["attempted"])
+        writer.uint(entry["correct"])
+
+
+def _read_stage_counts(reader):
+    counts = {}
+    for _ in range(reader.uint()):
+        stage = reader.code(STAGE_CODES)
+        counts[stage] = {"attempted": reader.uint(), "correct": reader.uint()}
+    return counts
+
+
+def _pack(writer):
+    """Prefixes the version byte and compresses when that makes the payload smaller."""
+    body = bytes(writer.buffer)
+    if len(body) >= SESSION_CODEC_CONFIG["compress_min_bytes"]:
+        compressed = zlib.compress(body, 9)
+        if len(compressed) < len(body):
+            return bytes([CODEC_VERSION | COMPRESSED]) + compressed
+    return bytes([CODEC_VERSION]) + body
+
+
+def _unpack(data):
+    header = data[0]
+    if header & VERSION_MASK != CODEC_VERSION:
+        raise ValueError(f"unsupported state codec version {header & VERSION_MASK}")
+    body = data[1:]
+    return _Reader(zlib.decompress(body) if header & COMPRESSED else body)
+
+
+def encode_learning_state(state):
+    """Encodes a prepare_session_data() dict; raises ValueError if it can't be represented exactly."""
+    _check_keys(state, LEARNING_STATE_KEYS)
+    writer = _Writer()
+    writer.code(SECTION_CODES, state["section"])
+    writer.code(STAGE_CODES, state["stage"])
+    for key in ("correct_answers", "consecutive_correct", "questions_attempted", "current_example"):
+        writer.uint(state[key])
+    if not isinstance(state["showing_example"], bool):
+        raise ValueError("showing_example is not a bool")
+    writer.uint(int(state["showing_example"]))
+    _write_stage_counts(writer, state["stage_results"])
+    writer.uint(len(state["used_questions"]))
+    for stage, indexes in state["used_questions"].items():
+        writer.code(STAGE_CODES, stage)
+        writer.bitset(indexes)
+    return _pack(writer)
+
+
+def decode_learning_state(data):
+    reader = _unpack(data)
+    state = {"section": reader.code(SECTION_CODES), "stage": reader.code(STAGE_CODES)}
+    for key in ("correct_answers", "consecutive_correct", "questions_attempted", "current_example"):
+        state[key] = reader.uint()
+    state["showing_example"] = bool(reader.uint())
+    state["stage_results"] = _read_stage_counts(reader)
+    state["used_questions"] = {}
+    for _ in range(reader.uint()):
+        stage = reader.code(STAGE_CODES)
+        state["used_questions"][stage] = reader.bitset()
+    return {key: state[key] for key in LEARNING_STATE_KEYS}
+
+
+def encode_student_profile(profile):
+    """Encodes a StudentProfile.to_dict() dict; raises ValueError if it can't be represented exactly."""
+    _check_keys(profile, STUDENT_PROFILE_KEYS)
+    writer = _Writer()
+    for key in ("total_questions", "total_correct", "consecutive_correct", "consecutive_errors",
+                "questions_this_session"):
+        writer.uint(profile[key])
+    writer.code(STAGE_CODES, profile["current_stage"])
+    writer.uint(len(profile["misconception_patterns"]))
+    for misconception, count in profile["misconception_patterns"].items():
+        writer.code(MISCONCEPTION_CODES, misconception)
+        writer.uint(count)
+    _write_stage_counts(writer, profile["stage_performance"])
+    started = datetime.fromisoformat(profile["session_start_time"])
+    if started.tzinfo is not None or started.isoformat() != profile["session_start_time"]:
+        raise ValueError("session_start_time doesn't round-trip")
+    writer.sint((started - EPOCH) // timedelta(microseconds=1))
+    writer.double(profile["total_time_spent_minutes"])
+    writer.double(profile["average_response_time"])
+    writer.code(TREND_CODES, profile["response_time_trend"])
+    writer.code(ENGAGEMENT_CODES, profile["engagement_level"])
+    flags = 0
+    for bit, key in enumerate(PROFILE_FLAGS):
+        if not isinstance(profile[key], bool):
+            raise ValueError(f"{key} is not a bool")
+        flags |= profile[key] << bit
+    writer.uint(flags)
+    return _pack(writer)
+
+
+def decode_student_profile(data):
+    reader = _unpack(data)
+    profile = {}
+    for key in ("total_questions", "total_correct", "consecutive_correct", "consecutive_errors",
+                "questions_this_session"):
+        profile[key] = reader.uint()
+    profile["current_stage"] = reader.code(STAGE_CODES)
+    profile["misconception_patterns"] = {}
+    for _ in range(reader.uint()):
+        misconception = reader.code(MISCONCEPTION_CODES)
+        profile["misconception_patterns"][misconception] = reader.uint()
+    profile["stage_performance"] = _read_stage_counts(reader)
+    profile["session_start_time"] = (EPOCH + timedelta(microseconds=reader.sint())).isoformat()
+    profile["total_time_spent_minutes"] = reader.double()
+    profile["average_response_time"] = reader.double()
+    profile["response_time_trend"] = reader.code(TREND_CODES)
+    profile["engagement_level"] = reader.code(ENGAGEMENT_CODES)
+    flags = reader.uint()
+    for bit, key in enumerate(PROFILE_FLAGS):
+        profile[key] = bool(flags >> bit & 1)
+    return {key: profile[key] for key in STUDENT_PROFILE_KEYS}
+
+
+# Session keys stored with the codec, and their (encode, decode) functions
+SESSION_CODECS = {
+    "learning_state": (encode_learning_state, decode_learning_state),
+    "student_profile": (encode_student_profile, decode_student_profile)
+}
+
+
+def encode_session_values(values):
+    """Returns the session values with codec-backed keys encoded where possible."""
+    if not SESSION_CODEC_CONFIG["enabled"]:
+        return values
+    encoded = dict(values)
+    for key, (encode, _) in SESSION_CODECS.items():
+        if isinstance(encoded.get(key), dict):
+            try:
+                encoded[key] = encode(encoded[key])
+            except (ValueError, KeyError, TypeError):
+                pass  # Stays in its JSON shape
+    return encoded
+
+
+def decode_session_values(values):
+    """Reverses encode_session_values; values in the old JSON shape pass through unchanged."""
+    for key, (_, decode) in SESSION_CODECS.items():
+        if isinstance(values.get(key), bytes):
+            values[key] = decode(values[key])
+    return values
@@ -0,0 +1,171 @@
+"""
+Concurrency benchmark for per-session lesson state (optional; test_learning_state.py
+covers the same isolation check in the test suite).
+
+Starts N worker processes, each a threaded server around the app, sharing one
+session store. Simulated students answer practice questions concurrently, and
+requests are spread round-robin over the workers with no session stickiness.
+Each student's final learning state is checked against a local replay of their
+own answers, then throughput is compared across worker counts.
+
+Usage:
+    python stress_learning_state.py --workers 1 2 4 --students 64 --answers 8
+
+Runs with the configured session store settings, so a nonzero
+SESSION_FLUSH_INTERVAL_MS (write batching) shows up as failed isolation under
+non-sticky routing.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import requests
+
+from models.learning_sequence import LearningSequence
+
+STATE_KEYS = ("stage", "correct_answers", "consecutive_correct", "questions_attempted", "stage_results")
+
+
+def serve(port):
+    """Worker process: import the app and serve it threaded."""
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+    logging.disable(logging.WARNING)
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"worker on port {port} did not start")
+
+
+def answer_plan(student, answers):
+    """Each student gets their own mix of right and wrong answers."""
+    rng = random.Random(student)
+    return [rng.random() < 0.7 for _ in range(answers)]
+
+
+def expected_state(plan):
+    learning_sequence = LearningSequence()
+    for is_correct in plan:
+        learning_sequence.update_progress(is_correct)
+    return {key: getattr(learning_sequence, "current_stage" if key == "stage" else key) for key in STATE_KEYS}
+
+
+def run_student(student, plan, urls, next_worker):
+    """Plays one student through the lesson; returns (requests made, mismatched keys)."""
+    client = requests.Session()  # Cookies ignore the port, so the session id follows every worker
+
+    def call(method, path, **kwargs):
+        url = urls[next(next_worker) % len(urls)]
+        response = client.request(method, url + path, timeout=30, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    made = 0
+    given = []
+    for is_correct in plan:
+        question = call("GET", "/api/decimal1/practice/question")
+        made += 1
+        if question.get("lesson_complete"):
+            break
+        choices = question["question"]["choices"]
+        correct_letter = question["question"]["correct_letter"]
+        letter = correct_letter if is_correct else next(l for l in choices if l != correct_letter)
+        result = call("POST", "/api/verify-answer", json={"answer": letter})
+        made += 1
+        if result["is_correct"] != is_correct:
+            return made, ["is_correct"]
+        given.append(is_correct)
+
+    state = call("GET", "/debug-session")["learning_state"]
+    made += 1
+    expected = expected_state(given)
+    return made, [key for key in STATE_KEYS if state.get(key) != expected[key]]
+
+
+def run(workers, students, answers, threads, session_backend):
+    """Starts the workers, runs every student concurrently and returns (requests/s, failed students)."""
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    # Spawned workers read these when they import config
+    os.environ.update({
+        "SESSION_BACKEND": session_backend,
+        "SESSION_SQLITE_PATH": database,
+        "LLM_API_URL": ""
+    })
+    context = multiprocessing.get_context("spawn")
+    ports = [free_port() for _ in range(workers)]
+    processes = [context.Process(target=serve, args=(port,), daemon=True) for port in ports]
+    for process in processes:
+        process.start()
+    try:
+        for port in ports:
+            wait_until_listening(port)
+        urls = [f"http://127.0.0.1:{port}" for port in ports]
+        next_worker = count()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = {
+                student: pool.submit(run_student, student, answer_plan(student, answers), urls, next_worker)
+                for student in range(students)
+            }
+            results = {student: future.result() for student, future in futures.items()}
+        elapsed = time.perf_counter() - started
+    finally:
+        for process in processes:
+            process.terminate()
+        os.unlink(database)
+
+    total_requests = sum(made for made, _ in results.values())
+    failed = {student: keys for student, (_, keys) in results.items() if keys}
+    return total_requests / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker process counts to compare")
+    parser.add_argument("--students", type=int, default=64, help="simulated students per run")
+    parser.add_argument("--answers", type=int, default=8, help="answers each student submits")
+    parser.add_argument("--threads", type=int, default=32, help="students in flight at once")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "redis"], help="shared session backend")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s); {args.students} students x {args.answers} answers, "
+          f"{args.threads} concurrent, {args.backend} sessions, round-robin routing")
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>10}{'efficiency':>12}{'isolation':>12}")
+    baseline = None
+    all_isolated = True
+    for workers in args.workers:
+        throughput, failed = run(workers, args.students, args.answers, args.threads, args.backend)
+        baseline = baseline or throughput / workers
+        speedup = throughput / baseline
+        isolation = "ok" if not failed else f"{len(failed)} failed"
+        all_isolated = all_isolated and not failed
+        print(f"{workers:>8}{throughput:>10.1f}{speedup:>10.2f}{speedup / workers:>12.0%}{isolation:>12}")
+        for student, keys in list(failed.items())[:5]:
+            print(f"    student {student}: mismatched {', '.join(keys)}")
+    raise SystemExit(0 if all_isolated else 1)
+
+
+if __name__ == "__main__":
+    main()
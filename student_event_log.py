@@ -0,0 +1,251 @@
+"""Append-only log of every question a student answers, with the profile kept as a running snapshot."""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from config import STUDENT_EVENT_LOG_CONFIG
+from models.student_profile import QuestionResult, StudentProfile
+
+logger = logging.getLogger(__name__)
+
+_shared_log = None
+_shared_log_lock = threading.Lock()
+
+RESULT_FIELDS = (
+    "question_id", "stage", "is_correct", "student_answer", "correct_answer",
+    "response_time_seconds", "misconception_type"
+)
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+def result_to_dict(result):
+    data = {name: getattr(result, name) for name in RESULT_FIELDS}
+    data["timestamp"] = result.timestamp.isoformat()
+    return data
+
+
+def result_from_dict(data):
+    return QuestionResult(
+        **{name: data.get(name) for name in RESULT_FIELDS},
+        recorded_at=datetime.fromisoformat(data["timestamp"]).timestamp()
+    )
+
+
+class StudentEventLog:
+    """Durable per-student QuestionResult log in SQLite, shared by every worker on the machine.
+
+    append() only queues: a background thread writes queued events, and the latest
+    profile snapshot of each student in the batch, in one transaction every
+    flush_interval_ms (group commit). A profile is rebuilt from its snapshot plus
+    the last history_events events, so the cost doesn't grow with the log. Each
+    worker caches recent tails; an event's seq is the student's question count, so a
+    tail is known to be current when its last seq matches the profile. Two requests
+    answering at once for one student can compute the same seq: the first event
+    written for a seq is kept, and later ones are dropped and counted as duplicates.
+    """
+
+    def __init__(self, path=None, flush_interval_ms=None, max_batch=None, history_events=None, cache_entries=None):
+        config = STUDENT_EVENT_LOG_CONFIG
+        self.path = path or config["path"]
+        self.flush_interval = (config["flush_interval_ms"] if flush_interval_ms is None else flush_interval_ms) / 1000
+        self.max_batch = max_batch or config["max_batch"]
+        self.history_events = history_events or config["history_events"]
+        self.cache_entries = cache_entries or config["cache_entries"]
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # One batch in flight at a time
+        self._pending_events = []  # (student_id, seq, result JSON)
+        self._pending_snapshots = OrderedDict()  # student_id -> (seq, profile JSON)
+        self._flushing = ([], {})  # The batch being written right now, in the same form
+        self._tails = OrderedDict()  # student_id -> deque of (seq, QuestionResult)
+        self._stats = {"appended": 0, "written": 0, "duplicates": 0, "commits": 0, "tail_hits": 0,
+                       "tail_reads": 0, "snapshot_reads": 0, "errors": 0}
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS student_events ("
+            "student_id TEXT NOT NULL, seq INTEGER NOT NULL, recorded_at REAL NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (student_id, seq))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS student_snapshots ("
+            "student_id TEXT PRIMARY KEY, seq INTEGER NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+        if self.flush_interval > 0:
+            threading.Thread(target=self._flush_loop, name="student-event-log", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, student_id, result, profile):
+        """Queues a result and the profile it produced; never waits on the disk."""
+        seq = profile.total_questions
+        with self._lock:
+            self._stats["appended"] += 1
+            self._pending_events.append((student_id, seq, _dumps(result_to_dict(result))))
+            self._pending_snapshots[student_id] = (seq, _dumps(profile.to_dict()))
+            tail = self._tails.get(student_id)
+            if tail and tail[-1][0] == seq:
+                pass  # A duplicate of an event already queued; the first one is kept
+            elif tail and tail[-1][0] == seq - 1:
+                tail.append((seq, result))
+                self._tails.move_to_end(student_id)
+            else:
+                self._remember_tail(student_id, [(seq, result)] if seq == 1 else None)
+            flush_now = self.flush_interval <= 0
+            if not flush_now and len(self._pending_events) >= self.max_batch:
+                self._flush_requested.notify()
+        if flush_now:
+            self.flush()
+
+    def recent(self, student_id, seq):
+        """Returns the student's last history_events results, oldest first, up to and including seq."""
+        if seq <= 0:
+            return []
+        with self._lock:
+            tail = self._tails.get(student_id)
+            if tail and tail[-1][0] == seq:
+                self._stats["tail_hits"] += 1
+                self._tails.move_to_end(student_id)
+                return [result for _, result in tail]
+            pending = [
+                (s, data) for sid, s, data in self._flushing[0] + self._pending_events if sid == student_id
+            ]
+
+        try:
+            rows = self._connection().execute(
+                "SELECT seq, data FROM student_events WHERE student_id = ? AND seq <= ? ORDER BY seq DESC LIMIT ?",
+                (student_id, seq, self.history_events)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._record_error(e)
+            rows = []
+        # The first event for each seq wins, as it will once the queued ones are written
+        events = {}
+        for s, data in rows + [p for p in pending if p[0] <= seq]:
+            events.setdefault(s, data)
+        tail = sorted((s, result_from_dict(json.loads(data))) for s, data in events.items())[-self.history_events:]
+        with self._lock:
+            self._stats["tail_reads"] += 1
+            self._remember_tail(student_id, tail)
+        return [result for _, result in tail]
+
+    def load_profile(self, student_id):
+        """Rebuilds a student's profile from the latest snapshot and event tail, or returns None."""
+        with self._lock:
+            self._stats["snapshot_reads"] += 1
+            snapshot = self._pending_snapshots.get(student_id) or self._flushing[1].get(student_id)
+        if snapshot is None:
+            try:
+                row = self._connection().execute(
+                    "SELECT seq, data FROM student_snapshots WHERE student_id = ?", (student_id,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._record_error(e)
+                row = None
+            if row is None:
+                return None
+            snapshot = row
+        seq, data = snapshot
+        profile = StudentProfile.from_dict(json.loads(data))
+        profile.load_history(self.recent(student_id, seq))
+        return profile
+
+    def flush(self):
+        """Writes every queued event and snapshot in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending_events = self._pending_events, []
+                snapshots, self._pending_snapshots = self._pending_snapshots, OrderedDict()
+                self._flushing = (events, snapshots)
+            if not events and not snapshots:
+                return
+            now = time.time()
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN")
+                try:
+                    written = conn.executemany(
+                        "INSERT OR IGNORE INTO student_events (student_id, seq, recorded_at, data) VALUES (?, ?, ?, ?)",
+                        [(sid, seq, now, data) for sid, seq, data in events]
+                    ).rowcount
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO student_snapshots (student_id, seq, data, updated_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        [(sid, seq, data, now) for sid, (seq, data) in snapshots.items()]
+                    )
+                    conn.execute("COMMIT")
+                except sqlite3.Error:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                self._record_error(e)
+                with self._lock:
+                    # Retry on the next flush, keeping any newer snapshot
+                    self._pending_events[:0] = events
+                    for sid, snapshot in snapshots.items():
+                        self._pending_snapshots.setdefault(sid, snapshot)
+                    self._flushing = ([], {})
+                return
+            with self._lock:
+                self._flushing = ([], {})
+                self._stats["commits"] += 1
+                self._stats["written"] += written
+                self._stats["duplicates"] += len(events) - written
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                self._flush_requested.wait(self.flush_interval)
+            self.flush()
+
+    def _remember_tail(self, student_id, events):
+        if events is None:
+            self._tails.pop(student_id, None)  # Unknown history: read it from the log next time
+            return
+        self._tails[student_id] = deque(events, maxlen=self.history_events)
+        self._tails.move_to_end(student_id)
+        while len(self._tails) > self.cache_entries:
+            self._tails.popitem(last=False)
+
+    def _record_error(self, error):
+        logger.warning(f"Student event log error: {error}")
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_events"] = len(self._pending_events)
+            stats["cached_tails"] = len(self._tails)
+        return stats
+
+
+def get_student_event_log():
+    """Returns the worker-wide event log, or None when it is disabled."""
+    global _shared_log
+    if not STUDENT_EVENT_LOG_CONFIG["enabled"]:
+        return None
+    if _shared_log is None:
+        with _shared_log_lock:
+            if _shared_log is None:
+                _shared_log = StudentEventLog()
+    return _shared_log
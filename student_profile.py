@@ -3,12 +3,18 @@ Enhanced Student Profile for AI Personalization
 File: models/student_profile.py
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Deque, Dict, List, Any, Optional
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 import json
+import time
+from config import STUDENT_PROFILE_CONFIG
 
-@dataclass
+RECENT_WINDOW = STUDENT_PROFILE_CONFIG["recent_window"]
+HISTORY_LIMIT = STUDENT_PROFILE_CONFIG["history_limit"]
+
+@dataclass(slots=True)
 class QuestionResult:
     """Individual question result for tracking"""
     question_id: str
@@ -18,9 +24,55 @@ class QuestionResult:
     correct_answer: str
     response_time_seconds: float
     misconception_type: Optional[str] = None
-    timestamp: datetime = field(default_factory=datetime.now)
+    recorded_at: float = field(default_factory=time.time)  # Epoch seconds; cheaper to keep than a datetime
+    
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.recorded_at)
 
-@dataclass
+class RecentResults:
+    """Ring buffer of the latest results with running sums, so window metrics cost O(1) per answer"""
+    
+    __slots__ = ("capacity", "count", "correct", "total_time", "_results", "_next")
+    
+    def __init__(self, capacity: int = RECENT_WINDOW):
+        self.capacity = capacity
+        self.count = 0
+        self.correct = 0
+        self.total_time = 0.0
+        self._results: List[Optional[QuestionResult]] = [None] * capacity
+        self._next = 0
+    
+    def append(self, result: QuestionResult):
+        oldest = self._results[self._next]
+        if oldest is None:
+            self.count += 1
+        else:
+            self.correct -= oldest.is_correct
+            self.total_time -= oldest.response_time_seconds
+        self._results[self._next] = result
+        self.correct += result.is_correct
+        self.total_time += result.response_time_seconds
+        self._next = (self._next + 1) % self.capacity
+        if self._next == 0:
+            # Re-add the times once per lap so float error can't build up
+            self.total_time = sum(r.response_time_seconds for r in self._results)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __getitem__(self, index: int) -> QuestionResult:
+        """Index from the end: -1 is the latest result, -count the oldest kept"""
+        if not -self.count <= index < 0:
+            raise IndexError("recent results are indexed from the end, -1 to -count")
+        return self._results[(self._next + index) % self.capacity]
+    
+    def latest(self, n: int) -> List[QuestionResult]:
+        """Up to the last n results, oldest first"""
+        n = min(n, self.count)
+        return [self[-i] for i in range(n, 0, -1)]
+
+@dataclass(slots=True)
 class StudentProfile:
     """Comprehensive student profile for AI personalization"""
     
@@ -31,8 +83,9 @@ class StudentProfile:
     consecutive_errors: int = 0
     current_stage: str = "1.1"
     
-    # Detailed tracking
-    question_history: List[QuestionResult] = field(default_factory=list)
+    # Detailed tracking; the full history is kept by the student event log
+    question_history: Deque[QuestionResult] = field(default_factory=lambda: deque(maxlen=HISTORY_LIMIT))
+    recent_results: RecentResults = field(default_factory=RecentResults, repr=False, compare=False)
     misconception_patterns: Dict[str, int] = field(default_factory=dict)
     stage_performance: Dict[str, Dict[str, int]] = field(default_factory=dict)
     
@@ -56,6 +109,7 @@ class StudentProfile:
         
         # Add to history
         self.question_history.append(result)
+        self.recent_results.append(result)
         
         # Update basic counters
         self.total_questions += 1
@@ -99,12 +153,13 @@ class StudentProfile:
                 self.total_questions
             )
             
-        # Analyze trend (simple version)
-        if len(self.question_history) >= 3:
-            recent_times = [q.response_time_seconds for q in self.question_history[-3:]]
-            if recent_times[-1] < recent_times[0] * 0.8:
+        # Analyze trend (simple version): latest time against the one two answers earlier
+        if len(self.recent_results) >= 3:
+            first_time = self.recent_results[-3].response_time_seconds
+            latest_time = self.recent_results[-1].response_time_seconds
+            if latest_time < first_time * 0.8:
                 self.response_time_trend = "improving"
-            elif recent_times[-1] > recent_times[0] * 1.2:
+            elif latest_time > first_time * 1.2:
                 self.response_time_trend = "declining"
             else:
                 self.response_time_trend = "stable"
@@ -115,7 +170,7 @@ class StudentProfile:
         # Check if student learns from mistakes quickly
         if self.consecutive_errors >= 2:
             self.learns_from_mistakes_quickly = False
-        elif self.consecutive_correct >= 3 and any(not q.is_correct for q in self.question_history[-5:]):
+        elif self.consecutive_correct >= 3 and self.recent_results.correct < len(self.recent_results):
             self.learns_from_mistakes_quickly = True
             
         # Determine engagement level
@@ -171,22 +226,35 @@ class StudentProfile:
             (self.success_rate > 0.8 and self.total_questions >= 5)
         )
     
-    def get_recent_performance_summary(self, last_n: int = 5) -> Dict[str, Any]:
-        """Get summary of recent performance"""
-        if len(self.question_history) == 0:
+    def get_recent_performance_summary(self, last_n: int = RECENT_WINDOW) -> Dict[str, Any]:
+        """Get summary of recent performance (at most the last RECENT_WINDOW answers)"""
+        recent = self.recent_results
+        if len(recent) == 0:
             return {"questions": 0, "correct": 0, "success_rate": 0.0}
             
-        recent_questions = self.question_history[-last_n:]
-        correct_count = sum(1 for q in recent_questions if q.is_correct)
+        recent_questions = recent.latest(last_n)
+        if len(recent_questions) == len(recent):
+            # The whole window: use the running sums
+            correct_count, total_time = recent.correct, recent.total_time
+        else:
+            correct_count = sum(1 for q in recent_questions if q.is_correct)
+            total_time = sum(q.response_time_seconds for q in recent_questions)
         
         return {
             "questions": len(recent_questions),
             "correct": correct_count,
             "success_rate": correct_count / len(recent_questions),
-            "average_time": sum(q.response_time_seconds for q in recent_questions) / len(recent_questions),
+            "average_time": total_time / len(recent_questions),
             "misconceptions": [q.misconception_type for q in recent_questions if q.misconception_type]
         }
     
+    def load_history(self, results: List[QuestionResult]):
+        """Replace the in-memory history (oldest first), e.g. with a tail from the event log"""
+        self.question_history = deque(results, maxlen=HISTORY_LIMIT)
+        self.recent_results = RecentResults()
+        for result in results[-RECENT_WINDOW:]:
+            self.recent_results.append(result)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for session storage"""
         return {
@@ -0,0 +1,76 @@
+# test_circuit_breaker.py
+# Usage: python test_circuit_breaker.py
+# Checks that a half-open probe the limiter sheds gives its slot back, so the breaker can still recover.
+import asyncio
+import os
+import time
+
+os.environ.setdefault("LLM_API_KEY", "fake-key")
+os.environ.setdefault("LLM_API_URL", "http://127.0.0.1:9/v1/messages")  # Never reached: every call is shed
+
+from services.circuit_breaker import CircuitBreaker, HALF_OPEN
+from services.concurrency_limiter import ConcurrencyLimiter
+from services.llm_service import LLMService
+from services.llm_runtime import run_sync
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=0.01, half_open_max_calls=1)
+    breaker.record_failure(0.1)
+    time.sleep(0.02)
+    assert breaker.state == HALF_OPEN, breaker.state
+    return breaker
+
+
+def test_shed_probe_releases_slot():
+    service = LLMService()
+    service.circuit_breaker = half_open_breaker()
+    service.limiter = ConcurrencyLimiter(max_queue_depth=0)  # Sheds every sheddable call
+
+    prompt = {"system": "You are a tutor.", "user": "Give the student some encouragement."}
+    message = service.get_completion(prompt, message_type="encouragement")
+    assert service.is_fallback_message(prompt, message), message
+
+    stats = service.circuit_breaker.get_stats()
+    assert stats["state"] == HALF_OPEN, stats
+    assert stats["half_open_calls"] == 0, stats
+    assert service.circuit_breaker.allow_request(), "breaker still rejects calls after a shed probe"
+
+
+def test_probe_cancelled_in_limiter_queue_releases_slot():
+    service = LLMService()
+    breaker = service.circuit_breaker = half_open_breaker()
+    service.limiter = ConcurrencyLimiter(max_in_flight=1)
+    prompt = {"system": "You are a tutor.", "user": "Help the student who is struggling."}
+
+    async def cancel_while_queued():
+        assert await service.limiter.acquire(0)  # Holds the only slot, so the probe has to queue
+        assert breaker.allow_request()
+        probe = asyncio.ensure_future(service._request_completion(prompt, {}, {}, priority=0))
+        await asyncio.sleep(0.05)
+        probe.cancel()  # As asyncio.wait_for does when the deadline passes
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+    run_sync(cancel_while_queued())
+    assert breaker.get_stats()["half_open_calls"] == 0, breaker.get_stats()
+    assert breaker.allow_request(), "breaker still rejects calls after a cancelled probe"
+
+
+def test_stale_probe_expires():
+    breaker = half_open_breaker()
+    breaker.probe_timeout_seconds = 0.01
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    time.sleep(0.02)
+    assert breaker.allow_request(), "probe slot never expired"
+    assert breaker.get_stats()["expired_probes"] == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
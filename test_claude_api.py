@@ -1,5 +1,8 @@
 # test_claude_api.py
+# Usage: python test_claude_api.py [--fake] [--url URL]
+#   --fake  send the request to a local fake_llm_server instead of the real provider
 import os
+import sys
 import requests
 import json
 from dotenv import load_dotenv
@@ -10,10 +13,18 @@ api_key = os.environ.get("LLM_API_KEY")
 api_url = os.environ.get("LLM_API_URL")
 model = os.environ.get("LLM_MODEL", "claude-3-haiku-20240307")
 
+if "--url" in sys.argv:
+    api_url = sys.argv[sys.argv.index("--url") + 1]
+if "--fake" in sys.argv:
+    from fake_llm_server import start_server
+    fake_server = start_server(latency="fixed", latency_ms=50)
+    api_url = fake_server.url
+    api_key = api_key or "fake-key"
+
 print(f"Testing Claude API...")
 print(f"API URL: {api_url}")
 print(f"Model: {model}")
-print(f"API Key: {api_key[:10]}...{api_key[-10:] if api_key else 'None'}")
+print(f"API Key: {api_key[:10] + '...' + api_key[-10:] if api_key else 'None'}")
 
 headers = {
     "Content-Type": "application/json",
@@ -0,0 +1,104 @@
+# test_concurrency_limiter.py
+# Usage: python test_concurrency_limiter.py
+# Checks the LLM concurrency limiter's priority order, load shedding, and admission as slots and tokens free up.
+import asyncio
+import time
+
+from services.concurrency_limiter import ConcurrencyLimiter
+
+
+def limiter(**overrides):
+    """A limiter that only sheds what a test asks it to."""
+    settings = {"rate_per_second": 1000, "burst": 100, "max_in_flight": 1, "max_queue_depth": 100,
+                "max_estimated_wait_seconds": 60, "shed_priority": 10}
+    return ConcurrencyLimiter(**{**settings, **overrides})
+
+
+def test_higher_priority_is_admitted_first():
+    async def scenario():
+        calls = limiter()
+        assert await calls.acquire(0)  # Holds the only slot
+        admitted = []
+
+        async def call(priority, name):
+            assert await calls.acquire(priority)
+            admitted.append(name)
+            calls.release()
+
+        waiting = [asyncio.ensure_future(call(5, "low")), asyncio.ensure_future(call(3, "medium"))]
+        await asyncio.sleep(0.01)
+        waiting.append(asyncio.ensure_future(call(0, "high")))  # Queued last, but first in line
+        await asyncio.sleep(0.01)
+        assert admitted == []
+        calls.release()
+        await asyncio.gather(*waiting)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["high", "medium", "low"]
+
+
+def test_sheds_calls_that_cannot_meet_their_deadline():
+    async def scenario():
+        calls = limiter()
+        assert await calls.acquire(0)  # The next call waits about one average call (1s to start with)
+        assert not await calls.acquire(0, timeout=0.1, label="encouragement")
+        assert calls.get_stats()["shed"] == {"encouragement": 1}
+        assert calls.get_stats()["queue_depth"] == 0  # Turned away without queueing
+
+        # Within the deadline it queues, and gets the slot once it is released
+        queued = asyncio.ensure_future(calls.acquire(0, timeout=5))
+        await asyncio.sleep(0.01)
+        calls.release()
+        assert await queued
+
+    asyncio.run(scenario())
+
+
+def test_sheds_only_sheddable_priorities_when_overloaded():
+    async def scenario():
+        calls = limiter(max_queue_depth=0, shed_priority=2)
+        assert await calls.acquire(0)
+        assert not await calls.acquire(2, label="welcome")  # At or above shed_priority
+        important = asyncio.ensure_future(calls.acquire(1))  # Below it: waits instead
+        await asyncio.sleep(0.01)
+        assert calls.get_stats()["queue_depth"] == 1
+        calls.release()
+        assert await important
+        assert calls.get_stats()["shed"] == {"welcome": 1}
+
+    asyncio.run(scenario())
+
+
+def test_release_admits_the_next_waiter():
+    async def scenario():
+        calls = limiter(max_in_flight=2)
+        assert await calls.acquire(0) and await calls.acquire(0)
+        waiter = asyncio.ensure_future(calls.acquire(0))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        calls.release(latency=0.5)
+        assert await asyncio.wait_for(waiter, 1)
+        stats = calls.get_stats()
+        assert stats["in_flight"] == 2 and stats["admitted"] == 3, stats
+        assert stats["average_call_seconds"] == 0.9, stats  # 0.8 * 1.0 + 0.2 * 0.5
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills_over_time():
+    async def scenario():
+        calls = limiter(rate_per_second=20, burst=1, max_in_flight=10)
+        assert await calls.acquire(0)  # Spends the only token
+        started = time.monotonic()
+        assert await calls.acquire(0)  # A slot is free, but it waits for a token
+        return time.monotonic() - started
+
+    waited = asyncio.run(scenario())
+    assert 0.03 <= waited < 0.5, waited
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
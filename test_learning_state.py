@@ -0,0 +1,117 @@
+# test_learning_state.py
+# Usage: python test_learning_state.py
+# Checks that each student's lesson state survives across requests and across workers sharing one session store.
+# stress_learning_state.py runs the same check at load, against real worker processes, as a benchmark.
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp(prefix="tutor-test-")
+os.environ.setdefault("SESSION_BACKEND", "sqlite")
+os.environ.setdefault("SESSION_SQLITE_PATH", os.path.join(_data_dir, "sessions.sqlite3"))
+os.environ.setdefault("STUDENT_EVENT_LOG_PATH", os.path.join(_data_dir, "student_events.sqlite3"))
+os.environ.setdefault("AI_CACHE_PATH", "")
+os.environ.setdefault("AI_CONVERSATION_STORE_PATH", "")
+os.environ.setdefault("LLM_API_URL", "")  # Companion messages come from the fallbacks
+
+from app import app
+from helpers.session_interface import ServerSideSessionInterface
+from services.session_store import SessionStore, SQLiteSessionBackend
+from stress_learning_state import STATE_KEYS, answer_plan, expected_state
+
+
+class Workers:
+    """A test client whose requests go round-robin to workers that only share the session database."""
+
+    def __init__(self, count):
+        path = tempfile.NamedTemporaryFile(suffix=".sqlite3", dir=_data_dir, delete=False).name
+        # Each worker has its own store, with its own cache of recent sessions
+        self.interfaces = [
+            ServerSideSessionInterface(SessionStore(SQLiteSessionBackend(path, 3600, 1000), flush_interval_ms=0))
+            for _ in range(count)
+        ]
+        self.requests = 0
+
+    def client(self):
+        return WorkerClient(self)
+
+    def next_interface(self):
+        self.requests += 1
+        return self.interfaces[self.requests % len(self.interfaces)]
+
+
+class WorkerClient:
+    """One student's browser: a cookie jar whose requests go to whichever worker is next."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.client = app.test_client()
+
+    def call(self, method, path, **kwargs):
+        default_interface = app.session_interface
+        app.session_interface = self.workers.next_interface()
+        try:
+            response = self.client.open(path, method=method, **kwargs)
+        finally:
+            app.session_interface = default_interface
+        assert response.status_code == 200, (path, response.status_code, response.get_data(as_text=True))
+        return response.get_json()
+
+
+def answer(client, is_correct):
+    """Answers the next practice question right or wrong; returns False once the lesson is over."""
+    question = client.call("GET", "/api/decimal1/practice/question")
+    if question.get("lesson_complete"):
+        return False
+    choices = question["question"]["choices"]
+    correct_letter = question["question"]["correct_letter"]
+    letter = correct_letter if is_correct else next(l for l in choices if l != correct_letter)
+    result = client.call("POST", "/api/verify-answer", json={"answer": letter})
+    assert result["is_correct"] == is_correct, result
+    return True
+
+
+def play(client, plan):
+    """Plays a student through their answers; returns the answers actually given."""
+    given = []
+    for is_correct in plan:
+        if not answer(client, is_correct):
+            break
+        given.append(is_correct)
+    return given
+
+
+def assert_state(client, given):
+    state = client.call("GET", "/debug-session")["learning_state"]
+    expected = expected_state(given)
+    mismatched = {key: (state.get(key), expected[key]) for key in STATE_KEYS if state.get(key) != expected[key]}
+    assert not mismatched, mismatched
+
+
+def test_state_survives_across_requests():
+    client = Workers(1).client()
+    assert_state(client, play(client, answer_plan(1, 8)))
+
+
+def test_state_survives_across_workers():
+    client = Workers(2).client()
+    given = play(client, answer_plan(2, 8))
+    assert len(given) > 1
+    assert_state(client, given)
+
+
+def test_interleaved_students_keep_their_own_state():
+    workers = Workers(3)
+    students = {student: (workers.client(), answer_plan(student, 8), []) for student in range(4)}
+    for turn in range(8):
+        for client, plan, given in students.values():
+            if len(given) == turn and answer(client, plan[turn]):
+                given.append(plan[turn])
+    for client, _, given in students.values():
+        assert_state(client, given)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
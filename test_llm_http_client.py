@@ -0,0 +1,97 @@
+# test_llm_http_client.py
+# Usage: python test_llm_http_client.py
+# Checks the pooled requests client, and the threaded fallback the async LLM client uses when aiohttp is missing.
+import asyncio
+import json
+import os
+
+os.environ.setdefault("LLM_API_KEY", "fake-key")
+
+from fake_llm_server import start_server
+from services import async_llm_client
+from services.async_llm_client import AsyncLLMClient, LLMRequestError
+from services.llm_http_client import PooledHTTPClient
+from services.llm_runtime import iterate_sync
+from services.llm_service import LLMService
+
+HEADERS = {"Content-Type": "application/json", "x-api-key": "fake-key", "anthropic-version": "2023-06-01"}
+BODY = json.dumps({
+    "model": "claude-3-haiku-20240307", "max_tokens": 50,
+    "messages": [{"role": "user", "content": "Give the student some encouragement."}]
+})
+
+
+def fake_server(**config):
+    return start_server(latency="fixed", latency_ms=5, **config)
+
+
+class WithoutAiohttp:
+    """Runs the async client as it would where aiohttp isn't installed."""
+
+    def __enter__(self):
+        self.aiohttp, async_llm_client.aiohttp = async_llm_client.aiohttp, None
+
+    def __exit__(self, *exc_info):
+        async_llm_client.aiohttp = self.aiohttp
+
+
+def test_pooled_client_reuses_connections():
+    server = fake_server()
+    client = PooledHTTPClient(keep_alive=True)
+    for _ in range(3):
+        response = client.post(server.url, headers=HEADERS, data=BODY)
+        assert response.status_code == 200, response.text
+    stats = client.get_stats()
+    assert stats["requests"] == 3 and stats["new_connections"] == 1 and stats["reused_connections"] == 2, stats
+    client.close()
+
+
+def test_async_client_falls_back_to_pooled_requests():
+    server = fake_server()
+    with WithoutAiohttp():
+        client = AsyncLLMClient(fallback_client=PooledHTTPClient())
+        assert client.transport == "requests"
+        assert not client.supports_streaming
+
+        timings = {}
+        result = asyncio.run(client.post_json(server.url, headers=HEADERS, data=BODY, timings=timings))
+        assert result["content"][0]["text"], result
+        assert timings["ttfb"] > 0, timings
+
+        stats = client.get_stats()
+        assert stats["transport"] == "requests" and stats["requests"] == 1 and stats["in_flight"] == 0, stats
+
+
+def test_fallback_reports_error_status():
+    server = fake_server(error_rate=1.0)
+    with WithoutAiohttp():
+        client = AsyncLLMClient(fallback_client=PooledHTTPClient())
+        try:
+            asyncio.run(client.post_json(server.url, headers=HEADERS, data=BODY))
+        except LLMRequestError as e:
+            assert e.status == 500, e.status
+            assert "api_error" in e.body, e.body
+        else:
+            raise AssertionError("a 500 response didn't raise LLMRequestError")
+
+
+def test_llm_service_runs_on_the_fallback():
+    server = fake_server()
+    with WithoutAiohttp():
+        service = LLMService(http_client=AsyncLLMClient(fallback_client=PooledHTTPClient()))
+        service.api_url = server.url
+        prompt = {"system": "You are a tutor.", "user": "Give the student some encouragement."}
+
+        message = service.get_completion(prompt, message_type="encouragement")
+        assert not service.is_fallback_message(prompt, message), message
+
+        # Without streaming the whole completion arrives as one chunk
+        chunks = list(iterate_sync(service.stream_completion_async(prompt, message_type="encouragement")))
+        assert len(chunks) == 1 and not service.is_fallback_message(prompt, chunks[0]), chunks
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
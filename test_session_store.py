@@ -0,0 +1,96 @@
+# test_session_store.py
+# Usage: python test_session_store.py
+# Checks server-side sessions: backend round-trips, version checks between workers, and an id-only cookie.
+import tempfile
+
+from flask import Flask, session
+
+from helpers.session_interface import ServerSideSessionInterface
+from services.session_store import MemorySessionBackend, SessionStore, SQLiteSessionBackend
+
+
+def sqlite_backend(path=None):
+    path = path or tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False).name
+    return SQLiteSessionBackend(path, ttl_seconds=3600, max_entries=1000)
+
+
+def store(backend):
+    return SessionStore(backend, flush_interval_ms=0)
+
+
+def check_round_trip(backend):
+    sessions = store(backend)
+    assert sessions.load("missing") is None
+    sessions.save("abc", '{"user_id":"abc"}')
+    assert sessions.load("abc") == '{"user_id":"abc"}'
+    assert store(backend).load("abc") == '{"user_id":"abc"}'  # From the backend, not the cache
+    sessions.delete("abc")
+    assert sessions.load("abc") is None
+    assert store(backend).load("abc") is None
+
+
+def test_memory_round_trip():
+    check_round_trip(MemorySessionBackend(ttl_seconds=3600, max_entries=1000))
+
+
+def test_sqlite_round_trip():
+    check_round_trip(sqlite_backend())
+
+
+def test_expired_sessions_are_not_loaded():
+    backend = MemorySessionBackend(ttl_seconds=-1, max_entries=1000)  # Everything is already expired
+    sessions = store(backend)
+    sessions.save("abc", "{}")
+    assert store(backend).load("abc") is None
+
+
+def test_workers_see_each_others_writes():
+    backend = sqlite_backend()
+    first, second = store(backend), store(sqlite_backend(backend.path))
+
+    first.save("abc", '{"answers":1}')
+    assert second.load("abc") == '{"answers":1}'
+    assert second.get_stats()["cache_hits"] == 0
+
+    # Unchanged since second last read it: only the version is checked
+    assert second.load("abc") == '{"answers":1}'
+    assert second.get_stats()["cache_hits"] == 1
+
+    # A newer version written by the other worker replaces the cached copy
+    first.save("abc", '{"answers":2}')
+    assert second.load("abc") == '{"answers":2}'
+    assert second.get_stats()["cache_hits"] == 1
+    second.save("abc", '{"answers":3}')
+    assert first.load("abc") == '{"answers":3}'
+
+
+def test_cookie_holds_only_the_session_id():
+    sessions = store(MemorySessionBackend(ttl_seconds=3600, max_entries=1000))
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSideSessionInterface(sessions, cookie_name="sid")
+
+    @app.route("/answer")
+    def answer():
+        session["learning_state"] = {"section": "decimal1", "stage": "1.2", "note": "x" * 5000}
+        session["user_id"] = "student-1"
+        return "ok"
+
+    @app.route("/stage")
+    def stage():
+        return session["learning_state"]["stage"]
+
+    client = app.test_client()
+    client.get("/answer")
+    sid = client.get_cookie("sid").value
+    assert len(sid) < 40, sid
+    assert "student-1" not in sid and "decimal1" not in sid
+    assert "student-1" in sessions.load(sid)  # The data is in the store instead
+    assert client.get("/stage").get_data(as_text=True) == "1.2"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,94 @@
+# test_state_codec.py
+# Usage: python test_state_codec.py
+# Checks that the session state codec round-trips exactly, and that old or foreign payloads are handled.
+from helpers.session_interface import CompactSessionSerializer
+from helpers.session_helper import prepare_session_data
+from helpers.state_codec import (
+    CODEC_VERSION, COMPRESSED, decode_learning_state, decode_session_values, decode_student_profile,
+    encode_learning_state, encode_session_values, encode_student_profile
+)
+from models.learning_sequence import LearningSequence
+from models.student_profile import QuestionResult, StudentProfile
+
+
+def learning_state():
+    learning_sequence = LearningSequence()
+    for is_correct in (True, True, False, True, True, True):
+        learning_sequence.update_progress(is_correct)
+    learning_sequence.used_questions = {"1.1": {0, 3, 7}, "1.2": {2}}
+    return prepare_session_data(learning_sequence)
+
+
+def student_profile():
+    profile = StudentProfile()
+    for index, is_correct in enumerate((True, False, False, True)):
+        profile.add_question_result(QuestionResult(
+            question_id=f"q{index}", stage="1.1", is_correct=is_correct, student_answer="A", correct_answer="B",
+            response_time_seconds=3.5 + index, misconception_type=None if is_correct else "nines_difficulty"
+        ))
+    return profile.to_dict()
+
+
+def assert_raises_value_error(decode, data):
+    try:
+        decode(data)
+    except ValueError:
+        return
+    raise AssertionError(f"{decode.__name__} accepted {data!r}")
+
+
+def test_learning_state_round_trip():
+    state = learning_state()
+    data = encode_learning_state(state)
+    assert data[0] == CODEC_VERSION, data[0]
+    assert decode_learning_state(data) == state
+
+
+def test_student_profile_round_trip():
+    profile = student_profile()
+    assert decode_student_profile(encode_student_profile(profile)) == profile
+
+
+def test_unknown_codes_round_trip_as_literal_strings():
+    state = {**learning_state(), "stage": "3.1", "stage_results": {"3.1": {"attempted": 2, "correct": 1}}}
+    assert decode_learning_state(encode_learning_state(state)) == state
+
+    profile = {**student_profile(), "current_stage": "3.1", "engagement_level": "distracted",
+               "misconception_patterns": {"sign_error": 2, "nines_difficulty": 1}}
+    assert decode_student_profile(encode_student_profile(profile)) == profile
+
+
+def test_compressed_round_trip():
+    state = learning_state()
+    state["used_questions"] = {stage: list(range(0, 400, 2)) for stage in ("1.1", "1.2", "1.3")}
+    data = encode_learning_state(state)
+    assert data[0] == CODEC_VERSION | COMPRESSED, data[0]
+    assert decode_learning_state(data) == state
+
+
+def test_json_shaped_values_load_unchanged():
+    state, profile = learning_state(), student_profile()
+    # Written before the codec existed, or by a deployment with it turned off
+    old = {"learning_state": state, "student_profile": profile, "user_id": "abc"}
+    assert decode_session_values(dict(old)) == old
+    assert CompactSessionSerializer().loads(CompactSessionSerializer().dumps(old)) == old
+
+    # Values the codec can't represent exactly keep their JSON shape when saved
+    unusual = {**state, "showing_example": 1}
+    encoded = encode_session_values({"learning_state": unusual})
+    assert encoded["learning_state"] == unusual
+
+
+def test_wrong_version_is_rejected():
+    data = encode_learning_state(learning_state())
+    assert_raises_value_error(decode_learning_state, bytes([CODEC_VERSION + 1]) + data[1:])
+    assert_raises_value_error(decode_student_profile, bytes([CODEC_VERSION + 1]) + encode_student_profile(
+        student_profile()
+    )[1:])
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,119 @@
+# test_student_event_log.py
+# Usage: python test_student_event_log.py
+# Checks the student event log's group commit, its exit flush, profile restore and tails, and duplicate seqs.
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from models.student_profile import QuestionResult, StudentProfile
+from services.student_event_log import StudentEventLog
+
+
+def database_path():
+    return tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False).name
+
+
+def answer(profile, index, is_correct=True):
+    """Adds the student's next answer to the profile and returns its QuestionResult."""
+    result = QuestionResult(
+        question_id=f"q{index}", stage="1.1", is_correct=is_correct, student_answer=str(index),
+        correct_answer="0", response_time_seconds=2.0 + index,
+        misconception_type=None if is_correct else "nines_difficulty"
+    )
+    profile.add_question_result(result)
+    return result
+
+
+def play(log, student_id, answers):
+    profile = StudentProfile()
+    results = []
+    for index in range(answers):
+        results.append(answer(profile, index, is_correct=index % 3 != 2))
+        log.append(student_id, results[-1], profile)
+    return profile, results
+
+
+def test_events_are_written_in_one_group_commit():
+    log = StudentEventLog(database_path(), flush_interval_ms=100)
+    play(log, "student", 4)
+    assert log.get_stats()["pending_events"] == 4, log.get_stats()
+    assert log.get_stats()["written"] == 0, log.get_stats()
+
+    time.sleep(0.4)
+    stats = log.get_stats()
+    assert stats["pending_events"] == 0, stats
+    assert stats["written"] == 4, stats
+    assert stats["commits"] == 1, stats
+
+
+def test_queued_events_are_written_at_exit():
+    path = database_path()
+    script = textwrap.dedent(f"""
+        from models.student_profile import QuestionResult, StudentProfile
+        from services.student_event_log import StudentEventLog
+        log = StudentEventLog({path!r}, flush_interval_ms=60000)  # Never flushes on its own before exit
+        profile = StudentProfile()
+        result = QuestionResult("q0", "1.1", True, "A", "A", 2.5)
+        profile.add_question_result(result)
+        log.append("student", result, profile)
+    """)
+    environment = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    subprocess.run([sys.executable, "-c", script], check=True, env=environment)
+
+    profile = StudentEventLog(path, flush_interval_ms=0).load_profile("student")
+    assert profile is not None, "the queued event was lost at exit"
+    assert profile.total_questions == 1
+    assert [r.question_id for r in profile.recent_results.latest(5)] == ["q0"]
+
+
+def test_another_worker_restores_the_profile():
+    path = database_path()
+    profile, results = play(StudentEventLog(path, flush_interval_ms=0), "student", 7)
+
+    restored = StudentEventLog(path, flush_interval_ms=0, history_events=5).load_profile("student")
+    assert restored.to_dict() == profile.to_dict()
+    assert [r.question_id for r in restored.question_history] == [r.question_id for r in results[-5:]]
+    assert restored.get_recent_performance_summary() == profile.get_recent_performance_summary()
+    assert StudentEventLog(path, flush_interval_ms=0).load_profile("someone else") is None
+
+
+def test_recent_returns_the_tail_up_to_seq():
+    path = database_path()
+    log = StudentEventLog(path, flush_interval_ms=0, history_events=3)
+    _, results = play(log, "student", 6)
+    ids = [r.question_id for r in results]
+
+    assert [r.question_id for r in log.recent("student", 6)] == ids[3:6]
+    assert log.get_stats()["tail_hits"] == 1, log.get_stats()  # Served from this worker's cache
+
+    other_worker = StudentEventLog(path, flush_interval_ms=0, history_events=3)
+    assert [r.question_id for r in other_worker.recent("student", 6)] == ids[3:6]
+    assert [r.question_id for r in other_worker.recent("student", 2)] == ids[:2]
+    assert other_worker.recent("student", 0) == []
+
+
+def test_duplicate_seq_keeps_the_first_event():
+    log = StudentEventLog(database_path(), flush_interval_ms=60000)
+    first, second = StudentProfile(), StudentProfile()
+    answer(first, 0)
+    answer(second, 0)
+    # Two requests answering at once both see one answer so far and compute seq 2
+    log.append("student", answer(first, 1, is_correct=True), first)
+    log.append("student", answer(second, 1, is_correct=False), second)
+    assert [r.is_correct for r in log.recent("student", 2)] == [True]  # Queued events
+
+    log.flush()
+    stats = log.get_stats()
+    assert stats["written"] == 1 and stats["duplicates"] == 1, stats
+    fresh = StudentEventLog(log.path, flush_interval_ms=0)
+    assert [r.is_correct for r in fresh.recent("student", 2)] == [True]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
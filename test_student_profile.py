@@ -0,0 +1,108 @@
+# test_student_profile.py
+# Usage: python test_student_profile.py
+# Checks StudentProfile's rolling window (RecentResults) against the list-based metrics it replaced.
+import math
+
+from models.student_profile import RECENT_WINDOW, QuestionResult, RecentResults, StudentProfile
+
+RESPONSE_TIMES = [12, 9, 20, 7, 6, 15, 5, 4, 11, 3, 8, 2]
+
+# StudentProfile.to_dict() after make_results(), as computed before the rolling window (minus session_start_time)
+BASELINE_PROFILE = {
+    "total_questions": 12, "total_correct": 8, "consecutive_correct": 0, "consecutive_errors": 1,
+    "current_stage": "1.1",
+    "misconception_patterns": {"nines_difficulty": 2, "decimal_place_confusion": 2},
+    "stage_performance": {"1.1": {"attempted": 6, "correct": 4}, "1.2": {"attempted": 6, "correct": 4}},
+    "total_time_spent_minutes": 0, "questions_this_session": 12, "average_response_time": 8.5,
+    "response_time_trend": "improving", "engagement_level": "high",
+    "learns_from_mistakes_quickly": True, "prefers_encouragement": True, "responds_to_challenges": False
+}
+
+
+def make_results():
+    """Every third answer wrong, alternating misconceptions; the second half in stage 1.2."""
+    return [
+        QuestionResult(
+            question_id=f"q{index}", stage="1.1" if index < 6 else "1.2", is_correct=index % 3 != 2,
+            student_answer=str(index), correct_answer="0", response_time_seconds=seconds,
+            misconception_type=None if index % 3 != 2 else ["nines_difficulty", "decimal_place_confusion"][index % 2]
+        )
+        for index, seconds in enumerate(RESPONSE_TIMES)
+    ]
+
+
+def baseline_summary(history, last_n):
+    """get_recent_performance_summary as it was computed from the full history list."""
+    recent = history[-last_n:]
+    correct = sum(1 for r in recent if r.is_correct)
+    return {
+        "questions": len(recent),
+        "correct": correct,
+        "success_rate": correct / len(recent),
+        "average_time": sum(r.response_time_seconds for r in recent) / len(recent),
+        "misconceptions": [r.misconception_type for r in recent if r.misconception_type]
+    }
+
+
+def assert_summary(actual, expected):
+    assert math.isclose(actual.pop("average_time"), expected.pop("average_time")), (actual, expected)
+    assert actual == expected, (actual, expected)
+
+
+def test_window_wraps_around_at_capacity():
+    results = make_results()
+    window = RecentResults(capacity=3)
+    for count, result in enumerate(results, 1):
+        window.append(result)
+        kept = results[max(count - 3, 0):count]
+        assert len(window) == len(kept)
+        assert window.latest(3) == kept
+        assert window[-1] is result and window[-len(kept)] is kept[0]
+        assert window.correct == sum(r.is_correct for r in kept)
+        assert math.isclose(window.total_time, sum(r.response_time_seconds for r in kept))
+
+    for index in (0, -4):
+        try:
+            window[index]
+        except IndexError:
+            continue
+        raise AssertionError(f"window[{index}] didn't raise IndexError")
+
+
+def test_window_metrics_after_load_history():
+    results = make_results()
+    profile = StudentProfile()
+    profile.load_history(results[:9])
+    assert len(profile.recent_results) == RECENT_WINDOW
+    for last_n in (1, 3, RECENT_WINDOW):
+        assert_summary(profile.get_recent_performance_summary(last_n), baseline_summary(results[:9], last_n))
+    # Longer spans are capped at the window now that the profile only keeps that much in memory
+    assert_summary(profile.get_recent_performance_summary(20), baseline_summary(results[:9], RECENT_WINDOW))
+
+    # New answers keep rolling the loaded window forward
+    for result in results[9:]:
+        profile.add_question_result(result)
+    assert_summary(profile.get_recent_performance_summary(), baseline_summary(results, RECENT_WINDOW))
+    assert StudentProfile().get_recent_performance_summary() == {"questions": 0, "correct": 0, "success_rate": 0.0}
+
+
+def test_to_dict_matches_baseline():
+    profile = StudentProfile()
+    history = []
+    for result in make_results():
+        profile.add_question_result(result)
+        history.append(result)
+        assert_summary(profile.get_recent_performance_summary(), baseline_summary(history, RECENT_WINDOW))
+
+    data = profile.to_dict()
+    data.pop("session_start_time")
+    assert math.isclose(data.pop("average_response_time"), BASELINE_PROFILE["average_response_time"])
+    assert data == {k: v for k, v in BASELINE_PROFILE.items() if k != "average_response_time"}, data
+    assert StudentProfile.from_dict(profile.to_dict()).to_dict() == profile.to_dict()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")